@@ -45,6 +45,61 @@ const Chat = React.forwardRef((props, ref) => {
     }
   };
   
+  // Set REACT_APP_STREAM_CHAT=true to render answers token by token
+  const streamChat = process.env.REACT_APP_STREAM_CHAT === "true";
+
+  const streamResponse = async (data) => {
+    const response = await fetch(`${backendUrl}/gpt-api-call-stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(data),
+    });
+    if (!response.ok) {
+      throw new Error(`Stream request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    const appendToken = (token) => {
+      setMessages((prevMessages) => {
+        // The user's message is last until the first token opens the bot reply;
+        // decided here because React may run this updater later
+        const last = prevMessages[prevMessages.length - 1];
+        if (!last || last.type !== "bot") {
+          return [...prevMessages, { chat_id: chatId, type: "bot", message: token, user_id: user.id }];
+        }
+        return [...prevMessages.slice(0, -1), { ...last, message: last.message + token }];
+      });
+      setFetchingResponse(false);
+    };
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Server-Sent Events are separated by a blank line
+      const events = buffer.split("\n\n");
+      buffer = events.pop();
+      for (const rawEvent of events) {
+        const lines = rawEvent.split("\n");
+        const event = lines.find((line) => line.startsWith("event: "))?.slice(7);
+        const payload = JSON.parse(lines.find((line) => line.startsWith("data: "))?.slice(6) || "{}");
+
+        if (event === "token") {
+          appendToken(payload.token);
+        } else if (event === "done") {
+          setChat(payload.chainId);
+        } else if (event === "error") {
+          throw new Error(payload.message);
+        }
+      }
+    }
+    setFetchingResponse(false);
+  };
+
   const handleFormSubmit = async (formValues, clearForm) => {
     const proxyEndpoint = `${backendUrl}/gpt-api-call`;
     const data = {
@@ -63,6 +118,11 @@ const Chat = React.forwardRef((props, ref) => {
       ]);
 
       setFetchingResponse(true);
+
+      if (streamChat) {
+        await streamResponse(data);
+        return;
+      }
   
       const response = await axios.post(proxyEndpoint, data);
       const result = response.data.answer;
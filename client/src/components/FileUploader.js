@@ -83,6 +83,17 @@ const FileUploader = ({ setIsModalOpen, closeModal }) => {
     });
   };
 
+  // The server parses uploads in the background; poll until the job settles
+  const waitForIngestionJob = async (backendUrl, jobId) => {
+    while (true) {
+      const response = await axios.get(`${backendUrl}/ingestion-jobs/${jobId}`);
+      if (response.data.status === "succeeded" || response.data.status === "failed") {
+        return response.data;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  };
+
   const handleFileUpload = async () => {
     if (Object.keys(files).length === 0) {
       alert("Please select a file first.");
@@ -107,8 +118,13 @@ const FileUploader = ({ setIsModalOpen, closeModal }) => {
         },
       });
       if (response.data.success) {
-        alert("Resume uploaded successfully.");
-        setIsModalOpen(false)
+        const job = await waitForIngestionJob(backendUrl, response.data.job_id);
+        if (job.status === "succeeded") {
+          alert("Resume uploaded successfully.");
+          setIsModalOpen(false)
+        } else {
+          alert("Error parsing resume.");
+        }
       } else {
         alert("Error uploading resume.");
       }
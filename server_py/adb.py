@@ -0,0 +1,115 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+import asyncpg
+from dotenv import load_dotenv
+
+import telemetry
+
+load_dotenv()
+
+DB_URL = os.environ.get("DB_URL")
+# Used by the async serving mode (asgi.py). Each connection serves one query at
+# a time, so this bounds concurrent queries, not requests in flight.
+ASYNC_DB_POOL_MIN = int(os.environ.get("ASYNC_DB_POOL_MIN", 2))
+ASYNC_DB_POOL_MAX = int(os.environ.get("ASYNC_DB_POOL_MAX", 20))
+ASYNC_DB_POOL_TIMEOUT = float(os.environ.get("ASYNC_DB_POOL_TIMEOUT", 10))
+
+_pool = None
+_pool_lock = None
+
+
+class TimedConnection(asyncpg.Connection):
+    """Records each query as a "db" span, like db.TimedCursor."""
+
+    async def execute(self, query, *args, **kwargs):
+        with telemetry.span("db", telemetry.sql_operation(query)):
+            return await super().execute(query, *args, **kwargs)
+
+    async def executemany(self, query, *args, **kwargs):
+        with telemetry.span("db", telemetry.sql_operation(query)):
+            return await super().executemany(query, *args, **kwargs)
+
+    async def fetch(self, query, *args, **kwargs):
+        with telemetry.span("db", telemetry.sql_operation(query)):
+            return await super().fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        with telemetry.span("db", telemetry.sql_operation(query)):
+            return await super().fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        with telemetry.span("db", telemetry.sql_operation(query)):
+            return await super().fetchval(query, *args, **kwargs)
+
+
+async def get_pool():
+    global _pool, _pool_lock
+    if _pool is None:
+        # Created here rather than at import so it belongs to the running loop
+        if _pool_lock is None:
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(
+                    DB_URL, min_size=ASYNC_DB_POOL_MIN, max_size=ASYNC_DB_POOL_MAX, connection_class=TimedConnection
+                )
+    return _pool
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+@asynccontextmanager
+async def connection():
+    pool = await get_pool()
+    async with pool.acquire(timeout=ASYNC_DB_POOL_TIMEOUT) as conn:
+        yield conn
+
+def pool_stats():
+    if _pool is None:
+        return None
+    return {"size": _pool.get_size(), "idle": _pool.get_idle_size(), "max": ASYNC_DB_POOL_MAX}
+
+@lru_cache(maxsize=None)
+def placeholders(query):
+    """Rewrite a psycopg2 query's %s placeholders as asyncpg's $1, $2, ...
+
+    Lets the sync and async paths share one SQL string.
+    """
+    parts = query.split("%s")
+    return "".join(f"{part}${i}" for i, part in enumerate(parts[:-1], 1)) + parts[-1]
+
+def _identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+async def bulk_insert(conn, table, columns, rows, template=None, suffix="", returning=None):
+    """asyncpg counterpart of db.bulk_insert: one multi-row INSERT for all rows.
+
+    `template` is the same psycopg2-style per-row tuple, e.g.
+    "(%s, %s, current_timestamp)".
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    parts = (template or "(" + ", ".join(["%s"] * len(columns)) + ")").split("%s")
+    values = []
+    args = []
+    for row in rows:
+        start = len(args) + 1
+        values.append("".join(f"{part}${start + i}" for i, part in enumerate(parts[:-1])) + parts[-1])
+        args.extend(row)
+
+    query = f"INSERT INTO {_identifier(table)} ({', '.join(map(_identifier, columns))}) VALUES {', '.join(values)}"
+    if suffix:
+        query += f" {suffix}"
+    if returning:
+        query += f" RETURNING {', '.join(returning)}"
+        return await conn.fetch(query, *args)
+    await conn.execute(query, *args)
+    return []
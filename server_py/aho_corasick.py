@@ -0,0 +1,51 @@
+from collections import deque
+
+
+class Automaton:
+    """Aho-Corasick automaton for matching many fixed patterns in one pass.
+
+    search() yields (start, end, pattern) for every occurrence, including
+    overlapping ones, in O(len(text) + matches) regardless of the number of
+    patterns.
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for pattern in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            if pattern not in self._output[state]:
+                self._output[state].append(pattern)
+
+        # Breadth-first so every failure target is finished before it is used
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, child in self._goto[state].items():
+                pending.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def search(self, text):
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern in self._output[state]:
+                yield i + 1 - len(pattern), i + 1, pattern
@@ -1,60 +1,48 @@
-from flask import Flask, request, jsonify, g
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
 import os
-import pinecone
-from asyncpg.exceptions import UniqueViolationError
 import psycopg2
 import json
+import logging
 import secrets
 from dotenv import load_dotenv
-from langchain.llms import OpenAI
-from langchain.prompts import (
-    SystemMessagePromptTemplate,
-    HumanMessagePromptTemplate,
-    ChatPromptTemplate,
-    PromptTemplate,
-    MessagesPlaceholder,
-)
-from langchain.memory import ConversationBufferMemory, ConversationBufferWindowMemory
-from langchain.chains import LLMChain, ConversationChain, RetrievalQA, ConversationalRetrievalChain
-from langchain.chat_models import ChatOpenAI
-from langchain.schema import (
-    AIMessage,
-    HumanMessage,
-    SystemMessage
-)
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.document_loaders import TextLoader
-from langchain.vectorstores import Chroma
-from docx import Document
-from io import BytesIO
-from flask_uploads import UploadSet, configure_uploads, IMAGES
-from db import get_table_data, delete_row, setup_db
+from db import get_table_data, delete_row, bulk_insert, get_conn, put_conn, pool_stats, connection
+from embedding_cache import get_embeddings, embedding_cache_stats
+from query_vectors import load_query_vectors, get_query_vector
+from vector_store import get_index
+from retrieval import Source, retrieve, retrieve_context
+import context_budget
+import ingestion
+import job_ranking
+import llm_cache
+import migrations
+import pagination
+import prompts
+import resume_parser
+import telemetry
+import vector_outbox
+import warmup
+from conversation_store import conversation_store
 from datetime import datetime, timedelta
 import time
-import re
-from typing import List, Tuple
-import spacy
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
 from email_sending import send_email
-from typing import Optional
-import pdfplumber
 import mimetypes
-from job_search import call_serp_api
-from docx.oxml import parse_xml
+from job_search import JOB_COLUMNS, JOB_TEMPLATE, job_rows, search_jobs_cached
+
+# langchain, spaCy, pdfplumber and the external clients are imported or created
+# on first use (or by the warm-up thread) so importing this module stays cheap
+# and does not fail when a backing service is down.
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor", "X-Trace-Id"])
 
 load_dotenv()
 
-chains = {}
+telemetry.configure_logging()
+logger = logging.getLogger(__name__)
 
 DATABASE = "data.db"
 DB_URL = os.environ.get("DB_URL")
@@ -63,87 +51,96 @@ openai_api_key = os.environ.get("OPENAI_API_KEY")
 pinecone_api_key = os.environ.get("PINECONE_API_KEY")
 app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY")
 
-pinecone.init(api_key=pinecone_api_key, environment="us-west4-gcp")
-index = pinecone.Index("resume-bot")
-
 jwt = JWTManager(app)
 
-# Load the spaCy English model
-nlp = spacy.load('en_core_web_sm')
-
 persist_directory = 'vectordb'
 
-SECTION_KEYWORDS = [
-    "overview",
-    "summary",
-    "profile",
-    "objective",
-    "education",
-    "academic background",
-    "work experience",
-    "professional experience",
-    "experience",
-    "employment history",
-    "job history",
-    "career history",
-    "skills",
-    "technical skills",
-    "core competencies",
-    "capabilities",
-    "areas of expertise",
-    "expertise",
-    "projects",
-    "portfolio",
-    "awards",
-    "achievements",
-    "accolades",
-    "honors",
-    "publications",
-    "research",
-    "certifications",
-    "credentials",
-    "licenses",
-    "training",
-    "languages",
-    "fluency",
-    "multilingual",
-    "references",
-    "referees",
-    "testimonials",
-    "professional affiliations",
-    "memberships",
-    "associations",
-    "activities",
-    "extracurricular activities",
-    "volunteer work",
-    "community involvement",
-    "leadership",
-    "hobbies",
-    "interests",
-    "personal interests",
-]
+SUPPORTED_CONTENT_TYPES = (
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+)
+
+def setup_database():
+    if migrations.MIGRATE_ON_STARTUP:
+        migrations.migrate()
+    ingestion.resume_pending_jobs()
+    vector_outbox.start()
+
+def import_langchain():
+    import langchain.chains
+    import langchain.chat_models
+    import langchain.prompts
+    import langchain.text_splitter
+    import streaming
+
+def load_section_engine():
+    if resume_parser.SECTION_ENGINE == "spacy":
+        resume_parser.get_nlp()
+
+warmup.register("database", setup_database, required=True)
+warmup.register("langchain", import_langchain)
+warmup.register("embeddings", get_embeddings)
+# Precomputed vectors for the fixed retrieval prompts; get_query_vector loads
+# them on first use if this fails
+warmup.register("query_vectors", load_query_vectors)
+warmup.register("vector_index", get_index)
+warmup.register("section_parser", load_section_engine)
+warmup.register("tokenizer", context_budget.get_encoding)
+warmup.start()
 
 @app.before_first_request
 def create_tables():
-    setup_db()
+    warmup.ensure("database")
 
 
 def get_db():
     if "db" not in g:
-        g.db = psycopg2.connect(DB_URL)
+        g.db = get_conn()
     return g.db
 
 def close_db(e=None):
     db = g.pop("db", None)
     if db is not None:
-        db.close()
+        put_conn(db)
 
 app.teardown_appcontext(close_db)
 
+@app.before_request
+def start_request_trace():
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.trace, g.trace_token = telemetry.start_trace(route, request.headers.get("X-Trace-Id"))
+
+@app.after_request
+def finish_request_trace(response):
+    trace = g.pop("trace", None)
+    if trace is not None:
+        response.headers["X-Trace-Id"] = trace.trace_id
+        seconds = telemetry.finish_trace(trace, g.pop("trace_token"), status=response.status_code, method=request.method)
+        telemetry.request_seconds.observe(seconds, request.method, trace.name, response.status_code)
+    return response
+
+telemetry.register_collector("db_pool", pool_stats)
+telemetry.register_collector("embedding_cache", embedding_cache_stats)
+telemetry.register_collector("conversations", conversation_store.stats)
+telemetry.register_collector("llm_cache", llm_cache.stats)
+telemetry.register_collector("vector_outbox", vector_outbox.stats)
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(telemetry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    readiness = warmup.readiness()
+    return jsonify(readiness), 200 if readiness["ready"] else 503
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify(db_pool=pool_stats(), embedding_cache=embedding_cache_stats(), conversations=conversation_store.stats(), llm_cache=llm_cache.stats())
+
 @app.route("/register", methods=["POST"])
 def register():
     data = request.get_json()
-    print(data)
 
     # Check if the user already exists
     db = get_db()
@@ -166,7 +163,6 @@ def register():
 @app.route("/login", methods=["POST"])
 def login():
     data = request.get_json()
-    print(data)
 
     # Check if the user exists
     db = get_db()
@@ -225,8 +221,6 @@ def reset_password():
     data = request.get_json()
     token = data.get("token")
     new_password = data.get("password")
-    print(token)
-    print(new_password)
 
     if not token or not new_password:
         return jsonify({"error": "Token and new password are required"}), 400
@@ -292,12 +286,9 @@ def update_profile():
     db = get_db()
     cur = db.cursor()
 
-    print(email)
-
     # Find the user by email
     cur.execute("SELECT * FROM users WHERE email=%s", (email, ))
     user = cur.fetchone()
-    print(user)
 
     if not user:
         return jsonify({"type" : "error", "message": "User not found"}), 404
@@ -331,145 +322,72 @@ def profile():
 @app.route("/upload-resume", methods=["POST"])
 def upload_resume():
     user_id = request.form.get("id")
-    user_embeddings_directory = os.path.join(persist_directory, f"user_{user_id}_embeddings")
-    os.makedirs(user_embeddings_directory, exist_ok=True)
-    docs = []
-
-    def extract_raw_text(resume_buffer, content_type):
-        plain_text = ""
-        if content_type == "application/pdf":
-            with pdfplumber.open(BytesIO(resume_buffer)) as pdf:
-                for page in pdf.pages:
-                    plain_text += page.extract_text(x_tolerance=1, y_tolerance=1) + "\n"
-        elif content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-            document = Document(BytesIO(resume_buffer))
-
-            # Extracting text from paragraphs
-            for paragraph in document.paragraphs:
-                for run in paragraph.runs:
-                    if "Hyperlink" in run.style.name:
-                        for rel in run._r.rels.values():
-                            if "mailto" in rel.reltype:
-                                plain_text += rel._target + "\n"
-                            elif "http" in rel.reltype:
-                                plain_text += rel._target + "\n"
-                    else:
-                        plain_text += run.text + "\n"
-
-            # Extracting text from tables
-            for table in document.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for paragraph in cell.paragraphs:
-                            plain_text += paragraph.text + "\n"
-            
-            # Extracting text from headers and footers
-            for section in document.sections:
-                header = section.header
-                for paragraph in header.paragraphs:
-                    plain_text += paragraph.text + "\n"
-                
-                footer = section.footer
-                for paragraph in footer.paragraphs:
-                    plain_text += paragraph.text + "\n"
-
-        else:
-            raise ValueError("Unsupported file type")
-        return plain_text.strip()
-        
-    def split_resume_into_sections(resume_text: str) -> List[Tuple[str, str]]:
-        doc = nlp(resume_text)
-
-        sections = []
-        section_starts = []
-        for i, token in enumerate(doc):
-            # Check if the token is followed by a newline character
-            if token.text.lower().strip() in (keyword.lower() for keyword in SECTION_KEYWORDS) and (i == len(doc) - 1 or doc[i + 1].text == "\n"):
-                section_starts.append(i)
-
-        for idx, start in enumerate(section_starts):
-            section_header = doc[start].text
 
-            # Get the section content
-            if idx < len(section_starts) - 1:
-                end = section_starts[idx + 1]
-                section_content = doc[start + 1:end]
-            else:
-                section_content = doc[start + 1:]
+    try:
+        resume_file = request.files["file"]
+        content_type, _ = mimetypes.guess_type(resume_file.filename)
+        resume_buffer = resume_file.read()
+    except Exception as e:
+        logger.exception("Error reading uploaded file")
+        return jsonify(success=False, message="Error reading uploaded file."), 500
 
-            sections.append((section_header, section_content.text))
+    if content_type not in SUPPORTED_CONTENT_TYPES:
+        return jsonify(success=False, message="Unsupported file type."), 400
 
-        return sections
+    # Parsing happens on the ingestion workers and embedding and indexing on
+    # the vector outbox flusher; the client polls /ingestion-jobs/<job_id> for progress.
+    db = get_db()
+    cur = db.cursor()
+    job_id = ingestion.create_job(cur, user_id, resume_file.filename, content_type, resume_buffer)
+    db.commit()
+    cur.close()
 
-    def save_resume_to_database(user_id: int, resume_sections: List[Tuple[str, str]]):
-        db = get_db()
-        cur = db.cursor()
-        
-        # Delete existing resume data
-        cur.execute("DELETE FROM resume WHERE user_id=%s", (user_id, ))
-        
-        # Insert full resume
-        cur.execute("INSERT INTO resume (user_id, section, content) VALUES (%s, %s, %s)",
-                         (user_id, "FULL RESUME", plain_text))
-        
-        # Insert each section as a new row in the "resume" table
-        for section, content in resume_sections:
-            cur.execute("INSERT INTO resume (user_id, section, content) VALUES (%s, %s, %s)",
-                             (user_id, section, content))
-            docs.append(section + " " + content)
+    ingestion.submit(job_id)
 
-        db.commit()
+    return jsonify(success=True, job_id=job_id, status="queued", message="Resume upload queued for processing."), 202
 
-        cur.close()
+@app.route("/ingestion-jobs/<string:job_id>", methods=["GET"])
+def get_ingestion_job(job_id):
+    db = get_db()
+    cur = db.cursor()
+    job = ingestion.get_job(cur, job_id)
+    cur.close()
 
+    if job is None:
+        return jsonify(error="Ingestion job not found"), 404
 
-    try:
-        resume_file = request.files["file"]
-        content_type, _ = mimetypes.guess_type(resume_file.filename)
-        resume_buffer = resume_file.read()
-    except Exception as e:
-        print("Error reading uploaded file:", e)
-        return jsonify(success=False, message="Error reading uploaded file."), 500
+    return jsonify(job)
 
-    try:
-        plain_text = extract_raw_text(resume_buffer, content_type)
-        print(plain_text)
-        resume_sections = split_resume_into_sections(plain_text)
+@app.route("/ingestion-jobs/<string:job_id>/events", methods=["GET"])
+def ingestion_job_events(job_id):
+    from streaming import sse
 
-        embeddings = OpenAIEmbeddings(
-                openai_api_key=openai_api_key,
-                model="text-embedding-ada-002"
-        )
+    def events():
+        last = None
+        while True:
+            with connection() as conn:
+                cur = conn.cursor()
+                job = ingestion.get_job(cur, job_id)
+                cur.close()
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            # Set a really small chunk size, just to show.
-            chunk_size = 500,
-            chunk_overlap  = 20,
-            length_function = len,
-        )
-        
-        docs_chunked = text_splitter.create_documents([plain_text])
-        docs_text = [doc.page_content for doc in docs_chunked]
-        docs_embed = embeddings.embed_documents(docs_text)
-
-        doc_ids = [str(uuid.uuid4()) for _ in docs_chunked]
-        metadatas = [{"type": "resume", "user": user_id, "text": _.page_content} for _ in docs_chunked]
-
-        index.delete(
-            filter={
-                "type": {"$eq": "resume"},
-                "user": user_id
-            }
-        )
+            if job is None:
+                yield sse("error", {"message": "Ingestion job not found"})
+                return
 
-        index.upsert(vectors=zip(doc_ids, docs_embed, metadatas))
+            state = (job["status"], job["stage"], job["attempts"])
+            if state != last:
+                last = state
+                yield sse("progress", {key: job[key] for key in ("id", "status", "stage", "attempts", "error")})
 
-        save_resume_to_database(user_id, resume_sections)
+            if job["status"] in ("succeeded", "failed"):
+                return
+            time.sleep(0.5)
 
-        return jsonify(success=True, message="Resume uploaded and parsed successfully.")
-    except Exception as e:
-        print("Error parsing resume:", e)
-        return jsonify(success=False, message="Error parsing resume."), 500
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.route("/get-linkedIn", methods=["GET"])
 def get_linkedIn():
@@ -488,110 +406,51 @@ def fetch_experience_data():
 
         return jsonify(resume=rows)
     except Exception as e:
-        print("Error fetching resume data:", e)
+        logger.exception("Error fetching resume data")
         return jsonify(success=False, message="Error fetching resume data."), 500
 
 
-@app.route("/gpt-api-call", methods=["POST"])
-def gpt_api_call():
-    db = get_db()
-    cur = db.cursor()
+def build_chat_chain(form_values, cur, db, callbacks=None):
+    from langchain.chat_models import ChatOpenAI
+    from langchain.chains import ConversationChain
+    from langchain.prompts import PromptTemplate
 
-    form_values = request.json
     query = form_values["query"]
     user_id = form_values["id"]
     first_name = form_values["first_name"]
-    print(user_id)
-
-    embeddings = OpenAIEmbeddings(
-        openai_api_key=openai_api_key,
-        model="text-embedding-ada-002"
-    )
-
-    query_embed = embeddings.embed_query(query)
-    print(query_embed)
-
-    try:
-        
-        resume_docs = index.query(
-            vector=query_embed,
-            filter={
-                "type": {"$eq": "resume"},
-                "user": f"""{user_id}"""
-            },
-            top_k=2,
-            include_metadata=True,
-            namespace=""
-        )
-
-        print(resume_docs)
-
-        resume_docs_texts = resume_docs["matches"]
 
-        resume_docs_texts_flat = [doc["metadata"]["text"] for doc in resume_docs_texts]
+    matches = retrieve(get_index(), [
+        Source("resume", query, {"type": {"$eq": "resume"}, "user": f"""{user_id}"""}, 2),
+        Source("jobs", query, {"type": {"$eq": "jobs"}, "user": f"""{user_id}"""}, 4),
+        Source("questions", query, {"type": {"$eq": "questions"}, "user": f"""{user_id}"""}, 1),
+    ])
 
-        resume_docs_str = "\n\n".join(resume_docs_texts_flat)
-
-        print(resume_docs_str)
-
-    except:
-
-        resume_docs_str = ""
-
-    try:
-        
-        jobs_docs = index.query(
-            vector=query_embed,
-            filter={
-                "type": {"$eq": "jobs"},
-                "user": f"""{user_id}"""
-            },
-            top_k=4,
-            include_metadata=True
-        )
-
-        jobs_docs_texts = jobs_docs["matches"]
-
-        jobs_docs_texts_flat = [doc["metadata"]["text"] for doc in jobs_docs_texts]
-
-        jobs_docs_str = "\n\n".join(jobs_docs_texts_flat)
-
-        context = f"""\nInformation from {first_name}'s resume:\n {resume_docs_str}""" + f"""\nInformation from {first_name}'s job applications:\n {jobs_docs_str}"""
-
-    except:
-
-        context = f"""\nInformation from {first_name}'s resume:\n {resume_docs_str}"""
-
-    try:
+    template_chat_1 = f"""You are an intelligent career personal assistant and your job is to help {first_name} with all things career related. You may be asked to help improve their resume, help with their job applications, prepare for interviews, answer recruiter questions and more. Below is relevant information you can use to answer any questions {first_name} may have. Do not make anything up.\n""" 
 
-        questions_docs = index.query(
-            vector=query_embed,
-            filter={
-                "type": {"$eq": "questions"},
-                "user": f"""{user_id}"""
-            },
-            top_k=1,
-            include_metadata=True
-        )
+    # The budget leaves room for the windowed history next to the context
+    docs = context_budget.build("chat", [
+        context_budget.Part("instructions", template_chat_1, None),
+        context_budget.Part("question", query, None),
+        context_budget.Part("resume", matches.get("resume", []), 2),
+        *(context_budget.Part(name, matches[name]) for name in ("jobs", "questions") if name in matches),
+    ], budget=context_budget.CONTEXT_TOKEN_BUDGET - context_budget.CHAT_HISTORY_TOKEN_RESERVE)
 
-        questions_docs_texts = questions_docs["matches"]
-        questions_docs_texts_flat = [doc["metadata"]["text"] for doc in questions_docs_texts]
-        questions_docs_str = "\n\n".join(questions_docs_texts_flat)
+    context = f"""\nInformation from {first_name}'s resume:\n {docs["resume"]}"""
 
-        context = context + f"""\nInterview questions that have been answered by {first_name}:\n {questions_docs_str}"""
+    if "jobs" in docs:
+        context = context + f"""\nInformation from {first_name}'s job applications:\n {docs["jobs"]}"""
 
-    except:
-        
-        context = context
+    if "questions" in docs:
+        context = context + f"""\nInterview questions that have been answered by {first_name}:\n {docs["questions"]}"""
 
     chat = ChatOpenAI(
         model_name="gpt-3.5-turbo",
         openai_api_key=openai_api_key,
         temperature=0,
+        streaming=callbacks is not None,
+        callbacks=callbacks,
     )
 
-    template_chat_1 = f"""You are an intelligent career personal assistant and your job is to help {first_name} with all things career related. You may be asked to help improve their resume, help with their job applications, prepare for interviews, answer recruiter questions and more. Below is relevant information you can use to answer any questions {first_name} may have. Do not make anything up.\n""" 
-
     template_chat = template_chat_1 + f"""{context}\n"""
 
     final_template = template_chat + """{history}\n User question: {input}\n Assistant:"""
@@ -602,103 +461,129 @@ def gpt_api_call():
         template=final_template      
         )
 
-    chain_id = form_values.get("chainId")
-
-    chain = chains.get(chain_id)
-
     chat_id = None
+    chain_id = form_values.get("chainId")
 
-    if not chain:
-        chain = ConversationChain(
-            llm=chat,
-            prompt=resume_prompt,
-            verbose=True,
-            memory=ConversationBufferWindowMemory(k=2),
-        )
+    if chain_id:
+        cur.execute("SELECT id FROM chat WHERE id = %s AND user_id = %s", (int(chain_id), user_id))
+        row = cur.fetchone()
+        chat_id = row[0] if row else None
 
+    if chat_id is None:
         cur.execute("INSERT INTO chat (user_id, chat_name) VALUES (%s, %s) RETURNING id", (user_id, query))
         chat_id = cur.fetchone()[0]
+        db.commit()
 
-        chains[chat_id] = chain
+    # The chain is rebuilt per request around the current context; only the
+    # window memory carries over, and any worker can restore it from messages.
+    chain = ConversationChain(
+        llm=chat,
+        prompt=resume_prompt,
+        verbose=True,
+        memory=conversation_store.get(cur, chat_id),
+    )
 
-        db.commit()
+    return chain, chat_id
+
+MESSAGE_COLUMNS = ("type", "user_id", "chat_id", "message", "timestamp")
+
+def chat_message_rows(user_id, chat_id, query, answer):
+    timestamp = datetime.now()
+    return [("user", user_id, chat_id, query, timestamp), ("bot", user_id, chat_id, answer, timestamp)]
+
+def save_chat_messages(cur, user_id, chat_id, query, answer):
+    ids = bulk_insert(cur, "messages", MESSAGE_COLUMNS, chat_message_rows(user_id, chat_id, query, answer), returning=("id",))
+    # The bot message is inserted second, so it has the larger id
+    return max(row[0] for row in ids)
+
+@app.route("/gpt-api-call", methods=["POST"])
+def gpt_api_call():
+    db = get_db()
+    cur = db.cursor()
+
+    form_values = request.json
+    query = form_values["query"]
+    user_id = form_values["id"]
+
+    chain, chat_id = build_chat_chain(form_values, cur, db)
     
     try:
-        result_endpoint = chain.predict(input=query)
+        with telemetry.span("llm", "chat"):
+            result_endpoint = chain.predict(input=query)
         answer = result_endpoint
-        print(answer)
+        logger.debug("Chat answer", extra={"chat_id": chat_id, "chars": len(answer)})
 
-        timestamp = datetime.now().isoformat()
-        cur.execute(
-        "INSERT INTO messages (type, user_id, chat_id, message, timestamp) VALUES (%s, %s, %s, %s, %s)",
-        ("user", user_id, chat_id, query, timestamp)
-        )
-        cur.execute(
-            "INSERT INTO messages (type, user_id, chat_id, message, timestamp) VALUES (%s, %s, %s, %s, %s)",
-            ("bot", user_id, chat_id, answer, timestamp)
-        )
+        last_message_id = save_chat_messages(cur, user_id, chat_id, query, answer)
         db.commit()
         cur.close()
+        conversation_store.put(chat_id, chain.memory, last_message_id)
 
-        return jsonify(answer=answer, chainId=chain_id)
+        return jsonify(answer=answer, chainId=chat_id)
     except Exception as e:
-        print(e)
+        logger.exception("Chat completion failed")
         return jsonify(success=False, message="Error fetching GPT-3.5 API"), 500
 
-@app.route("/get-answer-help", methods=["POST"])
-def get_answer_help():
+@app.route("/gpt-api-call-stream", methods=["POST"])
+def gpt_api_call_stream():
+    from streaming import QueueCallbackHandler, stream_events
+
     db = get_db()
     cur = db.cursor()
 
     form_values = request.json
     query = form_values["query"]
     user_id = form_values["id"]
-    question_id = form_values["question_id"]
-    question_answer = form_values.get("question_answer")
-    job_id = form_values.get("job_id")
-    print(user_id)
 
-    embeddings = OpenAIEmbeddings(
-        openai_api_key=openai_api_key,
-        model="text-embedding-ada-002"
+    handler = QueueCallbackHandler()
+    chain, chat_id = build_chat_chain(form_values, cur, db, callbacks=[handler])
+    cur.close()
+    # Give the request's connection back before generating, rather than
+    # holding it idle in a transaction for the length of the stream
+    db.commit()
+    put_conn(g.pop("db"))
+
+    def run():
+        with telemetry.span("llm", "chat_stream"):
+            answer = chain.predict(input=query)
+        # Runs outside the request context, after its connection was released
+        with connection() as conn:
+            worker_cur = conn.cursor()
+            last_message_id = save_chat_messages(worker_cur, user_id, chat_id, query, answer)
+            conn.commit()
+            worker_cur.close()
+        conversation_store.put(chat_id, chain.memory, last_message_id)
+        handler.finish({"answer": answer, "chainId": chat_id})
+
+    return Response(
+        stream_with_context(stream_events(handler, run, {"chainId": chat_id})),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    query_embed = embeddings.embed_query(query)
-
-    resume_docs = index.query(
-        vector=query_embed,
-        filter={
-            "type": {"$eq": "resume"},
-            "user": f"""{user_id}"""
-        },
-        top_k=2,
-        include_metadata=True,
-        namespace=""
-    )
+@app.route("/get-answer-help", methods=["POST"])
+def get_answer_help():
+    from langchain.chat_models import ChatOpenAI
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
 
-    resume_docs_texts = resume_docs["matches"]
+    db = get_db()
+    cur = db.cursor()
 
-    resume_docs_texts_flat = [doc["metadata"]["text"] for doc in resume_docs_texts]
+    form_values = request.json
+    query = form_values["query"]
+    user_id = form_values["id"]
+    question_id = form_values["question_id"]
+    question_answer = form_values.get("question_answer")
+    job_id = form_values.get("job_id")
 
-    resume_docs_str = "\n\n".join(resume_docs_texts_flat)
+    sources = [
+        Source("resume", query, {"type": {"$eq": "resume"}, "user": f"""{user_id}"""}, 2),
+        Source("questions", query, {"type": {"$eq": "questions"}, "user": f"""{user_id}"""}, 2),
+    ]
+    if job_id:
+        sources.append(Source("jobs", query, {"type": {"$eq": "jobs"}, "user": f"""{user_id}"""}, 2))
 
-    try:
-        questions_docs = index.query(
-            vector=query_embed,
-            filter={
-                "type": {"$eq": "questions"},
-                "user": f"""{user_id}"""
-            },
-            top_k=2,
-            include_metadata=True,
-            namespace=""
-        )
-        
-        questions_docs_texts = questions_docs["matches"]
-        questions_docs_texts_flat = [doc["metadata"]["text"] for doc in questions_docs_texts]
-        questions_docs_str = "\n\n".join(questions_docs_texts_flat)
-    except:
-        questions_docs_str = ""
+    matches = retrieve(get_index(), sources)
 
     chat = ChatOpenAI(
         model_name="gpt-3.5-turbo",
@@ -719,22 +604,17 @@ def get_answer_help():
 
         Please answer the question from the user's perspective and provide a recommendation to the user on what they need to include to improve the answer you provided. Your response must be in JSON format with the following properties: "answer": "<Your answer here>", "recommendation": "<Your recommendation here>". Relevant information is provided below. Do not make anything up.\n"""
 
-    if job_id:
+    docs = context_budget.build("get-answer-help", [
+        context_budget.Part("instructions", template_base, None),
+        context_budget.Part("question", query, None),
+        context_budget.Part("jobs", matches.get("jobs", [])),
+        context_budget.Part("resume", matches.get("resume", []), 2),
+    ])
+    resume_docs_str = docs["resume"]
 
-        job_docs = index.query(
-            vector=query_embed,
-            filter={
-                "type": {"$eq": "jobs"},
-                "user": f"""{user_id}"""
-            },
-            top_k=2,
-            include_metadata=True,
-            namespace=""
-        )
+    if job_id:
 
-        job_docs_texts = job_docs["matches"]
-        job_docs_texts_flat = [doc["metadata"]["text"] for doc in job_docs_texts]
-        job_docs_str = "\n\n".join(job_docs_texts_flat)
+        job_docs_str = docs["jobs"]
 
         template_help = template_base + f"""\n\nInformation from the job post the user is applying to:\n {job_docs_str}""" + f"""\n\nInformation from the user's resume:\n {resume_docs_str}"""
 
@@ -744,8 +624,6 @@ def get_answer_help():
 
     template_final = template_help + """\nInterview question: {context}"""
 
-    print(template_final)
-
 
     chain = LLMChain(
         llm=chat,
@@ -754,9 +632,8 @@ def get_answer_help():
     )
     
     try:
-        result_endpoint = chain.run(query)
+        result_endpoint = llm_cache.run(chain, query, user_id=user_id, job_id=job_id)
         answer = json.loads(result_endpoint)
-        print(answer)
 
         cur.execute(
             "UPDATE interview_questions SET recommendation = %s WHERE id = %s",
@@ -768,11 +645,15 @@ def get_answer_help():
 
         return jsonify(answer)
     except Exception as e:
-        print(e)
+        logger.exception("Answer help failed")
         return jsonify(success=False, message="Error fetching GPT-3.5 API"), 500
 
 @app.route("/improve-answer", methods=["POST"])
 def improve_answer():
+    from langchain.chat_models import ChatOpenAI
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+
     db = get_db()
     cur = db.cursor()
 
@@ -782,47 +663,11 @@ def improve_answer():
     question_id = form_values["question_id"]
     question_answer = form_values.get("question_answer")
     job_id = form_values.get("job_id")
-    print(user_id)
-
-    embeddings = OpenAIEmbeddings(
-        openai_api_key=openai_api_key,
-        model="text-embedding-ada-002"
-    )
-
-    query_embed = embeddings.embed_query(query)
-
-    resume_docs = index.query(
-        vector=query_embed,
-        filter={
-            "type": {"$eq": "resume"},
-            "user": f"""{user_id}"""
-        },
-        top_k=2,
-        include_metadata=True,
-        namespace=""
-    )
-
-    resume_docs_texts = resume_docs["matches"]
-
-    resume_docs_texts_flat = [doc["metadata"]["text"] for doc in resume_docs_texts]
-
-    resume_docs_str = "\n\n".join(resume_docs_texts_flat)
-
-    job_docs = index.query(
-        vector=query_embed,
-        filter={
-            "type": {"$eq": "jobs"},
-            "job_id": str(job_id),
-            "user": f"""{user_id}"""
-        },
-        top_k=2,
-        include_metadata=True,
-        namespace=""
-    )
 
-    job_docs_texts = job_docs["matches"]
-    job_docs_texts_flat = [doc["metadata"]["text"] for doc in job_docs_texts]
-    job_docs_str = "\n\n".join(job_docs_texts_flat)
+    matches = retrieve(get_index(), [
+        Source("resume", query, {"type": {"$eq": "resume"}, "user": f"""{user_id}"""}, 2),
+        Source("jobs", query, {"type": {"$eq": "jobs"}, "job_id": str(job_id), "user": f"""{user_id}"""}, 2),
+    ])
 
     chat = ChatOpenAI(
         model_name="gpt-3.5-turbo",
@@ -838,6 +683,15 @@ def improve_answer():
 
         Your response must be in JSON with the following properties: "answer": "" , "recommendation": "". Relevant information is provided below. Do not make anything up.\n""" + f"""Interview question user is answering: {query}\n"""
 
+    docs = context_budget.build("improve-answer", [
+        context_budget.Part("instructions", template_base, None),
+        context_budget.Part("answer", question_answer or "", None),
+        context_budget.Part("resume", matches.get("resume", [])),
+        context_budget.Part("jobs", matches.get("jobs", [])),
+    ])
+    resume_docs_str = docs["resume"]
+    job_docs_str = docs["jobs"]
+
     template_final = template_base + """\nUser's interview question answer: {context}""" + f"""\nInformation from the users resume:\n {resume_docs_str}""" + f"""\nInformation from the job application:\n {job_docs_str}"""
 
     chain = LLMChain(
@@ -847,125 +701,60 @@ def improve_answer():
     )
 
     try:
-        result_endpoint = chain.run(question_answer)
+        result_endpoint = llm_cache.run(chain, question_answer, user_id=user_id, job_id=job_id)
         improved_answer = json.loads(result_endpoint)
-        print(improved_answer)
 
         db.commit()  # Commit the changes to the database
         cur.close()
 
         return jsonify(improved_answer)
     except Exception as e:
-        print(e)
+        logger.exception("Answer improvement failed")
         return jsonify(success=False, message="Error fetching GPT-3.5 API"), 500
 
 @app.route("/generate-interview-questions", methods=["POST"])
 def generate_interview_questions():
     form_values = request.json
-    print(form_values)
     user_id = form_values["user_id"]
     job_id = form_values.get("job_id")
     question_type = form_values["type"]
 
-    chat = ChatOpenAI(
-        model_name="gpt-3.5-turbo",
-        openai_api_key=openai_api_key,
-        temperature=0,
-    )
-
     db = get_db()
     cur = db.cursor()
 
-    cur.execute(f"SELECT * FROM interview_questions WHERE user_id = %s AND job_id = %s", (user_id, job_id))
-
-    existing_questions = cur.fetchall()
-    questions_list = [row[3] for row in existing_questions]
-    questions_str = ', '.join(f'"{question}"' for question in questions_list)
-
-    if question_type == 'WorkExperience':
-        type_string = "that are specifically relevant to their work experience"
-        query = "Work Experience"
-    
-    if question_type == "RoleBased":
-        type_string = "that are specifically relevant to the job"
-        query = "Work Experience"
-
-    if question_type == "Technical":
-        type_string = "that are specifically relevant to their technical capabilities"
-        query = "Technical Skills"
-
-    embeddings = OpenAIEmbeddings(
-        openai_api_key=openai_api_key,
-        model="text-embedding-ada-002"
-    )
-
-    query_embed = embeddings.embed_query(query)
-
-    resume_docs = index.query(
-        vector=query_embed,
-        filter={
-            "type": {"$eq": "resume"},
-            "user": f"""{user_id}"""
-        },
-        top_k=2,
-        include_metadata=True,
-        namespace=""
-    )
-
-    resume_docs_texts = resume_docs["matches"]
+    # Newest first, so the oldest questions are the ones dropped when over budget
+    cur.execute(f"SELECT * FROM interview_questions WHERE user_id = %s AND job_id = %s ORDER BY id DESC", (user_id, job_id))
+    asked = [row[3] for row in cur.fetchall()]
 
-    resume_docs_texts_flat = [doc["metadata"]["text"] for doc in resume_docs_texts]
-
-    resume_docs_str = "\n\n".join(resume_docs_texts_flat)
- 
     if job_id:
-
-        resume = resume_docs_str
+        _, query = prompts.INTERVIEW_QUESTION_TYPES[question_type]
+        matches = retrieve(get_index(), [
+            Source("resume", get_query_vector(query), {"type": {"$eq": "resume"}, "user": f"""{user_id}"""}, 2),
+        ])
 
         cur.execute(f"SELECT * FROM saved_jobs WHERE id = %s AND user_id = %s", (job_id, user_id,))
-
         job = cur.fetchall()
 
-        print(job[0][4])
-
-        template_questions_base = f"""Below is a user's resume and the description for a job they are applying to. Based on the job responsibilities and user's qualifications, please generate 3 interview questions {type_string}. The questions should be related to key skills and experiences required for this job. Please return the questions separated by newlines.
-        
-        Job Description user is applying to:\n {job[0][4]}\n
-        """
-
+        chain, text = prompts.interview_questions(question_type, matches.get("resume", []), asked, job[0][4])
     else:
-        template_questions_base = f"""Below is a user's resume and the description for a job they are applying to. Based on the job responsibilities and user's qualifications, please generate 3 interview questions {type_string}. The questions should be related to key skills and experiences required for this job. Please return the questions separated by newlines."""
-
         cur.execute(f"SELECT * FROM resume WHERE section = %s AND user_id = %s", ("FULL RESUME",user_id,))
-        resume = cur.fetchall()
+        row = cur.fetchone()
 
-    if existing_questions:
-        exclude_similar = f"""These questions have already been asked: [{questions_str}]"""
-    else:
-        exclude_similar = ""
-
-    template_final = template_questions_base + """Information from the user's Resume:\n {context} \n""" + exclude_similar
-
-    chain = LLMChain(
-        llm=chat,
-        verbose=True,
-        prompt=PromptTemplate.from_template(template_final)
-    )
+        chain, text = prompts.interview_questions(question_type, row[3] if row else "", asked)
 
     chain_id = str(int(time.time()))  # Generate a unique identifier based on the current timestamp
 
     try:
-        questions_response = chain(resume)
-        print(questions_response)
+        questions_string = llm_cache.run(chain, text, user_id=user_id, job_id=job_id)
         # Convert the questions string into a Python list
-        questions_string = questions_response['text']
-        questions_list = [re.sub(r'^\d+\.\s*', '', i) for i in questions_string.split('\n')]
+        questions_list = prompts.split_lines(questions_string)
         # Save the questions to the interview_questions table
-        for question in questions_list:
-            cur.execute(
-                "INSERT INTO interview_questions (user_id, job_id, question) VALUES (%s, %s, %s)",
-                (user_id, job_id, question),
-            )
+        bulk_insert(
+            cur,
+            "interview_questions",
+            ("user_id", "job_id", "question"),
+            [(user_id, job_id, question) for question in questions_list],
+        )
 
         # Commit the changes to the database
         db.commit()
@@ -973,7 +762,7 @@ def generate_interview_questions():
 
         return jsonify(questions=questions_list, chainId=chain_id)
     except Exception as e:
-        print(e)
+        logger.exception("Interview question generation failed")
         return jsonify(success=False, message="Error fetching GPT-3.5 API"), 500
 
 
@@ -1022,24 +811,26 @@ def delete_interview_question():
     os.makedirs(user_embeddings_directory, exist_ok=True)
 
     try:
-
-        index.delete(
-            ids=[str(question_id)],
-            namespace=""
-        )
-
         cur.execute("DELETE FROM interview_questions WHERE id = %s AND user_id = %s", (question_id, user_id))
+        vector_outbox.enqueue_delete(cur, user_id, ids=[question_id])
         db.commit()
         cur.close()
+        vector_outbox.notify()
         return jsonify(success=True, message="Interview question deleted successfully")
     except Exception as e:
-        print(e)
+        logger.exception("Error deleting interview question")
         return jsonify(success=False, message="Error deleting the interview question")
 
 
+def save_answer_vector(cur, user_id, question_id, question, answer):
+    # Answered questions are indexed for chat; clearing the answer unindexes it
+    if answer.strip():
+        vector_outbox.enqueue_upserts(cur, user_id, [vector_outbox.answer_document(user_id, question_id, question, answer)])
+    else:
+        vector_outbox.enqueue_delete(cur, user_id, ids=[question_id])
+
 @app.route("/save-answer", methods=["POST"])
 def save_answer():
-
     db = get_db()
     cur = db.cursor()
 
@@ -1054,33 +845,14 @@ def save_answer():
             "UPDATE interview_questions SET answer = %s WHERE id = %s",
             (answer, question_id),
         )
+        save_answer_vector(cur, user_id, question_id, question, answer)
         db.commit()
         cur.close()
-
-        embeddings = OpenAIEmbeddings(
-            openai_api_key=openai_api_key,
-            model="text-embedding-ada-002"
-        )
-
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size = 5000,
-            chunk_overlap  = 20,
-            length_function = len,
-        )
-        docs_chunked = text_splitter.create_documents([f"Question: {question}, Answer: {answer}"])
-        docs_text = [doc.page_content for doc in docs_chunked]
-        docs_embed = embeddings.embed_documents(docs_text)
-        doc_ids = [f"{question_id}"]
-
-        metadatas = [{"type": "questions", "user": str(user_id), "text": _.page_content} for _ in docs_chunked]
-        
-        if answer.strip():
-
-            index.upsert(vectors=zip(doc_ids, docs_embed, metadatas))
+        vector_outbox.notify()
 
         return jsonify(success=True)
     except Exception as e:
-        print(e)
+        logger.exception("Error saving answer")
         return jsonify(success=False, message="Error updating answer"), 500
     
 @app.route("/edit-answer", methods=["POST"])
@@ -1099,34 +871,14 @@ def edit_answer():
             "UPDATE interview_questions SET answer = %s WHERE id = %s",
             (answer, question_id),
         )
+        save_answer_vector(cur, user_id, question_id, question, answer)
         db.commit()
         cur.close()
-
-        embeddings = OpenAIEmbeddings(
-            openai_api_key=openai_api_key,
-            model="text-embedding-ada-002"
-        )
-        
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=5000,
-            chunk_overlap=20,
-            length_function=len,
-        )
-        docs_chunked = text_splitter.create_documents([f"Question: {question}, Answer: {answer}"])
-        docs_text = [doc.page_content for doc in docs_chunked]
-        docs_embed = embeddings.embed_documents(docs_text)
-
-        if answer.strip():
-
-            index.update(
-                id=f"{question_id}",
-                values=docs_embed,
-                namespace=""
-            )
+        vector_outbox.notify()
 
         return jsonify(success=True)
     except Exception as e:
-        print(e)
+        logger.exception("Error editing answer")
         return jsonify(success=False, message="Error updating answer"), 500
 
 @app.route("/generate-recommendations", methods=["POST"])
@@ -1139,100 +891,32 @@ def generate_recommendations():
     job_id = data.get("job_id")
     version_id = data.get("version_id")
 
-    chat = ChatOpenAI(
-        model_name="gpt-3.5-turbo",
-        openai_api_key=openai_api_key,
-        temperature=0,
-    )
-
-    cur.execute(f"SELECT * FROM saved_jobs WHERE id = %s AND user_id = %s", (job_id, user_id,))
-
-    job = cur.fetchall()
-
     cur.execute(f"SELECT * FROM resume WHERE section = %s AND user_id = %s", ("FULL RESUME",user_id,))
     
     resume = cur.fetchone()[3]
 
-    cur.execute(f"SELECT * FROM resume_recommendations WHERE user_id = %s AND job_id = %s", (user_id, job_id,))
+    # Newest first, so the oldest recommendations are the ones dropped when over budget
+    cur.execute(f"SELECT * FROM resume_recommendations WHERE user_id = %s AND job_id = %s ORDER BY id DESC", (user_id, job_id,))
+    recommended = [row[2] for row in cur.fetchall()]
 
-    existing_recommendations = cur.fetchall()
-    recommendations_list = [row[2] for row in existing_recommendations]
-    recommendations_str = ', '.join(f'"{question}"' for question in recommendations_list)
+    matches = retrieve(get_index(), [
+        Source("jobs", get_query_vector("job_requirements"), {"type": {"$eq": "jobs"}, "job_id": str(job_id), "user": f"""{user_id}"""}, 4),
+    ])
 
-    embeddings = OpenAIEmbeddings(
-        openai_api_key=openai_api_key,
-        model="text-embedding-ada-002"
-    )
-
-    query_jobs = embeddings.embed_query("What are the important responsibilities, qualifications, skills, and requirements for this job?")
-
-    jobs_docs = index.query(
-        vector=query_jobs,
-        filter={
-            "type": {"$eq": "jobs"},
-            "job_id": str(job_id),
-            "user": f"""{user_id}"""
-        },
-        top_k=4,
-        include_metadata=True
-    )
-
-    query_resume = embeddings.embed_query("What are the important responsibilities, qualifications, skills, and requirements outlined in this resume?")
-
-    resume_docs = index.query(
-        vector=query_resume,
-        filter={
-            "type": {"$eq": "resume"},
-            "user": f"""{user_id}"""
-        },
-        top_k=2,
-        include_metadata=True,
-        namespace=""
-    )
-
-    jobs_docs_texts = jobs_docs["matches"]
-
-    jobs_docs_texts_flat = [doc["metadata"]["text"] for doc in jobs_docs_texts]
-
-    jobs_docs_str = "\n\n".join(jobs_docs_texts_flat)
-
-    resume_docs_texts = resume_docs["matches"]
-
-    resume_docs_texts_flat = [doc["metadata"]["text"] for doc in resume_docs_texts]
-
-    resume_docs_str = "\n\n".join(resume_docs_texts_flat)
-
-    template_questions_base = f"""Based on the following details about my resume and the job I am applying to, please provide me 5 recommendations on how I can update my resume to increase my chances of landing an interview. The recommendations should cover different areas such as skills, work experience, projects, and format. Each recommendation should be justified in terms of how it matches with the job description or enhances my profile. Please return the recommendations separated by newlines.
-        
-    Job Description Information: {jobs_docs_str}"""
-
-    if existing_recommendations:
-        exclude_similar = f"""These recommendations have already been provided: [{recommendations_str}]"""
-    else:
-        exclude_similar = ""
-
-    template_final = template_questions_base + """\nResume: {context}\n """ + exclude_similar
-
-
-    chain = LLMChain(
-        llm=chat,
-        verbose=True,
-        prompt=PromptTemplate.from_template(template_final)
-    )
+    chain, text = prompts.recommendations(matches.get("jobs", []), resume, recommended)
 
     try:
-        recommendation_response = chain(resume)
-        print(recommendation_response)
+        recommendation_string = llm_cache.run(chain, text, user_id=user_id, job_id=job_id)
         # Convert the questions string into a Python list
-        recommendation_string = recommendation_response['text']
-        recommendation_list = [re.sub(r'^\d+\.\s*', '', i) for i in recommendation_string.split('\n')]
+        recommendation_list = prompts.split_lines(recommendation_string)
 
         # Save the questions to the interview_questions table
-        for recommendation in recommendation_list:
-            cur.execute(
-                "INSERT INTO resume_recommendations (user_id, job_id, recommendation) VALUES (%s, %s, %s)",
-                (user_id, job_id, recommendation),
-            )
+        bulk_insert(
+            cur,
+            "resume_recommendations",
+            ("user_id", "job_id", "recommendation"),
+            [(user_id, job_id, recommendation) for recommendation in recommendation_list],
+        )
 
         # Commit the changes to the database
         db.commit()
@@ -1240,7 +924,7 @@ def generate_recommendations():
 
         return jsonify(recommendations=recommendation_list)
     except Exception as e:
-        print(e)
+        logger.exception("Recommendation generation failed")
         return jsonify(success=False, message="Error fetching GPT-3.5 API"), 500
 
 @app.route("/get-recommendations", methods=["POST"])
@@ -1253,8 +937,6 @@ def get_recommendations():
     version_id = data.get("version_id")
     job_id = data.get("job_id")
 
-    print(data)
-
     # Fetch recommendations based on user_id and version_id
     # Replace 'recommendations' with the appropriate table name and columns
         
@@ -1264,7 +946,7 @@ def get_recommendations():
     db.commit()
     cur.close()
 
-    print("Recommendations fetched:", recommendations) 
+    logger.debug("Recommendations fetched", extra={"count": len(recommendations)})
 
     recommendations_data = [
         {
@@ -1297,22 +979,32 @@ def delete_recommendation():
         cur.close()
         return jsonify(success=True, message="Recommendation deleted successfully")
     except Exception as e:
-        print(e)
+        logger.exception("Error deleting recommendation")
         return jsonify(success=False, message="Error deleting the recommendation")
 
 
 @app.route("/get-jobs", methods=["POST"])
 def get_jobs():
-    db = get_db()
-    cur = db.cursor()
-
     data = request.json
     user_id = data["user_id"]
     page = int(data.get("page", 1))
-    items_per_page = int(data.get("itemsPerPage", 10))
+    items_per_page = pagination.page_size(data.get("itemsPerPage"))
+    try:
+        cursor = pagination.decode_cursor("saved_jobs", data["cursor"]) if data.get("cursor") else None
+    except pagination.InvalidCursor as e:
+        return jsonify(error=str(e)), 400
+
+    db = get_db()
+    cur = db.cursor()
 
-    cur.execute("SELECT * FROM saved_jobs WHERE user_id = %s ORDER BY date_created DESC LIMIT %s OFFSET %s", (user_id, items_per_page, (page - 1) * items_per_page))
-    saved_jobs = cur.fetchall()
+    # Without a cursor, page/itemsPerPage still select the page by OFFSET
+    condition, params = pagination.seek("date_created", cursor)
+    offset = (page - 1) * items_per_page if cursor is None else 0
+    cur.execute(
+        f"SELECT * FROM saved_jobs WHERE user_id = %s AND {condition} {pagination.order_by('date_created')} LIMIT %s OFFSET %s",
+        (user_id, *params, items_per_page + 1, offset),
+    )
+    saved_jobs, next_cursor = pagination.split_page(cur.fetchall(), items_per_page, "saved_jobs", lambda job: (job[7], job[0]))
     cur.close()
 
     jobs = [
@@ -1329,19 +1021,40 @@ def get_jobs():
         for job in saved_jobs
     ]
 
-    return jsonify(jobs=jobs, headers=["Job Title/Role", "Company Name", "Job Description", "Status"])
+    return jsonify(jobs=jobs, headers=["Job Title/Role", "Company Name", "Job Description", "Status"], next_cursor=next_cursor)
+
+JOB_HEADERS = ["Job Title", "Company Name", "Location", "Job Description", "Job Highlights"]
+
+def job_listing(job):
+    return {
+        "id": job[0],
+        "title": job[2],
+        "company_name": job[3],
+        "location": job[4],
+        "description": job[5],
+        "job_highlights": job[6],
+        "date_added": job[7],
+        "saved": job[9],
+        "score": job[11],
+    }
 
 @app.route("/search-jobs", methods=["POST"])
 def search_jobs():
-    db = get_db()
-    cur = db.cursor()
-
     data = request.json
     user_id = data["user_id"]
     page = int(data.get("page", 1))
-    items_per_page = int(data.get("itemsPerPage", 10))
+    items_per_page = pagination.page_size(data.get("itemsPerPage"))
     query = data.get("query")
     location = data.get("location")
+    # Best fit first when ranking is enabled, newest first otherwise
+    sort_column, sort_index = ("score", 11) if job_ranking.JOB_RANKING else ("date_added", 10)
+    try:
+        cursor = pagination.decode_cursor(f"jobs:{sort_column}", data["cursor"]) if data.get("cursor") else None
+    except pagination.InvalidCursor as e:
+        return jsonify(error=str(e)), 400
+
+    db = get_db()
+    cur = db.cursor()
 
     threshold = datetime.now() - timedelta(days=1)
 
@@ -1353,84 +1066,50 @@ def search_jobs():
     )
     recent_jobs = cur.fetchall()
     cur.execute("SELECT job_title FROM users WHERE id = %s", (user_id,))
-    user_job_title = cur.fetchone()
+    row = cur.fetchone()
+    user_job_title = row[0] if row else None
 
     if not recent_jobs:
         
         if not user_job_title:
 
-            embeddings = OpenAIEmbeddings(
-                openai_api_key=openai_api_key,
-                model="text-embedding-ada-002"
-            )
-
-            query_embed = embeddings.embed_query("Current job title and current location/address")
-
-            initialize_profile_docs = index.query(
-                vector=query_embed,
-                filter={
-                    "type": {"$eq": "resume"},
-                    "user": f"""{user_id}"""
-                },
-                top_k=2,
-                include_metadata=True,
-                namespace=""
-            )
-
-            init_docs = initialize_profile_docs["matches"]
-            init_docs_texts_flat = [doc["metadata"]["text"] for doc in init_docs]
-            init_docs_str = "\n\n".join(init_docs_texts_flat)
-
-            chat = ChatOpenAI(
-                model_name="gpt-3.5-turbo",
-                openai_api_key=openai_api_key,
-                temperature=0,
-            )
-
-            template_final = """\nBelow is information from a person's resume. From this information, determine the user's current job title. Return only the job title and nothing else.\n  Here is the information from their resume: {context}"""
-
-            chain = LLMChain(
-                llm=chat,
-                prompt=PromptTemplate.from_template(template_final)
-            )
-
-            initialize_user = chain(init_docs_str)
-
-            user_job_title = initialize_user['text']
+            docs = retrieve_context(get_index(), [
+                Source("resume", get_query_vector("current_title_location"), {"type": {"$eq": "resume"}, "user": f"""{user_id}"""}, 2),
+            ])
+            chain, text = prompts.job_title(docs.get("resume", ""))
+            user_job_title = llm_cache.run(chain, text, user_id=user_id)
     
-        # Call the SERP API job search function if no recent jobs in the database
-        job_results = call_serp_api(user_job_title, location)
+        # Materialize the user's list from the shared search cache if they
+        # have no recent jobs; the SERP API is only called on a cache miss
+        job_results = search_jobs_cached(user_job_title, location)
         # Delete all rows from the jobs table
         cur.execute("DELETE FROM jobs WHERE user_id = %s", (user_id,))
         # Save the job results to the database
-        print(job_results)
-        for job in job_results['jobs_results']:
-            cur.execute("""
-                INSERT INTO jobs (user_id, title, company_name, location, description, job_highlights, source, extensions, date_added)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, current_timestamp)
-            """, (user_id, job["title"], job["company_name"], job["location"], job["description"], ', '.join(job["job_highlights"][0]['items']), job["via"],', '.join(job["extensions"])))
+        new_jobs = job_rows(user_id, job_results)
+        job_ids = bulk_insert(cur, "jobs", JOB_COLUMNS, new_jobs, template=JOB_TEMPLATE, returning=("id",))
+        if job_ranking.JOB_RANKING:
+            # Scored once per refresh; every page below reads the stored score.
+            # Savepoint, so a failed ranking keeps the new jobs
+            cur.execute("SAVEPOINT rank_jobs")
+            try:
+                job_ranking.rank_jobs(cur, user_id, [(row[0], job[1], job[4], job[5]) for row, job in zip(job_ids, new_jobs)])
+                cur.execute("RELEASE SAVEPOINT rank_jobs")
+            except Exception as e:
+                logger.exception("Error ranking jobs")
+                cur.execute("ROLLBACK TO SAVEPOINT rank_jobs")
         db.commit()
 
     # Fetch jobs from the database
-    cur.execute("SELECT * FROM jobs WHERE user_id = %s ORDER BY date_added DESC LIMIT %s OFFSET %s", (user_id, items_per_page, (page - 1) * items_per_page))
-    jobs = cur.fetchall()
+    condition, params = pagination.seek(sort_column, cursor)
+    offset = (page - 1) * items_per_page if cursor is None else 0
+    cur.execute(
+        f"SELECT * FROM jobs WHERE user_id = %s AND {condition} {pagination.order_by(sort_column)} LIMIT %s OFFSET %s",
+        (user_id, *params, items_per_page + 1, offset),
+    )
+    jobs, next_cursor = pagination.split_page(cur.fetchall(), items_per_page, f"jobs:{sort_column}", lambda job: (job[sort_index], job[0]))
     cur.close()
 
-    jobs = [
-        {
-            "id": job[0],
-            "title": job[2],
-            "company_name": job[3],
-            "location": job[4],
-            "description": job[5],
-            "job_highlights": job[6],
-            "date_added": job[7],
-            "saved": job[9],
-        }
-        for job in jobs
-    ]
-
-    return jsonify(jobs=jobs, headers=["Job Title", "Company Name", "Location", "Job Description", "Job Highlights"])
+    return jsonify(jobs=[job_listing(job) for job in jobs], headers=JOB_HEADERS, next_cursor=next_cursor)
 
 @app.route("/create-job", methods=["POST"])
 def create_job():
@@ -1448,7 +1127,7 @@ def create_job():
     id = data.get("id")
     date_created = datetime.utcnow()
 
-    print(user_id, id, saved)
+    logger.debug("Saving job", extra={"user_id": user_id, "job_id": id, "saved": saved})
 
     cur.execute(
         "INSERT INTO saved_jobs (user_id, job_title, company_name, job_description, status, post_url, date_created) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id",
@@ -1469,47 +1148,13 @@ def create_job():
         (user_id, job_id, resume),
     )
 
-    db.commit()
-
-    job_string = f"""
-    Job Title: {job_title}
-
-    Company Name: {company_name}
-
-    Job Description: {job_description}
-
-    Status: {status}
-
-    Post URL: {post_url}
-
-    Date Created: {date_created}
-    """
-
     try:
-
+        vector_outbox.enqueue_upserts(cur, user_id, vector_outbox.job_documents(
+            user_id, job_id, job_title, company_name, job_description, status, post_url, date_created
+        ))
         db.commit()
         cur.close()
-
-        embeddings = OpenAIEmbeddings(
-            openai_api_key=openai_api_key,
-            model="text-embedding-ada-002"
-        )
-
-        text_splitter = RecursiveCharacterTextSplitter(
-            # Set a really small chunk size, just to show.
-            chunk_size = 500,
-            chunk_overlap  = 20,
-            length_function = len,
-        )
-
-        docs_chunked = text_splitter.create_documents([job_string])
-        docs_text = [doc.page_content for doc in docs_chunked]
-        docs_embed = embeddings.embed_documents(docs_text)
-
-        doc_ids = [str(uuid.uuid4()) for _ in docs_chunked]
-        metadatas = [{"type": "jobs", "user": str(user_id), "text": _.page_content, "job_id": str(job_id), "company_name": company_name, "job_title": job_title} for _ in docs_chunked]
-
-        index.upsert(vectors=zip(doc_ids, docs_embed, metadatas))
+        vector_outbox.notify()
 
         return jsonify(
             success=True,
@@ -1524,7 +1169,7 @@ def create_job():
         )
 
     except Exception as e:
-        print(e)
+        logger.exception("Error creating job")
         return jsonify(success=False, message="Error updating answer"), 500
 
 
@@ -1542,11 +1187,19 @@ def edit_joblication(job_id):
     post_url = data["post_url"]
 
     cur.execute(
-        "UPDATE saved_jobs SET user_id = %s, job_title = %s, company_name = %s, job_description = %s, status = %s, post_url = %s WHERE id = %s",
+        "UPDATE saved_jobs SET user_id = %s, job_title = %s, company_name = %s, job_description = %s, status = %s, post_url = %s WHERE id = %s RETURNING date_created",
         (user_id, job_title, company_name, job_description, status, post_url, job_id),
     )
+    row = cur.fetchone()
+    if row is not None:
+        # Reindexed from scratch, as the edit can change the number of chunks
+        vector_outbox.enqueue_delete(cur, user_id, filter={"type": {"$eq": "jobs"}, "job_id": str(job_id), "user": str(user_id)})
+        vector_outbox.enqueue_upserts(cur, user_id, vector_outbox.job_documents(
+            user_id, job_id, job_title, company_name, job_description, status, post_url, row[0]
+        ))
     db.commit()
     cur.close()
+    vector_outbox.notify()
 
     return jsonify(success=True, job_id=job_id)
 
@@ -1558,20 +1211,21 @@ def delete_joblication(job_id):
     db = get_db()
 
     cur = db.cursor()
+    # The job's interview questions go with it (ON DELETE CASCADE), and so do their answer vectors
+    cur.execute("SELECT id FROM interview_questions WHERE job_id = %s AND user_id = %s", (job_id, user_id))
+    question_ids = [row[0] for row in cur.fetchall()]
     # Update the SQL DELETE statement to delete the record that matches both user_id and job_id
     cur.execute(
         "DELETE FROM saved_jobs WHERE id = %s AND user_id = %s", (job_id, user_id)
     )
+    if cur.rowcount:
+        # Metadata values are strings, and Pinecone filters are type sensitive
+        vector_outbox.enqueue_delete(cur, user_id, filter={"type": {"$eq": "jobs"}, "job_id": str(job_id), "user": str(user_id)})
+        if question_ids:
+            vector_outbox.enqueue_delete(cur, user_id, ids=question_ids)
     db.commit()
     cur.close()
-
-    index.delete(
-        filter={
-            "type": {"$eq": "jobs"},
-            "job_id": job_id,
-            "user": user_id
-        }
-    )
+    vector_outbox.notify()
 
     return jsonify(success=True)
 
@@ -1640,12 +1294,6 @@ def generate_cover_letter():
     job_id = data.get("job_id")
     version_id = data.get("version_id")
 
-    chat = ChatOpenAI(
-        model_name="gpt-3.5-turbo",
-        openai_api_key=openai_api_key,
-        temperature=0,
-    )
-
     cur = db.cursor()
 
     cur.execute(f"SELECT * FROM saved_jobs WHERE id = %s AND user_id = %s", (job_id, user_id,))
@@ -1656,29 +1304,13 @@ def generate_cover_letter():
     
     resume = cur.fetchone()
 
-    print(job[4])
-    print(resume[3])
-
-    template_questions_base = f"""Below is a user's resume and the description of a job they are applying to. Please write a cover letter for their job application. Do not make anything up.\n
-        
-    Job Description Information: {job[4]} \n"""
-
-    template_final = template_questions_base + """Resume: {context}\n """
-
-    chain = LLMChain(
-        llm=chat,
-        verbose=True,
-        prompt=PromptTemplate.from_template(template_final)
-    )
+    chain, text = prompts.cover_letter(job[4], resume[3])
 
     try:
-        response = chain(resume[3])
-        print(response)
-        # Convert the questions string into a Python list
-        string = response['text']
+        string = llm_cache.run(chain, text, user_id=user_id, job_id=job_id)
 
-        cur.execute("INSERT INTO cover_letter (user_id, job_id, cover_letter) VALUES (%s, %s, %s)", (user_id, job_id , string),)
-        cover_letter_id = cur.lastrowid  # Get the ID of the inserted row
+        cur.execute("INSERT INTO cover_letter (user_id, job_id, cover_letter) VALUES (%s, %s, %s) RETURNING id", (user_id, job_id , string),)
+        cover_letter_id = cur.fetchone()[0]
 
         # Commit the changes to the database
         db.commit()
@@ -1692,7 +1324,7 @@ def generate_cover_letter():
 
         return jsonify(cover_letter_data)
     except Exception as e:
-        print(e)
+        logger.exception("Cover letter generation failed")
         return jsonify(success=False, message="Error fetching GPT-3.5 API"), 500
     
 @app.route("/get-cover-letter", methods=["POST"])
@@ -1702,8 +1334,6 @@ def get_cover_letter():
     user_id = data["user_id"]
     job_id = data.get("job_id")
 
-    print(data)
-
     cur = db.cursor()
 
     # Fetch recommendations based on user_id and version_id
@@ -1734,8 +1364,6 @@ def save_cover_letter():
     job_id = data.get("job_id")
     new_cover_letter = data.get("cover_letter")
 
-    print(data)
-
     cur = db.cursor()
 
     # Check if cover letter already exists for the user and job
@@ -1774,7 +1402,7 @@ def delete_cover_letter():
         db.commit()
         return jsonify(success=True, message="Cover letter deleted successfully")
     except Exception as e:
-        print(e)
+        logger.exception("Error deleting cover letter")
         return jsonify(success=False, message="Error deleting the cover letter")
 
 @app.route("/get-database-tables", methods=["GET"])
@@ -1787,7 +1415,7 @@ def get_database_tables():
         table_names = list(map(lambda row: {"name": row[0]}, rows))
         return jsonify(tables=table_names)
     except Exception as e:
-        print("Error fetching database tables:", e)
+        logger.exception("Error fetching database tables")
         return jsonify(error="An error occurred while fetching database tables."), 500
 
 
@@ -1797,10 +1425,9 @@ def get_table_data_route(table_name):
     
     try:
         table_data = get_table_data(table_name, user_id)
-        print(table_data)
         return table_data
     except Exception as e:
-        print(f"Error fetching data for table {table_name}:", e)
+        logger.exception("Error fetching table data", extra={"table": table_name})
         return jsonify(error="An error occurred while fetching table data."), 500
     
 @app.route("/delete-row/<string:table_name>/<int:row_id>", methods=["DELETE"])
@@ -1811,7 +1438,7 @@ def delete_row_route(table_name, row_id):
         deleted_rows = delete_row(table_name, row_id, user_id)
         return jsonify(deleted_rows=deleted_rows)
     except Exception as e:
-        print(f"Error deleting row {row_id} from table {table_name}:", e)
+        logger.exception("Error deleting row", extra={"table": table_name, "row_id": row_id})
         return jsonify(error="An error occurred while deleting the row."), 500
 
     
@@ -1820,27 +1447,55 @@ def delete_row_route(table_name, row_id):
 def get_messages_route():
     user_id = request.args.get("user_id")
     chat_id = request.args.get("chat_id")
+    # Paged only on request, so clients that read the whole chat keep getting all of it
+    if request.args.get("limit") or request.args.get("cursor"):
+        limit = pagination.page_size(request.args.get("limit"), pagination.MESSAGES_PAGE_SIZE)
+    else:
+        limit = None
+    try:
+        cursor = pagination.decode_cursor("messages", request.args["cursor"]) if request.args.get("cursor") else None
+    except pagination.InvalidCursor as e:
+        return jsonify(error=str(e)), 400
 
     try:
-        messages = get_messages_by_chat_id(chat_id, user_id)
-        return jsonify(messages)
+        messages, next_cursor = get_messages_by_chat_id(chat_id, user_id, cursor, limit)
+        # The body stays a plain list; older messages are fetched by passing
+        # X-Next-Cursor back as ?cursor=
+        response = jsonify(messages)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
     except Exception as e:
-        print(f"Error fetching messages for chat_id {chat_id}:", e)
+        logger.exception("Error fetching messages", extra={"chat_id": chat_id})
         return jsonify(error="An error occurred while fetching messages."), 500
 
-def get_messages_by_chat_id(chat_id, user_id):
+def get_messages_by_chat_id(chat_id, user_id, cursor=None, limit=pagination.MESSAGES_PAGE_SIZE):
+    """Return the newest `limit` messages before `cursor`, oldest first, and the cursor to older ones.
+
+    A limit of None returns every message before `cursor`.
+    """
     db = get_db()
 
     cur = db.cursor()
 
-    cur.execute("SELECT * FROM messages WHERE chat_id = %s AND user_id = %s", (chat_id, user_id))
+    condition, params = pagination.seek("timestamp", cursor)
+    cur.execute(
+        f"SELECT * FROM messages WHERE chat_id = %s AND user_id = %s AND {condition} {pagination.order_by('timestamp')} LIMIT %s",
+        # LIMIT NULL is no limit
+        (chat_id, user_id, *params, limit + 1 if limit is not None else None),
+    )
     rows = cur.fetchall()
-        
+
     column_names = [column[0] for column in cur.description]
-        
+    cur.close()
+
     result = [dict(zip(column_names, row)) for row in rows]
-        
-    return result
+    next_cursor = None
+    if limit is not None:
+        result, next_cursor = pagination.split_page(result, limit, "messages", lambda message: (message["timestamp"], message["id"]))
+    result.reverse()
+
+    return result, next_cursor
 
 
 if __name__ == "__main__":
@@ -0,0 +1,349 @@
+import functools
+import logging
+import mimetypes
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+import adb
+import ingestion
+import job_ranking
+import llm_cache
+import pagination
+import prompts
+import telemetry
+import warmup
+from app import (
+    JOB_HEADERS,
+    MESSAGE_COLUMNS,
+    SUPPORTED_CONTENT_TYPES,
+    app as flask_app,
+    build_chat_chain,
+    chat_message_rows,
+    job_listing,
+)
+from conversation_store import conversation_store
+from db import connection
+from job_search import JOB_COLUMNS, JOB_TEMPLATE, job_rows, search_jobs_cached
+from query_vectors import get_query_vector
+from retrieval import Source, join_matches, retrieve
+from vector_store import get_index
+
+# Async serving mode, run with e.g. `uvicorn asgi:app --workers 4`.
+#
+# The endpoints that spend their time waiting on OpenAI, Postgres and the
+# ingestion queue run as coroutines: queries go through asyncpg and
+# completions through the OpenAI client's aiohttp session, so one worker keeps
+# hundreds of slow calls in flight without a thread each. Request and response
+# shapes match the Flask routes of the same path. Every other route is the
+# Flask app itself, served on a thread pool through WSGIMiddleware.
+
+_database_ready = False
+
+logger = logging.getLogger(__name__)
+
+telemetry.register_collector("async_db_pool", adb.pool_stats)
+
+
+def jsonify(data, status_code=200):
+    # Flask's encoder, so dates and key order match the WSGI responses
+    return Response(flask_app.json.dumps(data) + "\n", status_code, media_type="application/json")
+
+def as_int(value):
+    # psycopg2 accepted ids sent as strings; asyncpg wants ints
+    return int(value) if value not in (None, "") else None
+
+def endpoint(handler):
+    @functools.wraps(handler)
+    async def wrapper(request):
+        # Same guarantee as the Flask app's before_first_request hook
+        global _database_ready
+        if not _database_ready:
+            await run_in_threadpool(warmup.ensure, "database")
+            _database_ready = True
+
+        # The Flask routes mounted below trace themselves in before_request
+        trace, token = telemetry.start_trace(request.url.path, request.headers.get("x-trace-id"))
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status_code
+            response.headers["X-Trace-Id"] = trace.trace_id
+            return response
+        finally:
+            seconds = telemetry.finish_trace(trace, token, status=status, method=request.method)
+            telemetry.request_seconds.observe(seconds, request.method, trace.name, status)
+    return wrapper
+
+def _retrieve(sources):
+    # The Pinecone client is synchronous; retrieve() fans out on its own pool
+    return retrieve(get_index(), sources)
+
+def _chat_chain(form_values):
+    with connection() as conn:
+        cur = conn.cursor()
+        chain, chat_id = build_chat_chain(form_values, cur, conn)
+        cur.close()
+    return chain, chat_id
+
+@endpoint
+async def gpt_api_call(request):
+    form_values = await request.json()
+    query = form_values["query"]
+    user_id = form_values["id"]
+
+    # Retrieval and restoring the chat memory are short and stay synchronous;
+    # the completion, which is most of the request, is awaited
+    chain, chat_id = await run_in_threadpool(_chat_chain, form_values)
+
+    try:
+        with telemetry.span("llm", "chat"):
+            answer = await chain.apredict(input=query)
+
+        async with adb.connection() as conn:
+            ids = await adb.bulk_insert(
+                conn, "messages", MESSAGE_COLUMNS, chat_message_rows(as_int(user_id), chat_id, query, answer), returning=("id",)
+            )
+        # The bot message is inserted second, so it has the larger id
+        conversation_store.put(chat_id, chain.memory, max(row[0] for row in ids))
+
+        return jsonify({"answer": answer, "chainId": chat_id})
+    except Exception:
+        logger.exception("Chat completion failed")
+        return jsonify({"success": False, "message": "Error fetching GPT-3.5 API"}, 500)
+
+@endpoint
+async def generate_interview_questions(request):
+    form_values = await request.json()
+    user_id = as_int(form_values["user_id"])
+    job_id = form_values.get("job_id")
+    question_type = form_values["type"]
+
+    async with adb.connection() as conn:
+        # Newest first, so the oldest questions are the ones dropped when over budget
+        rows = await conn.fetch(
+            "SELECT * FROM interview_questions WHERE user_id = $1 AND job_id = $2 ORDER BY id DESC", user_id, as_int(job_id)
+        )
+        asked = [row[3] for row in rows]
+        if job_id:
+            job = await conn.fetchrow("SELECT * FROM saved_jobs WHERE id = $1 AND user_id = $2", as_int(job_id), user_id)
+        else:
+            resume = await conn.fetchrow("SELECT * FROM resume WHERE section = $1 AND user_id = $2", "FULL RESUME", user_id)
+
+    if job_id:
+        _, query = prompts.INTERVIEW_QUESTION_TYPES[question_type]
+        matches = await run_in_threadpool(_retrieve, [
+            Source("resume", get_query_vector(query), {"type": {"$eq": "resume"}, "user": f"""{user_id}"""}, 2),
+        ])
+        chain, text = prompts.interview_questions(question_type, matches.get("resume", []), asked, job[4])
+    else:
+        chain, text = prompts.interview_questions(question_type, resume[3] if resume else "", asked)
+
+    chain_id = str(int(time.time()))
+
+    try:
+        questions_string = await llm_cache.arun(chain, text, user_id=user_id, job_id=as_int(job_id))
+        questions_list = prompts.split_lines(questions_string)
+
+        async with adb.connection() as conn:
+            await adb.bulk_insert(
+                conn,
+                "interview_questions",
+                ("user_id", "job_id", "question"),
+                [(user_id, as_int(job_id), question) for question in questions_list],
+            )
+
+        return jsonify({"questions": questions_list, "chainId": chain_id})
+    except Exception:
+        logger.exception("Interview question generation failed")
+        return jsonify({"success": False, "message": "Error fetching GPT-3.5 API"}, 500)
+
+@endpoint
+async def generate_recommendations(request):
+    data = await request.json()
+    user_id = as_int(data["user_id"])
+    job_id = as_int(data.get("job_id"))
+
+    async with adb.connection() as conn:
+        resume = (await conn.fetchrow("SELECT * FROM resume WHERE section = $1 AND user_id = $2", "FULL RESUME", user_id))[3]
+        # Newest first, so the oldest recommendations are the ones dropped when over budget
+        rows = await conn.fetch(
+            "SELECT * FROM resume_recommendations WHERE user_id = $1 AND job_id = $2 ORDER BY id DESC", user_id, job_id
+        )
+        recommended = [row[2] for row in rows]
+
+    matches = await run_in_threadpool(_retrieve, [
+        Source("jobs", get_query_vector("job_requirements"), {"type": {"$eq": "jobs"}, "job_id": str(job_id), "user": f"""{user_id}"""}, 4),
+    ])
+
+    chain, text = prompts.recommendations(matches.get("jobs", []), resume, recommended)
+
+    try:
+        recommendation_string = await llm_cache.arun(chain, text, user_id=user_id, job_id=job_id)
+        recommendation_list = prompts.split_lines(recommendation_string)
+
+        async with adb.connection() as conn:
+            await adb.bulk_insert(
+                conn,
+                "resume_recommendations",
+                ("user_id", "job_id", "recommendation"),
+                [(user_id, job_id, recommendation) for recommendation in recommendation_list],
+            )
+
+        return jsonify({"recommendations": recommendation_list})
+    except Exception:
+        logger.exception("Recommendation generation failed")
+        return jsonify({"success": False, "message": "Error fetching GPT-3.5 API"}, 500)
+
+@endpoint
+async def generate_cover_letter(request):
+    data = await request.json()
+    user_id = data["user_id"]
+    job_id = data.get("job_id")
+
+    async with adb.connection() as conn:
+        job = await conn.fetchrow("SELECT * FROM saved_jobs WHERE id = $1 AND user_id = $2", as_int(job_id), as_int(user_id))
+        resume = await conn.fetchrow("SELECT * FROM resume WHERE section = $1 AND user_id = $2", "FULL RESUME", as_int(user_id))
+
+    chain, text = prompts.cover_letter(job[4], resume[3])
+
+    try:
+        string = await llm_cache.arun(chain, text, user_id=as_int(user_id), job_id=as_int(job_id))
+
+        async with adb.connection() as conn:
+            cover_letter_id = await conn.fetchval(
+                "INSERT INTO cover_letter (user_id, job_id, cover_letter) VALUES ($1, $2, $3) RETURNING id",
+                as_int(user_id),
+                as_int(job_id),
+                string,
+            )
+
+        return jsonify({"id": cover_letter_id, "user_id": user_id, "job_id": job_id, "cover_letter": string})
+    except Exception:
+        logger.exception("Cover letter generation failed")
+        return jsonify({"success": False, "message": "Error fetching GPT-3.5 API"}, 500)
+
+@endpoint
+async def upload_resume(request):
+    form = await request.form()
+    user_id = form.get("id")
+
+    try:
+        resume_file = form["file"]
+        content_type, _ = mimetypes.guess_type(resume_file.filename)
+        resume_buffer = await resume_file.read()
+    except Exception:
+        logger.exception("Error reading uploaded file")
+        return jsonify({"success": False, "message": "Error reading uploaded file."}, 500)
+
+    if content_type not in SUPPORTED_CONTENT_TYPES:
+        return jsonify({"success": False, "message": "Unsupported file type."}, 400)
+
+    async with adb.connection() as conn:
+        job_id = await ingestion.acreate_job(conn, as_int(user_id), resume_file.filename, content_type, resume_buffer)
+
+    ingestion.submit(job_id)
+
+    return jsonify(
+        {"success": True, "job_id": job_id, "status": "queued", "message": "Resume upload queued for processing."}, 202
+    )
+
+@endpoint
+async def search_jobs(request):
+    data = await request.json()
+    user_id = as_int(data["user_id"])
+    page = int(data.get("page", 1))
+    items_per_page = pagination.page_size(data.get("itemsPerPage"))
+    location = data.get("location")
+    sort_column, sort_index = ("score", 11) if job_ranking.JOB_RANKING else ("date_added", 10)
+    try:
+        cursor = pagination.decode_cursor(f"jobs:{sort_column}", data["cursor"]) if data.get("cursor") else None
+    except pagination.InvalidCursor as e:
+        return jsonify({"error": str(e)}, 400)
+
+    threshold = datetime.now() - timedelta(days=1)
+
+    async with adb.connection() as conn:
+        has_recent_jobs = await conn.fetchval(
+            "SELECT EXISTS (SELECT 1 FROM jobs WHERE date_added > $1 AND user_id = $2)", threshold, user_id
+        )
+        user_job_title = await conn.fetchval("SELECT job_title FROM users WHERE id = $1", user_id)
+
+    if not has_recent_jobs:
+
+        if not user_job_title:
+            matches = await run_in_threadpool(_retrieve, [
+                Source("resume", get_query_vector("current_title_location"), {"type": {"$eq": "resume"}, "user": f"""{user_id}"""}, 2),
+            ])
+            chain, text = prompts.job_title(join_matches(matches.get("resume", [])))
+            user_job_title = await llm_cache.arun(chain, text, user_id=user_id)
+
+        # Served from the shared Postgres cache and refreshed in the background,
+        # so the synchronous SERP client is only on this path for a new search
+        job_results = await run_in_threadpool(search_jobs_cached, user_job_title, location)
+        new_jobs = job_rows(user_id, job_results)
+
+        async with adb.connection() as conn:
+            async with conn.transaction():
+                await conn.execute("DELETE FROM jobs WHERE user_id = $1", user_id)
+                job_ids = await adb.bulk_insert(conn, "jobs", JOB_COLUMNS, new_jobs, template=JOB_TEMPLATE, returning=("id",))
+                if job_ranking.JOB_RANKING:
+                    try:
+                        # Savepoint, so a failed ranking keeps the new jobs
+                        async with conn.transaction():
+                            await job_ranking.arank_jobs(
+                                conn, user_id, [(row[0], job[1], job[4], job[5]) for row, job in zip(job_ids, new_jobs)]
+                            )
+                    except Exception:
+                        logger.exception("Error ranking jobs")
+
+    condition, params = pagination.seek(sort_column, cursor)
+    offset = (page - 1) * items_per_page if cursor is None else 0
+    async with adb.connection() as conn:
+        rows = await conn.fetch(
+            adb.placeholders(f"SELECT * FROM jobs WHERE user_id = %s AND {condition} {pagination.order_by(sort_column)} LIMIT %s OFFSET %s"),
+            user_id,
+            *params,
+            items_per_page + 1,
+            offset,
+        )
+    jobs, next_cursor = pagination.split_page(rows, items_per_page, f"jobs:{sort_column}", lambda job: (job[sort_index], job[0]))
+
+    return jsonify({"jobs": [job_listing(job) for job in jobs], "headers": JOB_HEADERS, "next_cursor": next_cursor})
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await adb.close_pool()
+
+
+app = Starlette(
+    routes=[
+        Route("/gpt-api-call", gpt_api_call, methods=["POST"]),
+        Route("/generate-interview-questions", generate_interview_questions, methods=["POST"]),
+        Route("/generate-recommendations", generate_recommendations, methods=["POST"]),
+        Route("/generate-cover-letter", generate_cover_letter, methods=["POST"]),
+        Route("/upload-resume", upload_resume, methods=["POST"]),
+        Route("/search-jobs", search_jobs, methods=["POST"]),
+        Mount("/", app=WSGIMiddleware(flask_app)),
+    ],
+    middleware=[
+        # Mirrors flask_cors's defaults, which the mounted Flask routes still apply
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_methods=["*"],
+            allow_headers=["*"],
+            expose_headers=["X-Next-Cursor", "X-Trace-Id"],
+        ),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,178 @@
+"""Compare throughput of the WSGI (gunicorn) and ASGI (uvicorn) serving modes.
+
+Usage (from server_py/, with DB_URL pointing at a scratch database holding a
+user with a FULL RESUME row and a saved job):
+    python -m benchmarks.async_load_benchmark --user-id 1 --job-id 1 \
+        [--workers 2] [--threads 8] [--concurrency 16,64,256] [--duration 20] [--latency 2]
+
+Both servers are started with the same number of worker processes and driven
+on /generate-cover-letter: two Postgres reads, one completion, one insert. The
+completion comes from a fake OpenAI endpoint in this process that answers
+after --latency seconds, standing in for the real upstream; the LLM cache is
+disabled so every request waits for it. Reported are requests/s, requests/s per
+worker, and requests per CPU second of the server processes (Linux only),
+i.e. requests/s per fully used core.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector, web
+
+SERVER_PORT = 8765
+FAKE_OPENAI_PORT = 8766
+
+
+def server_command(mode, args):
+    if mode == "wsgi":
+        return [
+            sys.executable, "-m", "gunicorn", "wsgi:app",
+            "--workers", str(args.workers), "--worker-class", "gthread", "--threads", str(args.threads),
+            "--bind", f"127.0.0.1:{SERVER_PORT}", "--timeout", "300",
+        ]
+    return [
+        sys.executable, "-m", "uvicorn", "asgi:app",
+        "--workers", str(args.workers), "--host", "127.0.0.1", "--port", str(SERVER_PORT), "--log-level", "warning",
+    ]
+
+async def fake_chat_completion(request):
+    await asyncio.sleep(request.app["latency"])
+    return web.json_response({
+        "id": "chatcmpl-benchmark",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "gpt-3.5-turbo",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "Dear hiring manager, ..."}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1000, "completion_tokens": 300, "total_tokens": 1300},
+    })
+
+async def start_fake_openai(latency):
+    fake = web.Application()
+    fake["latency"] = latency
+    fake.router.add_post("/v1/chat/completions", fake_chat_completion)
+    runner = web.AppRunner(fake, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", FAKE_OPENAI_PORT).start()
+    return runner
+
+def tree_cpu_seconds(root_pid):
+    """utime + stime of a process and all its descendants, from /proc."""
+    if not os.path.isdir("/proc"):
+        return None
+    parents = {}
+    cpu = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        parents[int(entry)] = int(fields[1])
+        cpu[int(entry)] = int(fields[11]) + int(fields[12])
+
+    tree = {root_pid}
+    while True:
+        children = {pid for pid, parent in parents.items() if parent in tree} - tree
+        if not children:
+            break
+        tree |= children
+    return sum(cpu.get(pid, 0) for pid in tree) / os.sysconf("SC_CLK_TCK")
+
+async def wait_until_up(session, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"http://127.0.0.1:{SERVER_PORT}/ready") as response:
+                await response.read()
+                return
+        except (ClientError, OSError):
+            await asyncio.sleep(0.5)
+    raise RuntimeError("server did not start")
+
+async def drive(session, payload, concurrency, duration):
+    url = f"http://127.0.0.1:{SERVER_PORT}/generate-cover-letter"
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                async with session.post(url, json=payload) as response:
+                    await response.read()
+                    ok = response.status == 200
+            except (ClientError, asyncio.TimeoutError):
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.monotonic()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors, time.monotonic() - start
+
+async def run_mode(mode, args, env):
+    server = subprocess.Popen(server_command(mode, args), env=env)
+    try:
+        async with ClientSession(connector=TCPConnector(limit=0), timeout=ClientTimeout(total=300)) as session:
+            await wait_until_up(session)
+            payload = {"user_id": args.user_id, "job_id": args.job_id}
+            # Untimed pass so both modes start with warm pools and imports
+            await drive(session, payload, min(4, max(args.concurrency)), 2)
+
+            for concurrency in args.concurrency:
+                cpu_before = tree_cpu_seconds(server.pid)
+                latencies, errors, elapsed = await drive(session, payload, concurrency, args.duration)
+                cpu_after = tree_cpu_seconds(server.pid)
+
+                rps = len(latencies) / elapsed
+                per_cpu = len(latencies) / (cpu_after - cpu_before) if cpu_before is not None and cpu_after > cpu_before else float("nan")
+                p50 = statistics.median(latencies) if latencies else float("nan")
+                p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 2 else float("nan")
+                print(
+                    f"{mode} | concurrency {concurrency:>4} | {rps:8.1f} req/s | {rps / args.workers:7.1f} req/s/worker"
+                    f" | {per_cpu:8.1f} req/cpu-s | p50 {p50:6.2f}s p95 {p95:6.2f}s | errors {errors}"
+                )
+    finally:
+        server.terminate()
+        server.wait()
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--job-id", type=int, required=True)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--concurrency", type=lambda value: [int(c) for c in value.split(",")], default=[16, 64, 256])
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds the fake OpenAI endpoint takes per completion")
+    parser.add_argument("--modes", default="wsgi,asgi")
+    args = parser.parse_args()
+
+    env = dict(
+        os.environ,
+        OPENAI_API_BASE=f"http://127.0.0.1:{FAKE_OPENAI_PORT}/v1",
+        OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "benchmark"),
+        LLM_CACHE_ENABLED="false",
+        STARTUP_WARMUP="lazy",
+    )
+
+    fake = await start_fake_openai(args.latency)
+    try:
+        for mode in args.modes.split(","):
+            await run_mode(mode, args, env)
+    finally:
+        await fake.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
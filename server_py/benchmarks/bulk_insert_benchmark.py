@@ -0,0 +1,73 @@
+"""Compare row-at-a-time inserts with db.bulk_insert against a local Postgres.
+
+Usage (from server_py/, with DB_URL pointing at a scratch database):
+    python -m benchmarks.bulk_insert_benchmark [--sizes 5,50,500] [--repeat 20]
+
+Rows shaped like a SERP job result are written to a temporary table, once per
+row with cur.execute as the endpoints used to, and once with bulk_insert.
+Each batch is committed, matching one logical write per request.
+"""
+import argparse
+import time
+
+from db import bulk_insert, connection
+
+COLUMNS = ("user_id", "title", "company_name", "location", "description", "date_added")
+
+
+def sample_rows(count):
+    return [
+        (1, f"Software Engineer {i}", "Example Corp", "Remote", "Build and operate services. " * 40)
+        for i in range(count)
+    ]
+
+def per_row(conn, cur, rows):
+    for row in rows:
+        cur.execute(
+            "INSERT INTO bench_jobs (user_id, title, company_name, location, description, date_added) VALUES (%s, %s, %s, %s, %s, current_timestamp)",
+            row,
+        )
+    conn.commit()
+
+def bulk(conn, cur, rows):
+    bulk_insert(cur, "bench_jobs", COLUMNS, rows, template="(%s, %s, %s, %s, %s, current_timestamp)")
+    conn.commit()
+
+def timed(conn, cur, write, rows, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        write(conn, cur, rows)
+    return len(rows) * repeat / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="5,50,500")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TEMPORARY TABLE bench_jobs (
+                id SERIAL PRIMARY KEY, user_id INTEGER, title TEXT, company_name TEXT,
+                location TEXT, description TEXT, date_added TIMESTAMP
+            )
+            """
+        )
+        conn.commit()
+
+        for size in map(int, args.sizes.split(",")):
+            rows = sample_rows(size)
+            # One untimed pass each so both start from a warm table and plan cache
+            per_row(conn, cur, rows)
+            bulk(conn, cur, rows)
+            before = timed(conn, cur, per_row, rows, args.repeat)
+            after = timed(conn, cur, bulk, rows, args.repeat)
+            print(f"{size:>5} rows/batch | per-row {before:10.0f} rows/s | bulk {after:10.0f} rows/s | {after / before:5.1f}x")
+
+        cur.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Check the streaming DOCX extractor against python-docx and compare throughput.
+
+Usage (from server_py/):
+    python -m benchmarks.docx_benchmark path/to/resumes [--repeat 5]
+
+Every .docx in the corpus is extracted with both engines. Documents whose
+text differs are listed; documents python-docx cannot read are skipped, so
+both engines are timed on the same set.
+"""
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+from docx_stream import extract_docx_text_streaming
+from extraction import extract_docx_text_python_docx
+
+
+def load_corpus(directory):
+    return [(path.name, path.read_bytes()) for path in sorted(Path(directory).glob("*.docx"))]
+
+def check_parity(corpus):
+    readable = []
+    mismatches = []
+    for name, data in corpus:
+        try:
+            expected = extract_docx_text_python_docx(data)
+        except Exception as e:
+            print(f"skip {name}: python-docx failed ({e.__class__.__name__}: {e})")
+            continue
+        readable.append((name, data))
+        if extract_docx_text_streaming(data) != expected:
+            mismatches.append(name)
+    return readable, mismatches
+
+def run(corpus, extract, repeat):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, data in corpus:
+            extract(data)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        raise SystemExit(f"No DOCX files found in {args.corpus}")
+
+    readable, mismatches = check_parity(corpus)
+    print(f"parity: {len(readable) - len(mismatches)}/{len(readable)} identical")
+    for name in mismatches:
+        print(f"  mismatch: {name}")
+
+    docs = len(readable) * args.repeat
+    legacy, legacy_peak = run(readable, extract_docx_text_python_docx, args.repeat)
+    streaming, streaming_peak = run(readable, extract_docx_text_streaming, args.repeat)
+    print(f"python-docx: {docs / legacy:8.1f} docs/s | peak {legacy_peak / 2**20:6.1f} MiB")
+    print(f"streaming:   {docs / streaming:8.1f} docs/s | peak {streaming_peak / 2**20:6.1f} MiB")
+    print(f"speedup {legacy / streaming:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compare serial text extraction against the isolated process pool.
+
+Usage (from server_py/):
+    python -m benchmarks.extraction_benchmark path/to/resumes [--repeat 3]
+
+The corpus directory should hold sample .pdf and .docx resumes.
+"""
+import argparse
+import mimetypes
+import time
+from io import BytesIO
+from pathlib import Path
+
+import pdfplumber
+
+import extraction
+
+
+def load_corpus(directory):
+    corpus = []
+    for path in sorted(Path(directory).iterdir()):
+        content_type, _ = mimetypes.guess_type(path.name)
+        if content_type not in (extraction.PDF_CONTENT_TYPE, extraction.DOCX_CONTENT_TYPE):
+            continue
+        data = path.read_bytes()
+        if content_type == extraction.PDF_CONTENT_TYPE:
+            with pdfplumber.open(BytesIO(data)) as pdf:
+                pages = len(pdf.pages)
+        else:
+            # DOCX has no fixed pagination; count each document as one page
+            pages = 1
+        corpus.append((path.name, content_type, data, pages))
+    return corpus
+
+def run(corpus, extract, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, content_type, data, _ in corpus:
+            extract(data, content_type)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        raise SystemExit(f"No PDF or DOCX files found in {args.corpus}")
+
+    # Spin the pool up before timing so worker start-up is not counted
+    extraction.extract_text(corpus[0][2], corpus[0][1])
+
+    for label, content_type in (("pdf", extraction.PDF_CONTENT_TYPE), ("docx", extraction.DOCX_CONTENT_TYPE), ("all", None)):
+        subset = [doc for doc in corpus if content_type in (None, doc[1])]
+        if not subset:
+            continue
+        pages = sum(doc[3] for doc in subset) * args.repeat
+        serial = run(subset, extraction.extract_raw_text, args.repeat)
+        pooled = run(subset, extraction.extract_text, args.repeat)
+        print(
+            f"{label:>4}: {len(subset)} docs, {pages // args.repeat} pages | "
+            f"serial {pages / serial:8.1f} pages/s | "
+            f"pool ({extraction.EXTRACTION_WORKERS} workers) {pages / pooled:8.1f} pages/s | "
+            f"speedup {serial / pooled:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
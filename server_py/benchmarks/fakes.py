@@ -0,0 +1,276 @@
+"""Local stand-ins for the external services, for offline benchmarks.
+
+- HashingEmbeddings: deterministic feature-hashing vectors in place of
+  OpenAIEmbeddings, so texts sharing words score as similar.
+- FakeOpenAI: an HTTP server speaking the chat completions API (plain and
+  streamed) with a canned answer after a configurable latency. ChatOpenAI
+  is pointed at it through OPENAI_API_BASE, so the real client code runs.
+- fixture_serp_results: Google Jobs shaped results built from fixed fixtures.
+- FakeSendGridClient: accepts every message.
+
+install() swaps them into an imported app; the vector index is an in-memory
+LocalIndex.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from types import SimpleNamespace
+
+import numpy as np
+
+EMBEDDING_DIMENSION = 1536
+# Recorded as the model of cached embeddings, so they never mix with real ones
+HASHING_EMBEDDING_MODEL = "benchmark-hashing"
+
+CANNED_ANSWER = """1. Tell me about a project where you improved the performance of a production service.
+2. How do you decide what to measure before optimizing a system?
+3. Describe a time you had to balance delivery speed against code quality.
+4. Which of your skills is most relevant to this role, and why?
+5. What would you focus on in your first 90 days?"""
+
+FIXTURE_TITLES = ["Software Engineer", "Backend Developer", "Data Engineer", "Platform Engineer", "Machine Learning Engineer"]
+FIXTURE_COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Health", "Stark Industries", "Wayne Analytics"]
+FIXTURE_SKILLS = ["Python", "PostgreSQL", "Kubernetes", "AWS", "Flask", "React", "Kafka", "Terraform", "Spark", "Go"]
+
+
+class HashingEmbeddings:
+    """Bag-of-words feature hashing, L2 normalised."""
+
+    def __init__(self, dimension=EMBEDDING_DIMENSION, latency=0.0):
+        self.dimension = dimension
+        self.latency = latency
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        # One round trip per batch, like the OpenAI endpoint
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class _OpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"{self.path} is not faked", "type": "invalid_request_error"}})
+            return
+
+        self.server.requests += 1
+        time.sleep(self.server.latency)
+        answer = self.server.answer
+        if body.get("stream"):
+            self._stream(body, answer)
+        else:
+            self._send_json(200, {
+                "id": "chatcmpl-benchmark",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-3.5-turbo"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1000, "completion_tokens": 100, "total_tokens": 1100},
+            })
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body, answer):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for token in re.findall(r"\S+\s*", answer):
+            chunk = {
+                "id": "chatcmpl-benchmark",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-3.5-turbo"),
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            if self.server.token_latency:
+                time.sleep(self.server.token_latency)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class FakeOpenAI:
+    """Chat completions endpoint on 127.0.0.1, served from a daemon thread."""
+
+    def __init__(self, latency=1.0, token_latency=0.0, answer=CANNED_ANSWER, port=0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), _OpenAIHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.token_latency = token_latency
+        self.server.answer = answer
+        self.server.requests = 0
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-openai", daemon=True)
+
+    @property
+    def api_base(self):
+        return f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def fixture_serp_results(query, location, num_results=50, latency=0.0):
+    """Google Jobs results for a search, the same for the same query and location."""
+    if latency:
+        time.sleep(latency)
+    rng = random.Random(f"{query}|{location}")
+    jobs = []
+    for i in range(min(num_results, 10)):
+        title = f"{rng.choice(['Senior ', '', 'Staff ', 'Lead '])}{rng.choice(FIXTURE_TITLES)}"
+        skills = rng.sample(FIXTURE_SKILLS, 4)
+        jobs.append({
+            "title": title,
+            "company_name": rng.choice(FIXTURE_COMPANIES),
+            "location": location or "Remote",
+            "via": "via LinkedIn",
+            "description": (
+                f"We are hiring a {title} to build and operate our core services. "
+                f"You will work with {', '.join(skills)} and partner with product and data teams. "
+                "Requirements: 3+ years of professional experience, strong communication skills."
+            ),
+            "job_highlights": [{"title": "Qualifications", "items": [f"Experience with {skill}" for skill in skills]}],
+            "extensions": [f"{rng.randint(1, 29)} days ago", "Full-time"],
+        })
+    return {"search_parameters": {"q": f"{query} {location}"}, "jobs_results": jobs}
+
+
+class FakeSendGridClient:
+    sent = 0
+    _lock = threading.Lock()
+
+    def __init__(self, api_key=None, **kwargs):
+        pass
+
+    def send(self, message):
+        with FakeSendGridClient._lock:
+            FakeSendGridClient.sent += 1
+        return SimpleNamespace(status_code=202, body=b"", headers={})
+
+
+def sample_resume_text(seed):
+    rng = random.Random(seed)
+    skills = rng.sample(FIXTURE_SKILLS, 6)
+    jobs = "\n".join(
+        f"{rng.choice(FIXTURE_TITLES)}, {rng.choice(FIXTURE_COMPANIES)} ({2010 + 3 * i}-{2013 + 3 * i})\n"
+        f"Built and operated services in {rng.choice(skills)} and {rng.choice(skills)}, "
+        f"cutting p95 latency by {rng.randint(10, 60)}% and on-call pages by {rng.randint(10, 80)}%.\n"
+        f"Led a team of {rng.randint(2, 8)} engineers through a migration to {rng.choice(skills)}."
+        for i in range(4)
+    )
+    return f"""Jordan Example {seed}
+jordan.example{seed}@example.com | Seattle, WA
+
+Summary
+Engineer with {rng.randint(4, 15)} years of experience building backend systems.
+
+Work Experience
+{jobs}
+
+Education
+B.S. Computer Science, State University
+
+Technical Skills
+{', '.join(skills)}
+"""
+
+def sample_resume_docx(seed):
+    """A minimal .docx holding sample_resume_text(seed), one paragraph per line."""
+    paragraphs = "".join(
+        f'<w:p><w:r><w:t xml:space="preserve">{line.replace("&", "&amp;").replace("<", "&lt;")}</w:t></w:r></w:p>'
+        for line in sample_resume_text(seed).splitlines()
+    )
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        docx.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/>'
+            '</Relationships>'
+        ))
+        docx.writestr("word/document.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{paragraphs}</w:body></w:document>'
+        ))
+    return buffer.getvalue()
+
+
+def install(embedding_latency=0.0, serp_latency=0.0, work_directory=None):
+    """Swap the fakes into the imported app modules. Call before the first request.
+
+    OPENAI_API_BASE has to be set before langchain/openai are imported; the
+    vector index and precomputed query vectors live under work_directory
+    (a temporary directory by default), never in vectordb/.
+    """
+    import tempfile
+    from pathlib import Path
+
+    import email_sending
+    import embedding_cache
+    import job_search
+    import query_vectors
+    import vector_store
+
+    work_directory = Path(work_directory or tempfile.mkdtemp(prefix="resume-bot-benchmark-"))
+
+    embedding_cache._embeddings = embedding_cache.CachedEmbeddings(
+        HashingEmbeddings(latency=embedding_latency), HASHING_EMBEDDING_MODEL
+    )
+    query_vectors.artifact_directory = work_directory / "query_vectors"
+    vector_store._index = vector_store.LocalIndex(directory=work_directory / "local_index", persist=False)
+    job_search.call_serp_api = lambda query, location, num_results=50: fixture_serp_results(
+        query, location, num_results, serp_latency
+    )
+    email_sending.SendGridAPIClient = FakeSendGridClient
+    return work_directory
@@ -0,0 +1,260 @@
+"""Drive realistic request mixes against the Flask app with external services faked.
+
+Usage (from server_py/, with DB_URL pointing at a scratch Postgres database;
+the run adds users, jobs and cache rows to it):
+    python -m benchmarks.scenario_benchmark [--users 20] [--concurrency 8] [--duration 60]
+        [--llm-latency 1.0] [--embedding-latency 0.05] [--serp-latency 0.5]
+        [--mix chat=6,chat_stream=2,questions=2,recommendations=1,cover_letter=1,search_jobs=2,messages=3,forgot_password=1]
+
+The app runs in this process on a threaded werkzeug server, with OpenAI,
+Pinecone, SerpAPI and SendGrid replaced by the stand-ins in benchmarks.fakes
+(see there), so a run needs no network access and no API keys.
+
+Each virtual user first goes through onboarding: register, log in, upload a
+resume and wait until it is saved (its vectors are queued on the outbox),
+save a job, chat once and generate interview questions. Then --concurrency
+clients send requests for --duration seconds, picking a user at random and
+an action by the --mix weights. Reported per endpoint: requests, errors and p50/p95/p99/max latency.
+"""
+import argparse
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks import fakes
+
+DEFAULT_MIX = "chat=6,chat_stream=2,questions=2,recommendations=1,cover_letter=1,search_jobs=2,messages=3,forgot_password=1"
+
+QUESTION_TYPES = ["WorkExperience", "RoleBased", "Technical"]
+CHAT_QUERIES = [
+    "Which of my projects should I lead with for this job?",
+    "How do I explain the gap between my last two roles?",
+    "What are my strongest technical skills?",
+    "Summarize my experience with databases.",
+]
+
+
+class StepFailed(Exception):
+    pass
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, ok):
+        with self._lock:
+            if ok:
+                self.latencies.setdefault(name, []).append(seconds)
+            else:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self):
+        def percentile(values, q):
+            return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+        print(f"{'endpoint':<34} {'requests':>8} {'errors':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies.get(name, []))
+            print(
+                f"{name:<34} {len(values):>8} {self.errors.get(name, 0):>6}"
+                + "".join(f" {percentile(values, q) * 1000:7.0f}ms" for q in (0.5, 0.95, 0.99, 1.0))
+            )
+
+
+class Client:
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.session = requests.Session()
+
+    def call(self, name, method, path, stream=False, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=300, stream=stream, **kwargs)
+            if stream:
+                # Time to the last byte, not to the headers
+                for _ in response.iter_content(chunk_size=None):
+                    pass
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(name, time.perf_counter() - start, ok)
+        if not ok:
+            raise StepFailed(f"{name}: {response.status_code if response is not None else 'connection error'}")
+        return response
+
+
+def onboard(client, run_id, i):
+    email = f"benchmark-{run_id}-{i}@example.com"
+    user = client.call("POST /register", "POST", "/register", json={
+        "first_name": f"Jordan{i}", "last_name": "Example", "email": email,
+        "job_title": "", "location": "Seattle, WA", "password": "benchmark",
+    }).json()
+    client.call("POST /login", "POST", "/login", json={"email": email, "password": "benchmark"})
+
+    start = time.perf_counter()
+    job = client.call(
+        "POST /upload-resume", "POST", "/upload-resume",
+        data={"id": user["id"]},
+        files={"file": (f"resume-{i}.docx", fakes.sample_resume_docx(i))},
+    ).json()
+    deadline = time.monotonic() + 120
+    while True:
+        status = client.call("GET /ingestion-jobs/<id>", "GET", f"/ingestion-jobs/{job['job_id']}").json()["status"]
+        if status in ("succeeded", "failed") or time.monotonic() > deadline:
+            break
+        time.sleep(0.1)
+    client.recorder.record("ingestion (upload to saved)", time.perf_counter() - start, status == "succeeded")
+    if status != "succeeded":
+        raise StepFailed(f"ingestion {status}")
+
+    serp = fakes.fixture_serp_results("Software Engineer", "Seattle, WA", 10)["jobs_results"][i % 10]
+    saved = client.call("POST /create-job", "POST", "/create-job", json={
+        "user_id": user["id"], "job_title": serp["title"], "company_name": serp["company_name"],
+        "job_description": serp["description"], "status": "Applied", "post_url": "", "saved": False,
+    }).json()
+
+    state = {"id": user["id"], "email": email, "first_name": user["first_name"], "job_id": saved["id"], "chat_id": None}
+    chat(client, state)
+    questions(client, state)
+    return state
+
+def chat(client, user):
+    answer = client.call("POST /gpt-api-call", "POST", "/gpt-api-call", json={
+        "query": random.choice(CHAT_QUERIES), "id": user["id"], "first_name": user["first_name"], "chainId": user["chat_id"],
+    }).json()
+    user["chat_id"] = answer["chainId"]
+
+def chat_stream(client, user):
+    client.call("POST /gpt-api-call-stream", "POST", "/gpt-api-call-stream", stream=True, json={
+        "query": random.choice(CHAT_QUERIES), "id": user["id"], "first_name": user["first_name"], "chainId": user["chat_id"],
+    })
+
+def questions(client, user):
+    client.call("POST /generate-interview-questions", "POST", "/generate-interview-questions", json={
+        "user_id": user["id"], "job_id": user["job_id"], "type": random.choice(QUESTION_TYPES),
+    })
+
+def recommendations(client, user):
+    client.call("POST /generate-recommendations", "POST", "/generate-recommendations", json={"user_id": user["id"], "job_id": user["job_id"]})
+
+def cover_letter(client, user):
+    client.call("POST /generate-cover-letter", "POST", "/generate-cover-letter", json={"user_id": user["id"], "job_id": user["job_id"]})
+
+def search_jobs(client, user):
+    client.call("POST /search-jobs", "POST", "/search-jobs", json={"user_id": user["id"], "location": "Seattle, WA", "page": 1})
+
+def messages(client, user):
+    if user["chat_id"] is not None:
+        client.call("GET /get-messages", "GET", "/get-messages", params={"user_id": user["id"], "chat_id": user["chat_id"]})
+
+def forgot_password(client, user):
+    client.call("POST /forgot-password", "POST", "/forgot-password", json={"email": user["email"], "frontendUrl": "http://localhost"})
+
+ACTIONS = {
+    "chat": chat,
+    "chat_stream": chat_stream,
+    "questions": questions,
+    "recommendations": recommendations,
+    "cover_letter": cover_letter,
+    "search_jobs": search_jobs,
+    "messages": messages,
+    "forgot_password": forgot_password,
+}
+
+def parse_mix(value):
+    mix = {}
+    for entry in value.split(","):
+        name, _, weight = entry.partition("=")
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"unknown action {name}; choose from {', '.join(ACTIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def start_app(args, fake_openai):
+    # Read when openai, telemetry and warmup are imported, so set before app is
+    os.environ["OPENAI_API_BASE"] = fake_openai.api_base
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ["STARTUP_WARMUP"] = "lazy"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from werkzeug.serving import make_server
+
+    import app
+
+    fakes.install(embedding_latency=args.embedding_latency, serp_latency=args.serp_latency)
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="benchmark-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60, help="seconds of mixed traffic after onboarding")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="seconds the fake OpenAI endpoint takes per completion")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="seconds per embedding batch")
+    parser.add_argument("--serp-latency", type=float, default=0.5, help="seconds per SerpAPI search")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    fake_openai = fakes.FakeOpenAI(latency=args.llm_latency, token_latency=args.token_latency).start()
+    server, base_url = start_app(args, fake_openai)
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            futures = [executor.submit(onboard, Client(base_url, recorder), run_id, i) for i in range(args.users)]
+            users = []
+            for future in futures:
+                try:
+                    users.append(future.result())
+                except (StepFailed, KeyError, ValueError) as e:
+                    print("Onboarding failed:", repr(e))
+        print(f"Onboarded {len(users)}/{args.users} users in {time.perf_counter() - start:.1f}s")
+        if not users:
+            return
+
+        names, weights = zip(*args.mix.items())
+        deadline = time.monotonic() + args.duration
+
+        def client_loop():
+            client = Client(base_url, recorder)
+            while time.monotonic() < deadline:
+                action = ACTIONS[random.choices(names, weights)[0]]
+                try:
+                    action(client, random.choice(users))
+                except StepFailed:
+                    pass
+
+        threads = [threading.Thread(target=client_loop) for _ in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        print(
+            f"\n{args.concurrency} clients, LLM latency {args.llm_latency}s, embedding latency {args.embedding_latency}s,"
+            f" SERP latency {args.serp_latency}s; {fake_openai.requests} completions, {fakes.FakeSendGridClient.sent} emails\n"
+        )
+        recorder.report()
+    finally:
+        server.shutdown()
+        fake_openai.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Compare resume section splitting before and after slimming spaCy.
+
+Usage (from server_py/):
+    python -m benchmarks.section_benchmark path/to/resumes [--repeat 5]
+
+The corpus directory may hold .txt, .pdf and .docx resumes. The legacy path
+runs the full en_core_web_sm pipeline and scans the keyword list per token;
+the current path only tokenizes and uses the phrase matcher. Peak resident
+memory of each model load is measured in a fresh interpreter.
+"""
+import argparse
+import mimetypes
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import spacy
+
+import resume_parser
+from extraction import extract_raw_text
+
+RSS_SCRIPT = """
+import resource, sys
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+import spacy
+{load}
+nlp("Work Experience\\nBuilt things.")
+print((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) // 1024)
+"""
+
+
+def load_corpus(directory):
+    corpus = []
+    for path in sorted(Path(directory).iterdir()):
+        if path.suffix == ".txt":
+            corpus.append((path.name, path.read_text()))
+            continue
+        content_type, _ = mimetypes.guess_type(path.name)
+        try:
+            corpus.append((path.name, extract_raw_text(path.read_bytes(), content_type)))
+        except ValueError:
+            continue
+    return corpus
+
+def legacy_split(nlp, resume_text):
+    doc = nlp(resume_text)
+
+    sections = []
+    section_starts = []
+    for i, token in enumerate(doc):
+        if token.text.lower().strip() in (keyword.lower() for keyword in resume_parser.SECTION_KEYWORDS) and (i == len(doc) - 1 or doc[i + 1].text == "\n"):
+            section_starts.append(i)
+
+    for idx, start in enumerate(section_starts):
+        end = section_starts[idx + 1] if idx < len(section_starts) - 1 else len(doc)
+        sections.append((doc[start].text, doc[start + 1:end].text))
+    return sections
+
+def timed(split, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, text in corpus:
+            split(text)
+    return (time.perf_counter() - start) / (repeat * len(corpus))
+
+def peak_rss_mb(load):
+    script = RSS_SCRIPT.format(load=load)
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return int(output.stdout.strip())
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        raise SystemExit(f"No resumes found in {args.corpus}")
+
+    full_nlp = spacy.load(resume_parser.SPACY_MODEL)
+    resume_parser.get_nlp()
+
+    legacy = timed(lambda text: legacy_split(full_nlp, text), corpus, args.repeat)
+    current = timed(resume_parser.split_resume_into_sections, corpus, args.repeat)
+    print(f"{len(corpus)} resumes")
+    print(f"legacy:  {legacy * 1000:8.2f} ms/resume")
+    print(f"current: {current * 1000:8.2f} ms/resume | speedup {legacy / current:.1f}x")
+
+    for name, text in corpus:
+        old = [header.lower() for header, _ in legacy_split(full_nlp, text)]
+        new = [header.lower() for header, _ in resume_parser.split_resume_into_sections(text)]
+        if old != new:
+            print(f"  {name}: headings {old} -> {new}")
+
+    full_rss = peak_rss_mb(f"nlp = spacy.load({resume_parser.SPACY_MODEL!r})")
+    slim_rss = peak_rss_mb(f"nlp = spacy.load({resume_parser.SPACY_MODEL!r}, exclude={resume_parser.SPACY_EXCLUDE!r})")
+    print(f"model RSS: full {full_rss} MiB | tokenizer only {slim_rss} MiB | saved {full_rss - slim_rss} MiB")
+
+
+if __name__ == "__main__":
+    main()
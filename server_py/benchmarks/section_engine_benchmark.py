@@ -0,0 +1,62 @@
+"""Compare the automaton section engine with the spaCy engine.
+
+Usage (from server_py/):
+    python -m benchmarks.section_engine_benchmark path/to/resumes [--repeat 5]
+
+For every resume the two engines' headings are compared (case-insensitive).
+The report gives exact agreement, heading-level precision and recall of the
+automaton engine relative to spaCy, and per-resume latency. Startup cost is
+the time to have each engine ready for its first resume.
+"""
+import argparse
+import time
+from collections import Counter
+
+import resume_parser
+from benchmarks.section_benchmark import load_corpus, timed
+
+
+def headings(sections):
+    return [" ".join(header.lower().split()) for header, _ in sections]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        raise SystemExit(f"No resumes found in {args.corpus}")
+
+    start = time.perf_counter()
+    resume_parser.split_with_automaton("")
+    automaton_startup = time.perf_counter() - start
+    start = time.perf_counter()
+    resume_parser.get_nlp()
+    spacy_startup = time.perf_counter() - start
+
+    identical = 0
+    common = spacy_total = automaton_total = 0
+    for name, text in corpus:
+        expected = headings(resume_parser.split_with_spacy(text))
+        actual = headings(resume_parser.split_with_automaton(text))
+        if expected == actual:
+            identical += 1
+        else:
+            print(f"  {name}: spacy {expected} | automaton {actual}")
+        common += sum((Counter(expected) & Counter(actual)).values())
+        spacy_total += len(expected)
+        automaton_total += len(actual)
+
+    print(f"{len(corpus)} resumes, {identical} with identical headings")
+    print(f"automaton precision {common / max(automaton_total, 1):.3f} | recall {common / max(spacy_total, 1):.3f}")
+
+    spacy_latency = timed(resume_parser.split_with_spacy, corpus, args.repeat)
+    automaton_latency = timed(resume_parser.split_with_automaton, corpus, args.repeat)
+    print(f"spacy:     {spacy_latency * 1000:8.2f} ms/resume | startup {spacy_startup * 1000:8.1f} ms")
+    print(f"automaton: {automaton_latency * 1000:8.2f} ms/resume | startup {automaton_startup * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Measure worker cold start: importing app and serving the first request.
+
+Usage (from server_py/):
+    python -m benchmarks.startup_benchmark [--runs 5] [--modes lazy,background,eager]
+
+Every run happens in a fresh interpreter with STARTUP_WARMUP set to the mode
+under test. Reported per mode (median over runs): time to import app, time for
+the first request (GET /ready), time until /ready answers 200, and how long
+each warm-up component took to load.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RUN_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get("/ready")
+first_request = time.perf_counter()
+ready_at = None
+while time.perf_counter() - start < {ready_timeout}:
+    response = client.get("/ready")
+    if response.status_code == 200:
+        ready_at = time.perf_counter()
+        break
+    time.sleep(0.05)
+print(json.dumps({{
+    "import": imported - start,
+    "first_request": first_request - imported,
+    "ready": ready_at - start if ready_at else None,
+    "components": response.get_json()["components"],
+}}))
+"""
+
+
+def run_once(mode, ready_timeout):
+    env = dict(os.environ, STARTUP_WARMUP=mode)
+    output = subprocess.run(
+        [sys.executable, "-c", RUN_SCRIPT.format(ready_timeout=ready_timeout)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def median(values):
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+def ms(value):
+    return f"{value * 1000:8.1f} ms" if value is not None else "     n/a"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", default="lazy,background,eager")
+    parser.add_argument("--ready-timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        runs = [run_once(mode, args.ready_timeout) for _ in range(args.runs)]
+        print(
+            f"{mode:>10}: import {ms(median(r['import'] for r in runs))} | "
+            f"first request {ms(median(r['first_request'] for r in runs))} | "
+            f"ready {ms(median(r['ready'] for r in runs))}"
+        )
+        for name in runs[-1]["components"]:
+            states = [r["components"][name] for r in runs]
+            seconds = median(state["seconds"] for state in states)
+            print(f"{'':>12}{name:<16} {states[-1]['status']:<8} {ms(seconds)}")
+
+
+if __name__ == "__main__":
+    main()
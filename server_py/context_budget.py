@@ -0,0 +1,148 @@
+import logging
+import os
+import threading
+from collections import namedtuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Target size of a whole prompt (instructions plus context); gpt-3.5-turbo has
+# a 4096 token window and the rest is left for the completion
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 3000))
+# Held back from chat prompts for the conversation window memory
+CHAT_HISTORY_TOKEN_RESERVE = int(os.environ.get("CHAT_HISTORY_TOKEN_RESERVE", 800))
+CONTEXT_TOKENIZER_MODEL = os.environ.get("CONTEXT_TOKENIZER_MODEL", "gpt-3.5-turbo")
+# Used only if the tokenizer cannot be loaded (tiktoken fetches its BPE files on first use)
+APPROX_CHARS_PER_TOKEN = 4
+
+# content is a string, which is truncated to fit, or a list of items (vector
+# matches or plain strings) in priority order, from which the lowest priority
+# items are dropped. weight sets the part's share of the budget; a weight of
+# None marks fixed text such as the instructions, which is counted but never cut.
+Part = namedtuple("Part", ["name", "content", "weight", "separator"], defaults=[1, "\n\n"])
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.encoding_for_model(CONTEXT_TOKENIZER_MODEL)
+            except Exception as e:
+                logger.warning("Tokenizer unavailable, estimating token counts", extra={"error": str(e)})
+            _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text):
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return -(-len(text) // APPROX_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate(text, max_tokens):
+    if max_tokens <= 0 or not text:
+        return ""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * APPROX_CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def _item_text(item):
+    # Pinecone returns ScoredVector objects rather than dicts; both subscript
+    return item if isinstance(item, str) else item["metadata"]["text"]
+
+def _items_by_priority(items):
+    # Vector matches are ranked by score; lists of strings are already in priority order
+    if items and not any(isinstance(item, str) for item in items):
+        return sorted(items, key=lambda item: item["score"], reverse=True)
+    return list(items)
+
+def _fit_items(items, separator, max_tokens):
+    separator_tokens = count_tokens(separator)
+    kept = []
+    used = 0
+    for text in items:
+        cost = count_tokens(text) + (separator_tokens if kept else 0)
+        if used + cost <= max_tokens:
+            kept.append(text)
+            used += cost
+    if not kept and items:
+        # Nothing fits whole: keep the start of the best item
+        kept.append(truncate(items[0], max_tokens))
+    return separator.join(text for text in kept if text)
+
+def allocate(needs, weights, budget):
+    """Split budget between parts in proportion to weight.
+
+    Parts needing less than their share get exactly what they need and the
+    remainder is shared out again among the others.
+    """
+    shares = {}
+    remaining = dict(needs)
+    left = max(0, budget)
+    while remaining:
+        total_weight = sum(weights[name] for name in remaining) or 1
+        satisfied = [name for name in remaining if needs[name] <= left * weights[name] / total_weight]
+        if not satisfied:
+            for name in remaining:
+                shares[name] = int(left * weights[name] / total_weight)
+            break
+        for name in satisfied:
+            shares[name] = needs[name]
+            left -= needs[name]
+            del remaining[name]
+    return shares
+
+def build(route, parts, budget=CONTEXT_TOKEN_BUDGET):
+    """Fit parts into budget tokens and log the usage of each one.
+
+    Returns {part name: text}; list parts are joined with their separator.
+    """
+    fixed = {part.name: count_tokens(part.content) for part in parts if part.weight is None}
+    items = {}
+    needs = {}
+    for part in parts:
+        if part.weight is None:
+            continue
+        if isinstance(part.content, str):
+            needs[part.name] = count_tokens(part.content)
+        else:
+            items[part.name] = [_item_text(item) for item in _items_by_priority(part.content)]
+            # Counted item by item, the way _fit_items spends the share
+            needs[part.name] = sum(count_tokens(text) for text in items[part.name]) + count_tokens(part.separator) * max(0, len(items[part.name]) - 1)
+
+    shares = allocate(needs, {part.name: part.weight for part in parts}, budget - sum(fixed.values()))
+
+    context = {}
+    usage = {}
+    total = 0
+    for part in parts:
+        if part.weight is None:
+            context[part.name] = part.content
+            used = fixed[part.name]
+        elif part.name in items:
+            context[part.name] = _fit_items(items[part.name], part.separator, shares[part.name])
+            used = count_tokens(context[part.name])
+        else:
+            context[part.name] = truncate(part.content, shares[part.name])
+            used = count_tokens(context[part.name])
+        total += used
+        # Trimmed parts are logged with the tokens they needed
+        usage[part.name] = {"used": used, "needed": needs[part.name]} if used < needs.get(part.name, used) else used
+
+    logger.info("Prompt context assembled", extra={"route": route, "tokens": usage, "total_tokens": total, "budget": budget})
+    return context
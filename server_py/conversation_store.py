@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHAT_MEMORY_WINDOW = 2
+CHAT_MEMORY_CACHE_SIZE = int(os.environ.get("CHAT_MEMORY_CACHE_SIZE", 500))
+CHAT_MEMORY_TTL = float(os.environ.get("CHAT_MEMORY_TTL", 1800))
+
+
+class ConversationStore:
+    """Bounded LRU/TTL cache of chat window memories.
+
+    The messages table is the source of truth. Each cached memory remembers the
+    id of the last message it has seen; if another worker has since answered in
+    the same chat, the memory is rebuilt from the last few messages rows. Memory
+    held per worker is capped at max_size chats whatever the total number is.
+    """
+
+    def __init__(self, k=CHAT_MEMORY_WINDOW, max_size=CHAT_MEMORY_CACHE_SIZE, ttl=CHAT_MEMORY_TTL):
+        self.k = k
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.rebuilds = 0
+        self.evictions = 0
+
+    def get(self, cur, chat_id):
+        cur.execute("SELECT MAX(id) FROM messages WHERE chat_id = %s", (chat_id,))
+        last_message_id = cur.fetchone()[0]
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry and now - entry[2] < self.ttl and entry[1] == last_message_id:
+                self._entries.move_to_end(chat_id)
+                self._entries[chat_id] = (entry[0], entry[1], now)
+                self.hits += 1
+                return entry[0]
+
+        memory = self._rebuild(cur, chat_id)
+        self.put(chat_id, memory, last_message_id)
+        return memory
+
+    def put(self, chat_id, memory, last_message_id):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[chat_id] = (memory, last_message_id, now)
+            self._entries.move_to_end(chat_id)
+            self._evict(now)
+
+    def discard(self, chat_id):
+        with self._lock:
+            self._entries.pop(chat_id, None)
+
+    def _evict(self, now):
+        while self._entries:
+            chat_id, (_, _, last_used) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_size and now - last_used < self.ttl:
+                break
+            del self._entries[chat_id]
+            self.evictions += 1
+
+    def _rebuild(self, cur, chat_id):
+        from langchain.memory import ConversationBufferWindowMemory
+
+        self.rebuilds += 1
+        cur.execute(
+            "SELECT type, message FROM messages WHERE chat_id = %s ORDER BY id DESC LIMIT %s",
+            (chat_id, self.k * 2),
+        )
+        rows = list(reversed(cur.fetchall()))
+
+        memory = ConversationBufferWindowMemory(k=self.k)
+        pending_input = None
+        for message_type, message in rows:
+            if message_type == "user":
+                pending_input = message
+            elif pending_input is not None:
+                memory.save_context({"input": pending_input}, {"output": message})
+                pending_input = None
+        return memory
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "rebuilds": self.rebuilds,
+                "evictions": self.evictions,
+            }
+
+
+conversation_store = ConversationStore()
@@ -1,216 +1,271 @@
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from pathlib import Path
+from contextlib import contextmanager
 from dotenv import load_dotenv
+import logging
 import os
+import threading
+import time
+import telemetry
 
 load_dotenv()
 
 DB_URL = os.environ.get("DB_URL")
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))
 
 db_path = Path(__file__).resolve().parent / "data.db"
 
-def setup_db():
-    conn = psycopg2.connect(DB_URL)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            first_name TEXT NOT NULL,
-            last_name TEXT,
-            job_title TEXT,
-            location TEXT,
-            email TEXT UNIQUE NOT NULL, 
-            password TEXT NOT NULL
-        );
-
-        CREATE TABLE IF NOT EXISTS chat (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER,
-            chat_id TEXT,
-            chat_name TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        );
-
-        CREATE TABLE IF NOT EXISTS messages (
-            id SERIAL PRIMARY KEY,
-            type TEXT,
-            user_id INTEGER,
-            chat_id INTEGER,
-            message TEXT,
-            timestamp TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (chat_id) REFERENCES chat(id) ON DELETE CASCADE
-        );
-        
-        CREATE TABLE IF NOT EXISTS resume (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER,
-            section TEXT,
-            content TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        );
-        
-        CREATE TABLE IF NOT EXISTS interview_questions (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER,
-            job_id INTEGER,
-            question TEXT,
-            answer TEXT,
-            recommendation TEXT,
-            FOREIGN KEY (job_id) REFERENCES saved_jobs (id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS jobs (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER,
-            title TEXT,
-            company_name TEXT,
-            location TEXT,
-            description TEXT,
-            job_highlights TEXT,
-            source TEXT,
-            extensions TEXT,
-            saved BOOLEAN,
-            date_added TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        );
-
-        CREATE TABLE IF NOT EXISTS saved_jobs (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER,
-            job_title TEXT,
-            company_name TEXT,
-            job_description TEXT,
-            status TEXT,
-            post_url TEXT,
-            date_created TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        );
-
-        CREATE TABLE IF NOT EXISTS resume_versions (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER,
-            job_id INTEGER,
-            version_name TEXT,
-            version_text TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (job_id) REFERENCES saved_jobs (id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS cover_letter (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER,
-            job_id INTEGER,
-            cover_letter TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (job_id) REFERENCES saved_jobs (id) ON DELETE CASCADE
-        );
-
-        CREATE TABLE IF NOT EXISTS resume_recommendations (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER,
-            job_id INTEGER,
-            version_id INTEGER,
-            recommendation TEXT,
-            user_notes TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (job_id) REFERENCES saved_jobs (id) ON DELETE CASCADE,
-            FOREIGN KEY (version_id) REFERENCES resume_versions (id)
-        );
-
-        CREATE TABLE IF NOT EXISTS linkedIn (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER,
-            content TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        );
-
-        CREATE TABLE IF NOT EXISTS password_reset_tokens (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER,
-            token TEXT,
-            expires_at TIMESTAMP WITH TIME ZONE, 
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        );
-
-        """
-    )
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+logger = logging.getLogger(__name__)
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor recording each statement as a "db" span, labelled by verb and table."""
+
+    def execute(self, query, vars=None):
+        with telemetry.span("db", telemetry.sql_operation(query)):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with telemetry.span("db", telemetry.sql_operation(query)):
+            return super().executemany(query, vars_list)
+
+
+class ConnectionPool:
+    """Blocking wrapper around psycopg2's ThreadedConnectionPool.
+
+    psycopg2 raises PoolError as soon as the pool is exhausted; this waits up to
+    DB_POOL_TIMEOUT seconds for a connection instead, pings connections on
+    checkout and keeps the counters reported by stats().
+    """
+
+    def __init__(self, dsn, minconn, maxconn, timeout):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._pool = ThreadedConnectionPool(minconn, maxconn, dsn, cursor_factory=TimedCursor)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.reconnects = 0
+
+    def getconn(self):
+        start = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise psycopg2.pool.PoolError(f"no connection available after {self.timeout}s")
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+                with self._lock:
+                    self.reconnects += 1
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.wait_time += time.monotonic() - start
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return conn
+
+    def putconn(self, conn):
+        close = conn.closed != 0
+        if not close:
+            try:
+                # Never hand a connection with an open transaction to the next request
+                if conn.status != psycopg2.extensions.STATUS_READY:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+        try:
+            self._pool.putconn(conn, close=close)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def owns(self, conn):
+        with self._pool._lock:
+            return id(conn) in self._pool._rused
+
+    def closeall(self):
+        self._pool.closeall()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pid": self.pid,
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self.in_use,
+                "idle": len(self._pool._pool),
+                "peak_in_use": self.peak_in_use,
+                "saturation": self.in_use / self.maxconn,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_time_seconds": round(self.wait_time, 4),
+                "timeouts": self.timeouts,
+                "reconnects": self.reconnects,
+            }
 
-def get_table_data(table_name, user_id):
-    conn = psycopg2.connect(DB_URL)
-    cursor = conn.cursor()
-    print(user_id)
 
-    if user_id == "1":
-        cursor.execute(f"SELECT * FROM {table_name}")
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    # Pools are per process: a gunicorn worker forked from a master that already
+    # opened connections must not share those sockets, so rebuild on a new pid.
+    global _pool
+    pid = os.getpid()
+    if _pool is None or _pool.pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool.pid != pid:
+                _pool = ConnectionPool(DB_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT)
+    return _pool
+
+def get_conn():
+    return get_pool().getconn()
+
+def put_conn(conn):
+    pool = get_pool()
+    if pool.owns(conn):
+        pool.putconn(conn)
     else:
-        if table_name == "users":
-            cursor.execute(f"SELECT * FROM {table_name} WHERE id = %s", (user_id,))
+        # Connection was checked out of a pool inherited from the parent process
+        conn.close()
+
+@contextmanager
+def connection():
+    conn = get_conn()
+    try:
+        yield conn
+    finally:
+        put_conn(conn)
+
+def pool_stats():
+    return get_pool().stats()
+
+def bulk_insert(cur, table, columns, rows, template=None, suffix="", returning=None, page_size=1000):
+    """Insert many rows with one multi-row INSERT per page_size rows.
+
+    `template` overrides the per-row VALUES tuple, e.g. to fill a column with
+    current_timestamp; `suffix` is appended verbatim (ON CONFLICT ...).
+    With `returning`, the returned column values are fetched and returned.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+        sql.Identifier(table),
+        sql.SQL(", ").join(map(sql.Identifier, columns)),
+    ).as_string(cur)
+    if suffix:
+        query += f" {suffix}"
+    if returning:
+        query += f" RETURNING {', '.join(returning)}"
+
+    return execute_values(cur, query, rows, template=template, page_size=page_size, fetch=bool(returning)) or []
+
+def get_table_data(table_name, user_id):
+    with connection() as conn:
+        cursor = conn.cursor()
+
+        if user_id == "1":
+            cursor.execute(f"SELECT * FROM {table_name}")
         else:
-            cursor.execute(f"SELECT * FROM {table_name} WHERE user_id = %s", (user_id,))
+            if table_name == "users":
+                cursor.execute(f"SELECT * FROM {table_name} WHERE id = %s", (user_id,))
+            else:
+                cursor.execute(f"SELECT * FROM {table_name} WHERE user_id = %s", (user_id,))
     
-    result = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]  # get column names
+        result = cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description]  # get column names
 
-    cursor.close()
-    conn.close()
+        cursor.close()
 
-    return [dict(zip(columns, row)) for row in result]  # create a dict for each row
+        return [dict(zip(columns, row)) for row in result]  # create a dict for each row
 
 def delete_row(table_name, row_id, user_id=None):
-    conn = psycopg2.connect(DB_URL)
-    cursor = conn.cursor()
+    with connection() as conn:
+        cursor = conn.cursor()
 
-    if table_name == "chat":
-        cursor.execute("SELECT id FROM chat WHERE id = %s AND user_id = %s", (row_id, user_id))
-        chat_id = cursor.fetchone()
-        if chat_id:
-            cursor.execute("DELETE FROM messages WHERE chat_id = %s", (chat_id[0],))
+        if table_name == "chat":
+            cursor.execute("SELECT id FROM chat WHERE id = %s AND user_id = %s", (row_id, user_id))
+            chat_id = cursor.fetchone()
+            if chat_id:
+                cursor.execute("DELETE FROM messages WHERE chat_id = %s", (chat_id[0],))
 
-    if table_name == "users":
-        cursor.execute(f"DELETE FROM {table_name} WHERE id = %s", (row_id,))
-    else:
-        cursor.execute(f"DELETE FROM {table_name} WHERE id = %s AND user_id = %s", (row_id, user_id))
+        if table_name == "users":
+            cursor.execute(f"DELETE FROM {table_name} WHERE id = %s", (row_id,))
+        else:
+            cursor.execute(f"DELETE FROM {table_name} WHERE id = %s AND user_id = %s", (row_id, user_id))
     
-    count = cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE id = %s", (row_id,))
-    count = cursor.fetchone()[0]
+        count = cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE id = %s", (row_id,))
+        count = cursor.fetchone()[0]
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+        conn.commit()
+        cursor.close()
 
-    return count == 0
+        return count == 0
 
 def drop_all_tables():
-    conn = psycopg2.connect(DB_URL)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        DROP TABLE IF EXISTS password_reset_tokens;
-        DROP TABLE IF EXISTS linkedIn;
-        DROP TABLE IF EXISTS resume_recommendations;
-        DROP TABLE IF EXISTS resume_versions;
-        DROP TABLE IF EXISTS saved_jobs;
-        DROP TABLE IF EXISTS interview_questions;
-        DROP TABLE IF EXISTS resume;
-        DROP TABLE IF EXISTS messages;
-        DROP TABLE IF EXISTS chat;
-        DROP TABLE IF EXISTS jobs;
-        DROP TABLE IF EXISTS users;
-        """
-    )
+    with connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            DROP TABLE IF EXISTS schema_migrations;
+            DROP TABLE IF EXISTS serp_cache;
+            DROP TABLE IF EXISTS llm_cache;
+            DROP TABLE IF EXISTS ingestion_jobs;
+            DROP TABLE IF EXISTS resume_chunks;
+            DROP TABLE IF EXISTS vector_outbox;
+            DROP TABLE IF EXISTS embedding_cache;
+            DROP TABLE IF EXISTS password_reset_tokens;
+            DROP TABLE IF EXISTS linkedIn;
+            DROP TABLE IF EXISTS resume_recommendations;
+            DROP TABLE IF EXISTS resume_versions;
+            DROP TABLE IF EXISTS saved_jobs;
+            DROP TABLE IF EXISTS interview_questions;
+            DROP TABLE IF EXISTS resume;
+            DROP TABLE IF EXISTS messages;
+            DROP TABLE IF EXISTS chat;
+            DROP TABLE IF EXISTS jobs;
+            DROP TABLE IF EXISTS users;
+            """
+        )
     
-    conn.commit()
-    cursor.close()
-    conn.close()
+        conn.commit()
+        cursor.close()
 
-# Initialize the database when the module is loaded
-setup_db()
@@ -0,0 +1,220 @@
+import posixpath
+import re
+import zipfile
+from io import BytesIO
+
+from lxml import etree
+
+# Streaming DOCX text extraction. Produces the same text as the python-docx
+# path in extraction.extract_docx_text_python_docx: every direct run of the
+# body paragraphs, then the paragraphs of every top-level table cell (merged
+# cells repeated as python-docx does), then the primary header and footer of
+# each section. It reads the XML parts directly instead of building the
+# python-docx object model, and resolves styles and relationships once.
+#
+# Hyperlink-styled runs, which the python-docx path cannot read, stand for
+# their link's target: the r:id of an enclosing w:hyperlink, or the URL of a
+# HYPERLINK field. Each target is emitted once, at its first run.
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PR = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+HYPERLINK_RELTYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink"
+_HYPERLINK_FIELD = re.compile(r'\s*HYPERLINK\s+"([^"]+)"')
+
+_parser = etree.XMLParser(resolve_entities=False, huge_tree=True)
+
+
+def _main_document_path(package):
+    rels = etree.fromstring(package.read("_rels/.rels"), _parser)
+    for rel in rels.iter(PR + "Relationship"):
+        if rel.get("Type", "").endswith("/officeDocument"):
+            return rel.get("Target").lstrip("/")
+    return "word/document.xml"
+
+def _part_rels(package, part_path):
+    directory, name = posixpath.split(part_path)
+    rels_path = posixpath.join(directory, "_rels", name + ".rels")
+    if rels_path not in package.namelist():
+        return {}
+
+    rels = {}
+    for rel in etree.fromstring(package.read(rels_path), _parser).iter(PR + "Relationship"):
+        target = rel.get("Target")
+        if rel.get("TargetMode") != "External":
+            target = posixpath.normpath(posixpath.join(directory, target)).lstrip("/")
+        rels[rel.get("Id")] = (rel.get("Type"), target)
+    return rels
+
+def _character_styles(package, rels):
+    styles_path = next((target for reltype, target in rels.values() if reltype.endswith("/styles")), None)
+    if styles_path is None or styles_path not in package.namelist():
+        return {}, None
+
+    names = {}
+    default = None
+    for style in etree.fromstring(package.read(styles_path), _parser).iter(W + "style"):
+        if style.get(W + "type") != "character":
+            continue
+        name = style.find(W + "name")
+        name = name.get(W + "val") if name is not None else None
+        names[style.get(W + "styleId")] = name
+        if style.get(W + "default") in ("1", "true", "on"):
+            default = name
+    return names, default
+
+def _run_text(r):
+    parts = []
+    for child in r:
+        tag = child.tag
+        if tag == W + "t":
+            parts.append(child.text or "")
+        elif tag == W + "tab":
+            parts.append("\t")
+        elif tag == W + "br" or tag == W + "cr":
+            parts.append("\n")
+    return "".join(parts)
+
+def _paragraph_text(p):
+    return "".join(_run_text(r) for r in p.iterchildren(W + "r"))
+
+def _field_hyperlink(r):
+    # URL of the HYPERLINK field r sits in, if any: the nearest instruction
+    # before it in the paragraph, unless that field has already ended
+    for sibling in r.itersiblings(W + "r", preceding=True):
+        for child in sibling:
+            if child.tag == W + "fldChar" and child.get(W + "fldCharType") == "end":
+                return None
+            if child.tag == W + "instrText":
+                match = _HYPERLINK_FIELD.match(child.text or "")
+                return match.group(1) if match else None
+    return None
+
+def _hyperlink_target(r, rels):
+    parent = r.getparent()
+    if parent.tag == W + "hyperlink":
+        reltype, target = rels.get(parent.get(R + "id"), (None, None))
+        target = target if reltype == HYPERLINK_RELTYPE else None
+    else:
+        target = _field_hyperlink(r)
+    if target and (target.startswith("mailto") or target.startswith("http")):
+        return target
+    return None
+
+def _run_style_name(r, styles, default_style):
+    rpr = r.find(W + "rPr")
+    style = rpr.find(W + "rStyle") if rpr is not None else None
+    if style is not None and style.get(W + "val") in styles:
+        return styles[style.get(W + "val")]
+    return default_style
+
+def _table_cells(tbl):
+    grid = tbl.find(W + "tblGrid")
+    column_count = len(grid.findall(W + "gridCol")) if grid is not None else 0
+
+    cells = []
+    for tr in tbl.iterchildren(W + "tr"):
+        for tc in tr.iterchildren(W + "tc"):
+            tcpr = tc.find(W + "tcPr")
+            span = tcpr.find(W + "gridSpan") if tcpr is not None else None
+            grid_span = int(span.get(W + "val")) if span is not None else 1
+            vmerge = tcpr.find(W + "vMerge") if tcpr is not None else None
+            continues = vmerge is not None and vmerge.get(W + "val", "continue") == "continue"
+
+            for span_idx in range(grid_span):
+                if continues and len(cells) >= column_count > 0:
+                    cells.append(cells[-column_count])
+                elif span_idx > 0:
+                    cells.append(cells[-1])
+                else:
+                    cells.append(tc)
+
+    rows = len(tbl.findall(W + "tr"))
+    return [cells[i * column_count:(i + 1) * column_count] for i in range(rows)]
+
+def _section_references(sect_pr):
+    refs = {}
+    for kind in ("header", "footer"):
+        for ref in sect_pr.iterchildren(W + kind + "Reference"):
+            if ref.get(W + "type") == "default":
+                refs[kind] = ref.get(R + "id")
+    return refs
+
+def _header_footer_parts(package, sections, rels):
+    # A section without its own primary header/footer inherits the previous
+    # section's; with none at all python-docx adds an empty one, which reads
+    # as a single empty paragraph.
+    parts = []
+    parsed = {}
+    for i in range(len(sections)):
+        for kind in ("header", "footer"):
+            rid = next((refs[kind] for refs in reversed(sections[:i + 1]) if kind in refs), None)
+            target = rels.get(rid, (None, None))[1]
+            if target is None or target not in package.namelist():
+                parts.append("")
+                continue
+            if target not in parsed:
+                root = etree.fromstring(package.read(target), _parser)
+                parsed[target] = [_paragraph_text(p) for p in root.iterchildren(W + "p")]
+            parts.extend(parsed[target])
+    return parts
+
+def extract_docx_text_streaming(resume_buffer):
+    with zipfile.ZipFile(BytesIO(resume_buffer)) as package:
+        document_path = _main_document_path(package)
+        rels = _part_rels(package, document_path)
+        styles, default_style = _character_styles(package, rels)
+
+        emitted_targets = set()
+
+        paragraph_parts = []
+        table_parts = []
+        sections = []
+
+        with package.open(document_path) as stream:
+            events = etree.iterparse(
+                stream, events=("end",), tag=(W + "p", W + "tbl", W + "sectPr"),
+                resolve_entities=False, huge_tree=True,
+            )
+            for _, elem in events:
+                parent = elem.getparent()
+
+                if elem.tag == W + "sectPr":
+                    if parent.tag == W + "body" or (parent.tag == W + "pPr" and parent.getparent().getparent().tag == W + "body"):
+                        sections.append(_section_references(elem))
+                    continue
+
+                if parent.tag != W + "body":
+                    continue
+
+                if elem.tag == W + "p":
+                    # Direct runs, and hyperlink-styled runs inside w:hyperlink
+                    for r in elem.iter(W + "r"):
+                        run_parent = r.getparent()
+                        if run_parent is not elem and run_parent.tag != W + "hyperlink":
+                            continue
+                        style_name = _run_style_name(r, styles, default_style)
+                        if style_name and "Hyperlink" in style_name:
+                            target = _hyperlink_target(r, rels)
+                            if target is None:
+                                if run_parent is elem:
+                                    paragraph_parts.append(_run_text(r))
+                            elif target not in emitted_targets:
+                                emitted_targets.add(target)
+                                paragraph_parts.append(target)
+                        elif run_parent is elem:
+                            paragraph_parts.append(_run_text(r))
+                else:
+                    for row in _table_cells(elem):
+                        for tc in row:
+                            table_parts.extend(_paragraph_text(p) for p in tc.iterchildren(W + "p"))
+
+                # Free processed body content so memory stays flat on long documents
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+        parts = paragraph_parts + table_parts + _header_footer_parts(package, sections, rels)
+
+    return "\n".join(parts)
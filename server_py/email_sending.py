@@ -1,10 +1,14 @@
+import logging
 import os
+import telemetry
 from flask import Flask
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 
 app = Flask(__name__)
 
+logger = logging.getLogger(__name__)
+
 # Flask-SendGrid configuration
 app.config["SENDGRID_API_KEY"] = os.environ.get("SENDGRID_API_KEY")
 
@@ -16,12 +20,11 @@ def send_email(subject, body, recipients):
     html_content=body)
     try:
         sg = SendGridAPIClient(os.environ.get('SENDGRID_API_KEY'))
-        response = sg.send(message)
-        print(response.status_code)
-        print(response.body)
-        print(response.headers)
+        with telemetry.span("email", "sendgrid"):
+            response = sg.send(message)
+        logger.info("Email sent", extra={"subject": subject, "status_code": response.status_code})
     except Exception as e:
-        print(e.message)
+        logger.error("Email sending failed", extra={"subject": subject, "error": str(e)})
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import psycopg2
+from dotenv import load_dotenv
+
+import telemetry
+from db import bulk_insert, connection
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 10000))
+
+openai_api_key = os.environ.get("OPENAI_API_KEY")
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings:
+    """Drop-in replacement for OpenAIEmbeddings backed by a two-tier cache.
+
+    Vectors are looked up in a bounded in-process LRU first, then in the
+    embedding_cache table, and only the remaining misses are sent to OpenAI
+    (in a single embed_documents call per batch).
+    """
+
+    def __init__(self, embeddings, model, max_size=EMBEDDING_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_size = max_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.db_errors = 0
+
+    def embed_query(self, text):
+        return self.embed_documents([text], query=True)[0]
+
+    def embed_documents(self, texts, query=False):
+        keys = [cache_key(self.model, text) for text in texts]
+        found = self._get_memory(keys)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            from_db = self._get_db(missing)
+            self._count("db_hits", len(from_db))
+            self._put_memory(from_db)
+            found.update(from_db)
+
+        # Dedupe texts so a batch that repeats a string only pays for it once
+        to_embed = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                to_embed.setdefault(key, text)
+
+        if to_embed:
+            self._count("misses", len(to_embed))
+            if query and len(to_embed) == 1:
+                with telemetry.span("embedding", "query"):
+                    vectors = [self.embeddings.embed_query(next(iter(to_embed.values())))]
+            else:
+                with telemetry.span("embedding", "documents"):
+                    vectors = self.embeddings.embed_documents(list(to_embed.values()))
+            computed = dict(zip(to_embed.keys(), vectors))
+            self._put_db(computed)
+            self._put_memory(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def _count(self, name, amount=1):
+        # Called from the retrieval and ingestion threads at once
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _get_memory(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+        return found
+
+    def _put_memory(self, vectors):
+        with self._lock:
+            for key, vector in vectors.items():
+                self._lru[key] = vector
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    # The Postgres tier is best effort: if it is unavailable we still serve
+    # from memory / OpenAI rather than failing the request.
+    def _get_db(self, keys):
+        try:
+            with connection() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    "SELECT key, embedding FROM embedding_cache WHERE key = ANY(%s)",
+                    (list(keys),),
+                )
+                rows = cur.fetchall()
+                cur.close()
+            return {key: list(embedding) for key, embedding in rows}
+        except psycopg2.Error as e:
+            self._count("db_errors")
+            logger.warning("Embedding cache read failed", extra={"error": str(e)})
+            return {}
+
+    def _put_db(self, vectors):
+        try:
+            with connection() as conn:
+                cur = conn.cursor()
+                bulk_insert(
+                    cur,
+                    "embedding_cache",
+                    ("key", "model", "embedding"),
+                    [(key, self.model, vector) for key, vector in vectors.items()],
+                    suffix="ON CONFLICT (key) DO NOTHING",
+                )
+                conn.commit()
+                cur.close()
+        except psycopg2.Error as e:
+            self._count("db_errors")
+            logger.warning("Embedding cache write failed", extra={"error": str(e)})
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "model": self.model,
+                "size": len(self._lru),
+                "max_size": self.max_size,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "db_errors": self.db_errors,
+            }
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                from langchain.embeddings.openai import OpenAIEmbeddings
+
+                _embeddings = CachedEmbeddings(
+                    OpenAIEmbeddings(openai_api_key=openai_api_key, model=EMBEDDING_MODEL),
+                    EMBEDDING_MODEL,
+                )
+    return _embeddings
+
+def embedding_cache_stats():
+    return get_embeddings().stats()
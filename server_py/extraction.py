@@ -0,0 +1,268 @@
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+import multiprocessing
+
+from dotenv import load_dotenv
+
+from docx_stream import extract_docx_text_streaming
+
+load_dotenv()
+
+PDF_CONTENT_TYPE = "application/pdf"
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# EXTRACTION_WORKERS=0 extracts on the calling thread, as before
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", 2))
+EXTRACTION_TIMEOUT = float(os.environ.get("EXTRACTION_TIMEOUT", 60))
+EXTRACTION_MAX_MEMORY_MB = int(os.environ.get("EXTRACTION_MAX_MEMORY_MB", 1024))
+EXTRACTION_MAX_TASKS_PER_CHILD = int(os.environ.get("EXTRACTION_MAX_TASKS_PER_CHILD", 50))
+# PDFs with at least this many pages are split into page ranges across workers
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 6))
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", 3))
+# "streaming" reads the DOCX XML directly; "python-docx" is the original path
+DOCX_EXTRACTOR = os.environ.get("DOCX_EXTRACTOR", "streaming")
+
+
+class ExtractionError(Exception):
+    pass
+
+
+class ExtractionTimeout(ExtractionError):
+    pass
+
+
+def extract_pdf_pages(resume_buffer, start=0, stop=None):
+    import pdfplumber
+
+    with pdfplumber.open(BytesIO(resume_buffer)) as pdf:
+        return [page.extract_text(x_tolerance=1, y_tolerance=1) or "" for page in pdf.pages[start:stop]]
+
+def extract_docx_text_python_docx(resume_buffer):
+    from docx import Document
+
+    parts = []
+    document = Document(BytesIO(resume_buffer))
+
+    # Extracting text from paragraphs
+    for paragraph in document.paragraphs:
+        for run in paragraph.runs:
+            if "Hyperlink" in run.style.name:
+                for rel in run._r.rels.values():
+                    if "mailto" in rel.reltype:
+                        parts.append(rel._target)
+                    elif "http" in rel.reltype:
+                        parts.append(rel._target)
+            else:
+                parts.append(run.text)
+
+    # Extracting text from tables
+    for table in document.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for paragraph in cell.paragraphs:
+                    parts.append(paragraph.text)
+
+    # Extracting text from headers and footers
+    for section in document.sections:
+        header = section.header
+        for paragraph in header.paragraphs:
+            parts.append(paragraph.text)
+
+        footer = section.footer
+        for paragraph in footer.paragraphs:
+            parts.append(paragraph.text)
+
+    return "\n".join(parts)
+
+def extract_docx_text(resume_buffer):
+    if DOCX_EXTRACTOR == "python-docx":
+        return extract_docx_text_python_docx(resume_buffer)
+    return extract_docx_text_streaming(resume_buffer)
+
+def extract_raw_text(resume_buffer, content_type):
+    if content_type == PDF_CONTENT_TYPE:
+        plain_text = "\n".join(extract_pdf_pages(resume_buffer))
+    elif content_type == DOCX_CONTENT_TYPE:
+        plain_text = extract_docx_text(resume_buffer)
+    else:
+        raise ValueError("Unsupported file type")
+    return plain_text.strip()
+
+
+# Everything below runs the same extraction in an isolated process pool, so a
+# pathological document cannot pin a web worker's CPU and memory. On POSIX
+# each worker caps its address space (the closest thing to an RSS limit
+# setrlimit offers), where going over fails the task with MemoryError, and
+# arms a SIGALRM timer per task that fails it with ExtractionTimeout; either
+# way the worker lives on. Elsewhere (Windows) only the caller's deadline is
+# enforced.
+
+def _alarm(signum, frame):
+    raise ExtractionTimeout("Extraction exceeded its time limit")
+
+def _init_worker(max_memory_mb):
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _alarm)
+    try:
+        import resource
+    except ImportError:
+        return
+    if max_memory_mb:
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _run_limited(timeout, func, *args):
+    if not hasattr(signal, "setitimer"):
+        return func(*args)
+    signal.setitimer(signal.ITIMER_REAL, max(timeout, 0.01))
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+def _pdf_task(resume_buffer, min_parallel_pages):
+    import pdfplumber
+
+    # Small PDFs are extracted in one go; large ones report their page count so
+    # the caller can fan page ranges out across the pool
+    with pdfplumber.open(BytesIO(resume_buffer)) as pdf:
+        page_count = len(pdf.pages)
+        if page_count >= min_parallel_pages:
+            return page_count, None
+        return page_count, [page.extract_text(x_tolerance=1, y_tolerance=1) or "" for page in pdf.pages]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _new_pool(workers):
+    options = {}
+    if sys.version_info >= (3, 11):
+        # Recycles workers to bound leaks; not available before 3.11
+        options["max_tasks_per_child"] = EXTRACTION_MAX_TASKS_PER_CHILD
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(EXTRACTION_MAX_MEMORY_MB,),
+        **options,
+    )
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _new_pool(EXTRACTION_WORKERS)
+        return _pool
+
+def _reset_broken_pool():
+    global _pool
+    with _pool_lock:
+        pool, broken = _pool, _pool is not None and _pool._broken
+        if broken:
+            _pool = None
+    if broken:
+        pool.shutdown(wait=False)
+
+def _submit(func, *args):
+    try:
+        return _get_pool().submit(func, *args)
+    except BrokenProcessPool:
+        # A previous task killed its worker; start over with a fresh pool
+        _reset_broken_pool()
+        return _get_pool().submit(func, *args)
+
+def _succeeded(future):
+    return future.done() and not future.cancelled() and future.exception() is None
+
+def _cancel(futures):
+    for future in futures:
+        future.cancel()
+
+def _wait(futures, results, deadline, timeout):
+    # Fill results from {task index: future}; BrokenProcessPool is left to the caller
+    try:
+        for i, future in futures.items():
+            results[i] = future.result(timeout=max(0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        # Drop the tasks still queued; the running one's timer stops it shortly
+        _cancel(futures.values())
+        raise ExtractionTimeout(f"Extraction exceeded {timeout}s")
+    except BrokenProcessPool:
+        raise
+    except MemoryError as e:
+        _cancel(futures.values())
+        raise ExtractionError("Extraction exceeded the memory limit") from e
+    except Exception:
+        _cancel(futures.values())
+        raise
+
+def _run_tasks(tasks, deadline, timeout):
+    """Run (func, *args) tasks in the pool under the deadline; results in task order.
+
+    A worker that dies outright (a crash, the OOM killer) breaks the shared
+    pool and fails every task in it, other uploads' included. The tasks lost
+    that way are run again in a private single-worker pool, so a task that
+    kills its worker a second time fails only its own job.
+    """
+    results = [None] * len(tasks)
+    futures = {i: _submit(_run_limited, deadline - time.monotonic(), *task) for i, task in enumerate(tasks)}
+    try:
+        _wait(futures, results, deadline, timeout)
+        return results
+    except BrokenProcessPool:
+        _reset_broken_pool()
+
+    lost = []
+    for i, future in futures.items():
+        if _succeeded(future):
+            results[i] = future.result()
+        else:
+            lost.append(i)
+    if deadline - time.monotonic() <= 0:
+        raise ExtractionTimeout(f"Extraction exceeded {timeout}s")
+
+    pool = _new_pool(1)
+    try:
+        retried = {i: pool.submit(_run_limited, deadline - time.monotonic(), *tasks[i]) for i in lost}
+        try:
+            _wait(retried, results, deadline, timeout)
+        except BrokenProcessPool as e:
+            raise ExtractionError("Extraction worker died (memory limit exceeded or crashed)") from e
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+def extract_text(resume_buffer, content_type, timeout=EXTRACTION_TIMEOUT):
+    if EXTRACTION_WORKERS <= 0:
+        return extract_raw_text(resume_buffer, content_type)
+
+    deadline = time.monotonic() + timeout
+
+    if content_type == PDF_CONTENT_TYPE:
+        [(page_count, pages)] = _run_tasks([(_pdf_task, resume_buffer, PDF_PARALLEL_MIN_PAGES)], deadline, timeout)
+
+        if pages is None:
+            chunks = _run_tasks(
+                [
+                    (extract_pdf_pages, resume_buffer, start, start + PDF_PAGES_PER_TASK)
+                    for start in range(0, page_count, PDF_PAGES_PER_TASK)
+                ],
+                deadline,
+                timeout,
+            )
+            pages = [page for chunk in chunks for page in chunk]
+
+        plain_text = "\n".join(pages)
+    elif content_type == DOCX_CONTENT_TYPE:
+        [plain_text] = _run_tasks([(extract_docx_text, resume_buffer)], deadline, timeout)
+    else:
+        raise ValueError("Unsupported file type")
+
+    return plain_text.strip()
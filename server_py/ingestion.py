@@ -0,0 +1,280 @@
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from dotenv import load_dotenv
+
+import telemetry
+import vector_outbox
+from db import bulk_insert, connection
+from extraction import DOCX_CONTENT_TYPE, PDF_CONTENT_TYPE, extract_text
+from resume_parser import split_resume_into_sections
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+INGESTION_WORKERS = int(os.environ.get("INGESTION_WORKERS", 2))
+INGESTION_MAX_ATTEMPTS = int(os.environ.get("INGESTION_MAX_ATTEMPTS", 3))
+INGESTION_RETRY_DELAY = float(os.environ.get("INGESTION_RETRY_DELAY", 5))
+# A running job whose worker died is picked up again after this many seconds
+INGESTION_STALE_AFTER = int(os.environ.get("INGESTION_STALE_AFTER", 600))
+
+# Advisory lock namespace serialising ingestion per user
+RESUME_LOCK_NAMESPACE = 1001
+
+RESUME_CHUNK_SIZE = 500
+RESUME_CHUNK_OVERLAP = 20
+
+VECTOR_ID_NAMESPACE = uuid.UUID("6f1c4c1e-8f1a-4d55-9a53-8a3c6bd3f0b1")
+
+_executor = ThreadPoolExecutor(max_workers=INGESTION_WORKERS, thread_name_prefix="ingestion")
+
+
+def chunk_resume(plain_text):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size = RESUME_CHUNK_SIZE,
+        chunk_overlap  = RESUME_CHUNK_OVERLAP,
+        length_function = len,
+    )
+    return [doc.page_content for doc in text_splitter.create_documents([plain_text])]
+
+CREATE_JOB_SQL = """
+    INSERT INTO ingestion_jobs (id, user_id, filename, content_type, file, status, stage)
+    VALUES (%s, %s, %s, %s, %s, 'queued', 'queued')
+"""
+
+def create_job(cur, user_id, filename, content_type, file_bytes):
+    job_id = str(uuid.uuid4())
+    cur.execute(CREATE_JOB_SQL, (job_id, user_id, filename, content_type, psycopg2.Binary(file_bytes)))
+    return job_id
+
+async def acreate_job(conn, user_id, filename, content_type, file_bytes):
+    import adb
+
+    job_id = str(uuid.uuid4())
+    await conn.execute(adb.placeholders(CREATE_JOB_SQL), job_id, user_id, filename, content_type, file_bytes)
+    return job_id
+
+def submit(job_id, delay=0):
+    if delay:
+        timer = threading.Timer(delay, submit, args=(job_id,))
+        timer.daemon = True
+        timer.start()
+    else:
+        _executor.submit(run_job, job_id)
+
+def get_job(cur, job_id):
+    cur.execute(
+        "SELECT id, user_id, filename, status, stage, attempts, error, created_at, updated_at FROM ingestion_jobs WHERE id = %s",
+        (job_id,),
+    )
+    row = cur.fetchone()
+    if row is None:
+        return None
+    columns = [column[0] for column in cur.description]
+    return dict(zip(columns, row))
+
+def resume_pending_jobs():
+    # Re-queue work left behind by a restart or a crashed worker
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT id FROM ingestion_jobs
+            WHERE status = 'queued'
+               OR (status = 'running' AND updated_at < current_timestamp - %s * INTERVAL '1 second')
+            ORDER BY created_at
+            """,
+            (INGESTION_STALE_AFTER,),
+        )
+        job_ids = [row[0] for row in cur.fetchall()]
+        cur.close()
+
+    for job_id in job_ids:
+        submit(job_id)
+    return job_ids
+
+
+def _claim(job_id):
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE ingestion_jobs
+            SET status = 'running', attempts = attempts + 1, error = NULL, updated_at = current_timestamp
+            WHERE id = %s
+              AND (status = 'queued'
+                   OR (status = 'running' AND updated_at < current_timestamp - %s * INTERVAL '1 second'))
+            RETURNING user_id, content_type, file, attempts
+            """,
+            (job_id, INGESTION_STALE_AFTER),
+        )
+        row = cur.fetchone()
+        conn.commit()
+        cur.close()
+    return row
+
+def _set_stage(job_id, stage, status=None, error=None):
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE ingestion_jobs
+            SET stage = %s, status = COALESCE(%s, status), error = %s, updated_at = current_timestamp
+            WHERE id = %s
+            """,
+            (stage, status, error, job_id),
+        )
+        conn.commit()
+        cur.close()
+
+def run_job(job_id):
+    claimed = _claim(job_id)
+    if claimed is None:
+        # Already finished or being processed by another worker
+        return
+
+    user_id, content_type, file_bytes, attempts = claimed
+    try:
+        with telemetry.trace("ingestion"):
+            ingest_resume(job_id, user_id, content_type, bytes(file_bytes))
+    except Exception as e:
+        logger.warning("Ingestion job failed", extra={"job_id": job_id, "attempt": attempts, "error": str(e)})
+        if attempts < INGESTION_MAX_ATTEMPTS:
+            _set_stage(job_id, "queued", status="queued", error=str(e))
+            submit(job_id, delay=INGESTION_RETRY_DELAY * attempts)
+        else:
+            _set_stage(job_id, "failed", status="failed", error=str(e))
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_vector_id(user_id, digest):
+    return str(uuid.uuid5(VECTOR_ID_NAMESPACE, f"{user_id}:{digest}"))
+
+def _indexed_file_hash(user_id):
+    # Hash of the file behind the user's current resume rows and vectors
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT file_hash FROM ingestion_jobs
+            WHERE user_id = %s AND status = 'succeeded' AND file_hash IS NOT NULL
+              AND EXISTS (SELECT 1 FROM resume_chunks WHERE user_id = %s)
+            ORDER BY updated_at DESC
+            LIMIT 1
+            """,
+            (user_id, user_id),
+        )
+        row = cur.fetchone()
+        cur.close()
+    return row[0] if row else None
+
+def _manifest(cur, user_id):
+    cur.execute("SELECT chunk_hash, vector_id FROM resume_chunks WHERE user_id = %s", (user_id,))
+    return dict(cur.fetchall())
+
+def _finish(job_id, file_hash):
+    with connection() as conn:
+        cur = conn.cursor()
+        # The upload itself is no longer needed once the job has succeeded
+        cur.execute(
+            """
+            UPDATE ingestion_jobs
+            SET status = 'succeeded', stage = 'done', error = NULL, file = NULL, file_hash = %s,
+                updated_at = current_timestamp
+            WHERE id = %s
+            """,
+            (file_hash, job_id),
+        )
+        conn.commit()
+        cur.close()
+
+def ingest_resume(job_id, user_id, content_type, file_bytes):
+    """Parse an uploaded resume and queue the index writes it needs.
+
+    Only the work the upload changes is done: the same file as the indexed
+    resume is not parsed at all, and of a new one only the chunks missing
+    from the user's resume_chunks manifest are queued for embedding.
+
+    The resume rows, the manifest and the queued vector writes are committed
+    in one transaction, so a failure at any point leaves either the old
+    resume or the new one, never vectors without the rows describing them.
+    """
+    file_hash = hashlib.sha256(file_bytes).hexdigest()
+    if file_hash == _indexed_file_hash(user_id):
+        logger.info("Resume unchanged, skipping ingestion", extra={"job_id": job_id, "user_id": user_id})
+        _finish(job_id, file_hash)
+        return
+
+    _set_stage(job_id, "extracting")
+    kind = {PDF_CONTENT_TYPE: "pdf", DOCX_CONTENT_TYPE: "docx"}.get(content_type, "other")
+    with telemetry.span("extraction", kind):
+        plain_text = extract_text(file_bytes, content_type)
+
+    _set_stage(job_id, "sectioning")
+    with telemetry.span("extraction", "sections"):
+        resume_sections = split_resume_into_sections(plain_text)
+
+    # A chunk repeated in the resume is indexed once
+    chunks = {chunk_hash(text): text for text in chunk_resume(plain_text)}
+    user = str(user_id)
+
+    _set_stage(job_id, "saving")
+    with connection() as conn:
+        cur = conn.cursor()
+        # Two uploads from the same user are diffed and saved one after the other
+        cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (RESUME_LOCK_NAMESPACE, user_id))
+        manifest = _manifest(cur, user_id)
+        added = [digest for digest in chunks if digest not in manifest]
+        vanished = [digest for digest in manifest if digest not in chunks]
+
+        # The index writes are queued with the rows they describe and applied
+        # by the outbox flusher, upserts before the delete
+        vector_outbox.enqueue_upserts(cur, user_id, [
+            (
+                chunk_vector_id(user_id, digest),
+                chunks[digest],
+                {"type": "resume", "user": user, "text": chunks[digest], "chunk_hash": digest, "ingestion_job": job_id},
+            )
+            for digest in added
+        ])
+        # Without a manifest the user's vectors predate it, and everything
+        # outside the new chunks goes
+        if vanished or not manifest:
+            vector_outbox.enqueue_delete(
+                cur,
+                user_id,
+                filter={
+                    "type": {"$eq": "resume"},
+                    "user": user,
+                    "chunk_hash": {"$nin": list(chunks)},
+                },
+            )
+
+        cur.execute("DELETE FROM resume WHERE user_id=%s", (user_id, ))
+        bulk_insert(
+            cur,
+            "resume",
+            ("user_id", "section", "content"),
+            [(user_id, "FULL RESUME", plain_text)] + [(user_id, section, content) for section, content in resume_sections],
+        )
+        cur.execute("DELETE FROM resume_chunks WHERE user_id = %s", (user_id,))
+        bulk_insert(
+            cur,
+            "resume_chunks",
+            ("user_id", "chunk_hash", "vector_id"),
+            [(user_id, digest, manifest.get(digest) or chunk_vector_id(user_id, digest)) for digest in chunks],
+        )
+        conn.commit()
+        cur.close()
+    vector_outbox.notify()
+
+    _finish(job_id, file_hash)
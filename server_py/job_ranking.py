@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+import telemetry
+from embedding_cache import get_embeddings
+from ingestion import chunk_resume
+
+load_dotenv()
+
+# When enabled, /search-jobs scores every job of a refresh against the user's
+# resume and pages through them by score instead of insertion order
+JOB_RANKING = os.environ.get("JOB_RANKING", "false").lower() == "true"
+# Long descriptions are cut before embedding; the opening carries most of the signal
+JOB_RANKING_MAX_CHARS = int(os.environ.get("JOB_RANKING_MAX_CHARS", 4000))
+
+
+def job_text(title, description, highlights):
+    return "\n".join(part for part in (title, highlights, description) if part)[:JOB_RANKING_MAX_CHARS]
+
+def _normalized(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def max_sim(job_vectors, resume_vectors):
+    """Score each job by its best cosine similarity to any resume chunk."""
+    return (_normalized(job_vectors) @ _normalized(resume_vectors).T).max(axis=1)
+
+RESUME_SQL = "SELECT content FROM resume WHERE user_id = %s AND section = %s"
+
+def embed_resume(content):
+    # Chunked exactly as at ingestion, so these are embedding cache hits
+    if not content:
+        return None
+    return get_embeddings().embed_documents(chunk_resume(content))
+
+def resume_vectors(cur, user_id):
+    cur.execute(RESUME_SQL, (user_id, "FULL RESUME"))
+    row = cur.fetchone()
+    return embed_resume(row[0] if row else None)
+
+def score_jobs(resume, jobs):
+    """[(id, score)] for (id, title, description, highlights) jobs against resume vectors."""
+    job_vectors = get_embeddings().embed_documents([job_text(*job[1:]) for job in jobs])
+    return [(job[0], float(score)) for job, score in zip(jobs, max_sim(job_vectors, resume))]
+
+def rank_jobs(cur, user_id, jobs):
+    """Store a fit score on each (id, title, description, highlights) jobs row.
+
+    Runs once per search refresh, inside the caller's transaction; pages then
+    only read the stored score. Returns False if the user has no resume yet.
+    """
+    if not jobs:
+        return True
+    resume = resume_vectors(cur, user_id)
+    if not resume:
+        return False
+
+    execute_values(
+        cur,
+        "UPDATE jobs SET score = data.score FROM (VALUES %s) AS data (id, score) WHERE jobs.id = data.id",
+        score_jobs(resume, jobs),
+        template="(%s, %s::double precision)",
+    )
+    return True
+
+async def arank_jobs(conn, user_id, jobs):
+    """rank_jobs for an asyncpg connection; embedding runs on the default executor."""
+    import adb
+
+    if not jobs:
+        return True
+    content = await conn.fetchval(adb.placeholders(RESUME_SQL), user_id, "FULL RESUME")
+    if not content:
+        return False
+
+    loop = asyncio.get_running_loop()
+    scores = await loop.run_in_executor(None, telemetry.propagate(lambda: score_jobs(embed_resume(content), jobs)))
+
+    await conn.execute(
+        """
+        UPDATE jobs SET score = data.score
+        FROM unnest($1::integer[], $2::double precision[]) AS data (id, score)
+        WHERE jobs.id = data.id
+        """,
+        [job_id for job_id, _ in scores],
+        [score for _, score in scores],
+    )
+    return True
@@ -1,15 +1,41 @@
-from serpapi import GoogleSearch
+import json
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from dotenv import load_dotenv
 
+import telemetry
+from db import connection
+
 load_dotenv()
-print(os.environ)
+
+logger = logging.getLogger(__name__)
 
 api_key = os.environ.get("SERP_API")
 
-print(api_key)
+# Results younger than SERP_CACHE_TTL are served as is. Older ones, up to
+# SERP_CACHE_STALE_TTL, are served immediately while a background refresh
+# fetches new results; beyond that the caller waits for a fresh search.
+SERP_CACHE_TTL = int(os.environ.get("SERP_CACHE_TTL", 24 * 3600))
+SERP_CACHE_STALE_TTL = int(os.environ.get("SERP_CACHE_STALE_TTL", 7 * 24 * 3600))
+# A refresh that has not finished after this long is assumed lost and may be retried
+SERP_REFRESH_TIMEOUT = int(os.environ.get("SERP_REFRESH_TIMEOUT", 120))
+
+# Columns and VALUES template of the per-user jobs rows materialized from a search
+JOB_COLUMNS = ("user_id", "title", "company_name", "location", "description", "job_highlights", "source", "extensions", "date_added")
+JOB_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, current_timestamp)"
+
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="serp-refresh")
+# Misses lock one of a fixed set of stripes, so memory stays bounded however
+# many distinct searches a worker sees; two searches rarely share a stripe
+_key_locks = [threading.Lock() for _ in range(64)]
+
 
 def call_serp_api(query, location, num_results=50):
+    from serpapi import GoogleSearch
+
     params = {
         "engine": "google_jobs",
         "q": f"""{query} {location}""",
@@ -18,6 +44,109 @@ def call_serp_api(query, location, num_results=50):
     }
 
     search = GoogleSearch(params)
-    results = search.get_dict()
+    with telemetry.span("serp", "google_jobs"):
+        results = search.get_dict()
 
     return results
+
+def job_rows(user_id, results):
+    return [
+        (user_id, job["title"], job["company_name"], job["location"], job["description"], ', '.join(job["job_highlights"][0]['items']), job["via"], ', '.join(job["extensions"]))
+        for job in results['jobs_results']
+    ]
+
+def normalize(value):
+    return " ".join(str(value or "").lower().split())
+
+def _key_lock(key):
+    return _key_locks[hash(key) % len(_key_locks)]
+
+def _read(query, location):
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT results, EXTRACT(EPOCH FROM current_timestamp - fetched_at)
+            FROM serp_cache WHERE query = %s AND location = %s
+            """,
+            (query, location),
+        )
+        row = cur.fetchone()
+        cur.close()
+    return row
+
+def _fetch_and_store(query, location):
+    results = call_serp_api(query, location)
+    if "jobs_results" not in results:
+        # Errors and empty searches are not cached
+        return results
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO serp_cache (query, location, results, fetched_at, refreshing_since)
+            VALUES (%s, %s, %s, current_timestamp, NULL)
+            ON CONFLICT (query, location)
+            DO UPDATE SET results = EXCLUDED.results, fetched_at = EXCLUDED.fetched_at, refreshing_since = NULL
+            """,
+            (query, location, json.dumps(results)),
+        )
+        conn.commit()
+        cur.close()
+    return results
+
+def _claim_refresh(query, location):
+    # Only one worker across the fleet refreshes a given stale entry
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE serp_cache SET refreshing_since = current_timestamp
+            WHERE query = %s AND location = %s
+              AND (refreshing_since IS NULL
+                   OR refreshing_since < current_timestamp - %s * INTERVAL '1 second')
+            RETURNING 1
+            """,
+            (query, location, SERP_REFRESH_TIMEOUT),
+        )
+        claimed = cur.fetchone() is not None
+        conn.commit()
+        cur.close()
+    return claimed
+
+def _refresh(query, location):
+    try:
+        _fetch_and_store(query, location)
+    except Exception as e:
+        logger.warning("Background job search refresh failed", extra={"query": query, "location": location, "error": str(e)})
+
+def search_jobs_cached(query, location):
+    """Job search results shared by every user searching the same title and location."""
+    query = normalize(query)
+    location = normalize(location)
+
+    row = _read(query, location)
+    if row is not None:
+        results, age = row
+        if age < SERP_CACHE_TTL:
+            return results
+        if age < SERP_CACHE_STALE_TTL:
+            if _claim_refresh(query, location):
+                _refresh_executor.submit(_refresh, query, location)
+            return results
+
+    # Concurrent misses for the same search in this worker share one call
+    with _key_lock((query, location)):
+        row = _read(query, location)
+        if row is not None and row[1] < SERP_CACHE_TTL:
+            return row[0]
+        try:
+            return _fetch_and_store(query, location)
+        except Exception as e:
+            if row is None:
+                raise
+            logger.warning(
+                "Job search failed, serving expired results", extra={"query": query, "location": location, "error": str(e)}
+            )
+            return row[0]
@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+
+import psycopg2
+from dotenv import load_dotenv
+
+import telemetry
+from db import connection
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 10000))
+# Expired and least recently used entries are pruned after this many writes
+LLM_CACHE_PRUNE_EVERY = int(os.environ.get("LLM_CACHE_PRUNE_EVERY", 100))
+
+# Identical prompts arriving together (double clicks, retries) wait for the
+# first one instead of paying for the same completion twice: {cache key: Event
+# set when the completion in flight for it is done}
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "uncacheable": 0, "db_errors": 0, "writes": 0}
+# Same for the async path (asgi.py), with asyncio Events; only touched from
+# the event loop, so it needs no lock
+_async_in_flight = {}
+
+# Shared by the sync (psycopg2) and async (asyncpg) paths
+GET_SQL = """
+    UPDATE llm_cache SET last_used_at = current_timestamp, hits = hits + 1
+    WHERE key = %s AND created_at > current_timestamp - %s * INTERVAL '1 second'
+    RETURNING response
+"""
+PUT_SQL = """
+    INSERT INTO llm_cache (key, user_id, job_id, response)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (key) DO UPDATE
+    SET user_id = EXCLUDED.user_id, job_id = EXCLUDED.job_id, response = EXCLUDED.response,
+        created_at = current_timestamp, last_used_at = current_timestamp, hits = 0
+"""
+PRUNE_SQL = (
+    ("DELETE FROM llm_cache WHERE created_at < current_timestamp - %s * INTERVAL '1 second'", LLM_CACHE_TTL),
+    ("DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used_at DESC OFFSET %s)", LLM_CACHE_MAX_ENTRIES),
+)
+
+
+def cache_key(llm, prompt):
+    llm_string = f"{type(llm).__name__}:{getattr(llm, 'model_name', '')}:{llm.temperature}"
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+        return _stats[name]
+
+# Like the embedding cache, the table is best effort: if Postgres is
+# unavailable the completion is simply requested from the model.
+def _get(key):
+    try:
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute(GET_SQL, (key, LLM_CACHE_TTL))
+            row = cur.fetchone()
+            conn.commit()
+            cur.close()
+        return row[0] if row else None
+    except psycopg2.Error as e:
+        _count("db_errors")
+        logger.warning("LLM cache read failed", extra={"error": str(e)})
+        return None
+
+def _put(key, user_id, job_id, response):
+    try:
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute(PUT_SQL, (key, user_id, job_id, response))
+            if _count("writes") % LLM_CACHE_PRUNE_EVERY == 0:
+                for query, param in PRUNE_SQL:
+                    cur.execute(query, (param,))
+            conn.commit()
+            cur.close()
+    except psycopg2.Error as e:
+        _count("db_errors")
+        logger.warning("LLM cache write failed", extra={"error": str(e)})
+
+def _span():
+    # Labelled with the route or job the completion is for
+    trace = telemetry.current_trace()
+    return telemetry.span("llm", trace.name if trace else "completion")
+
+def _cacheable(chain):
+    return LLM_CACHE_ENABLED and getattr(chain.llm, "temperature", None) == 0
+
+def _prompt_key(chain, text):
+    prompt = chain.prompt.format(**{chain.input_keys[0]: text})
+    return cache_key(chain.llm, prompt)
+
+def run(chain, text, user_id=None, job_id=None):
+    """chain.run(text), served from the cache for temperature 0 chains.
+
+    Entries are tagged with the user and saved job they were generated for;
+    triggers on resume and saved_jobs drop them when either row changes.
+    """
+    if not _cacheable(chain):
+        _count("uncacheable")
+        with _span():
+            return chain.run(text)
+
+    key = _prompt_key(chain, text)
+
+    while True:
+        with _in_flight_lock:
+            pending = _in_flight.get(key)
+            if pending is None:
+                done = _in_flight[key] = threading.Event()
+                break
+        # Then read what it cached, or take over if it failed
+        pending.wait()
+
+    try:
+        response = _get(key)
+        if response is not None:
+            _count("hits")
+            return response
+
+        _count("misses")
+        with _span():
+            response = chain.run(text)
+        _put(key, user_id, job_id, response)
+        return response
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+        done.set()
+
+async def _aget(key):
+    import asyncpg
+    import adb
+
+    try:
+        async with adb.connection() as conn:
+            return await conn.fetchval(adb.placeholders(GET_SQL), key, LLM_CACHE_TTL)
+    except (asyncpg.PostgresError, OSError, asyncio.TimeoutError) as e:
+        _count("db_errors")
+        logger.warning("LLM cache read failed", extra={"error": str(e)})
+        return None
+
+async def _aput(key, user_id, job_id, response):
+    import asyncpg
+    import adb
+
+    try:
+        async with adb.connection() as conn:
+            async with conn.transaction():
+                await conn.execute(adb.placeholders(PUT_SQL), key, user_id, job_id, response)
+                if _count("writes") % LLM_CACHE_PRUNE_EVERY == 0:
+                    for query, param in PRUNE_SQL:
+                        await conn.execute(adb.placeholders(query), param)
+    except (asyncpg.PostgresError, OSError, asyncio.TimeoutError) as e:
+        _count("db_errors")
+        logger.warning("LLM cache write failed", extra={"error": str(e)})
+
+async def arun(chain, text, user_id=None, job_id=None):
+    """Async run(): awaits chain.arun and reads and writes the cache through asyncpg."""
+    if not _cacheable(chain):
+        _count("uncacheable")
+        with _span():
+            return await chain.arun(text)
+
+    key = _prompt_key(chain, text)
+
+    while key in _async_in_flight:
+        await _async_in_flight[key].wait()
+    done = _async_in_flight[key] = asyncio.Event()
+
+    try:
+        response = await _aget(key)
+        if response is not None:
+            _count("hits")
+            return response
+
+        _count("misses")
+        with _span():
+            response = await chain.arun(text)
+        await _aput(key, user_id, job_id, response)
+        return response
+    finally:
+        del _async_in_flight[key]
+        done.set()
+
+def stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
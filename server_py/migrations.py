@@ -0,0 +1,476 @@
+import argparse
+import logging
+import os
+
+from dotenv import load_dotenv
+
+from db import connection
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Run pending migrations when a worker warms up. Set to "false" when they are
+# applied out of band with `python migrations.py` before a deploy.
+MIGRATE_ON_STARTUP = os.environ.get("MIGRATE_ON_STARTUP", "true").lower() == "true"
+
+# Advisory lock held while migrating so concurrent workers apply each version once
+MIGRATION_LOCK_NAMESPACE = 1002
+
+
+def _baseline(cur):
+    # The tables setup_db used to create, in dependency order. IF NOT EXISTS
+    # lets databases created before migrations adopt this version as is.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            first_name TEXT NOT NULL,
+            last_name TEXT,
+            job_title TEXT,
+            location TEXT,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS chat (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            chat_id TEXT,
+            chat_name TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS messages (
+            id SERIAL PRIMARY KEY,
+            type TEXT,
+            user_id INTEGER,
+            chat_id INTEGER,
+            message TEXT,
+            timestamp TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (chat_id) REFERENCES chat(id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS resume (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            section TEXT,
+            content TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS jobs (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            title TEXT,
+            company_name TEXT,
+            location TEXT,
+            description TEXT,
+            job_highlights TEXT,
+            source TEXT,
+            extensions TEXT,
+            saved BOOLEAN,
+            date_added TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS saved_jobs (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            job_title TEXT,
+            company_name TEXT,
+            job_description TEXT,
+            status TEXT,
+            post_url TEXT,
+            date_created TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS interview_questions (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            job_id INTEGER,
+            question TEXT,
+            answer TEXT,
+            recommendation TEXT,
+            FOREIGN KEY (job_id) REFERENCES saved_jobs (id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS resume_versions (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            job_id INTEGER,
+            version_name TEXT,
+            version_text TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (job_id) REFERENCES saved_jobs (id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS cover_letter (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            job_id INTEGER,
+            cover_letter TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (job_id) REFERENCES saved_jobs (id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS resume_recommendations (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            job_id INTEGER,
+            version_id INTEGER,
+            recommendation TEXT,
+            user_notes TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (job_id) REFERENCES saved_jobs (id) ON DELETE CASCADE,
+            FOREIGN KEY (version_id) REFERENCES resume_versions (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS linkedIn (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            content TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS password_reset_tokens (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            token TEXT,
+            expires_at TIMESTAMP WITH TIME ZONE,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS ingestion_jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            filename TEXT,
+            content_type TEXT,
+            file BYTEA,
+            status TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT current_timestamp,
+            updated_at TIMESTAMP DEFAULT current_timestamp,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            embedding REAL[] NOT NULL,
+            created_at TIMESTAMP DEFAULT current_timestamp
+        );
+        """
+    )
+
+def _create_index_concurrently(cur, name, definition):
+    # A failed CONCURRENTLY build leaves an invalid index behind; rebuild it
+    # rather than letting IF NOT EXISTS skip over it
+    cur.execute(
+        """
+        SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = %s
+        """,
+        (name,),
+    )
+    row = cur.fetchone()
+    if row is not None and row[0]:
+        return
+    if row is not None:
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    cur.execute(f"CREATE INDEX CONCURRENTLY {name} ON {definition}")
+
+def _hot_path_indexes(cur):
+    # users.email is already covered by its UNIQUE constraint
+    indexes = [
+        ("chat_user_id_idx", "chat (user_id)"),
+        ("messages_chat_id_id_idx", "messages (chat_id, id)"),
+        ("messages_user_id_idx", "messages (user_id)"),
+        ("resume_user_id_section_idx", "resume (user_id, section)"),
+        ("jobs_user_id_date_added_idx", "jobs (user_id, date_added DESC, id DESC)"),
+        ("saved_jobs_user_id_date_created_idx", "saved_jobs (user_id, date_created DESC, id DESC)"),
+        ("interview_questions_user_id_job_id_idx", "interview_questions (user_id, job_id)"),
+        ("interview_questions_job_id_idx", "interview_questions (job_id)"),
+        ("resume_versions_user_id_job_id_idx", "resume_versions (user_id, job_id)"),
+        ("cover_letter_user_id_job_id_idx", "cover_letter (user_id, job_id)"),
+        ("resume_recommendations_user_id_job_id_idx", "resume_recommendations (user_id, job_id)"),
+        ("linkedin_user_id_idx", "linkedIn (user_id)"),
+        ("password_reset_tokens_token_idx", "password_reset_tokens (token)"),
+        ("ingestion_jobs_status_created_at_idx", "ingestion_jobs (status, created_at)"),
+    ]
+    for name, definition in indexes:
+        _create_index_concurrently(cur, name, definition)
+
+def _messages_timestamp(cur):
+    # Existing rows hold datetime.isoformat() strings; anything else becomes NULL
+    cur.execute(
+        """
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'messages' AND column_name = 'timestamp'
+        """
+    )
+    if cur.fetchone()[0] != "text":
+        return
+    cur.execute(
+        r"""
+        ALTER TABLE messages ALTER COLUMN timestamp TYPE TIMESTAMP
+        USING CASE
+            WHEN timestamp ~ '^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$' THEN timestamp::timestamp
+        END
+        """
+    )
+
+def _messages_keyset_index(cur):
+    _create_index_concurrently(cur, "messages_chat_id_timestamp_idx", "messages (chat_id, timestamp DESC, id DESC)")
+
+def _serp_cache(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS serp_cache (
+            query TEXT NOT NULL,
+            location TEXT NOT NULL,
+            results JSONB NOT NULL,
+            fetched_at TIMESTAMP NOT NULL,
+            refreshing_since TIMESTAMP,
+            PRIMARY KEY (query, location)
+        )
+        """
+    )
+
+def _jobs_score(cur):
+    cur.execute("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS score DOUBLE PRECISION")
+
+def _jobs_score_index(cur):
+    _create_index_concurrently(cur, "jobs_user_id_score_idx", "jobs (user_id, score DESC, id DESC)")
+
+def _llm_cache(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            user_id INTEGER,
+            job_id INTEGER,
+            response TEXT NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT current_timestamp,
+            last_used_at TIMESTAMP NOT NULL DEFAULT current_timestamp
+        );
+
+        CREATE INDEX IF NOT EXISTS llm_cache_user_id_idx ON llm_cache (user_id);
+        CREATE INDEX IF NOT EXISTS llm_cache_job_id_idx ON llm_cache (job_id);
+        CREATE INDEX IF NOT EXISTS llm_cache_last_used_at_idx ON llm_cache (last_used_at);
+
+        -- Completions are generated from the user's resume and, for most
+        -- endpoints, a saved job; drop them as soon as either changes
+        CREATE OR REPLACE FUNCTION llm_cache_invalidate_user() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM llm_cache WHERE user_id = OLD.user_id;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                DELETE FROM llm_cache WHERE user_id = NEW.user_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION llm_cache_invalidate_job() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM llm_cache WHERE job_id = OLD.id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS resume_llm_cache_invalidate ON resume;
+        CREATE TRIGGER resume_llm_cache_invalidate
+            AFTER INSERT OR UPDATE OR DELETE ON resume
+            FOR EACH ROW EXECUTE FUNCTION llm_cache_invalidate_user();
+
+        DROP TRIGGER IF EXISTS saved_jobs_llm_cache_invalidate ON saved_jobs;
+        CREATE TRIGGER saved_jobs_llm_cache_invalidate
+            AFTER UPDATE OR DELETE ON saved_jobs
+            FOR EACH ROW EXECUTE FUNCTION llm_cache_invalidate_job();
+        """
+    )
+
+def _resume_chunks(cur):
+    # Manifest of the resume chunks indexed per user, so a new upload only
+    # embeds the chunks it adds and deletes the ones it drops
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS resume_chunks (
+            user_id INTEGER NOT NULL,
+            chunk_hash TEXT NOT NULL,
+            vector_id TEXT NOT NULL,
+            PRIMARY KEY (user_id, chunk_hash),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS file_hash TEXT;
+        """
+    )
+
+def _ingestion_jobs_user_index(cur):
+    _create_index_concurrently(cur, "ingestion_jobs_user_id_updated_at_idx", "ingestion_jobs (user_id, updated_at DESC)")
+
+def _vector_outbox(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS vector_outbox (
+            id BIGSERIAL PRIMARY KEY,
+            user_id INTEGER,
+            op TEXT NOT NULL,
+            vector_id TEXT,
+            document TEXT,
+            metadata JSONB,
+            filter JSONB,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT current_timestamp
+        );
+
+        CREATE INDEX IF NOT EXISTS vector_outbox_status_id_idx ON vector_outbox (status, id);
+        """
+    )
+
+def _llm_cache_statement_triggers(cur):
+    # Replaces the row-level triggers of migration 8, which ran one DELETE
+    # against llm_cache per changed row (a resume upload rewrites every
+    # section). A trigger with transition tables can only fire on one event,
+    # hence one per event.
+    cur.execute(
+        """
+        DROP TRIGGER IF EXISTS resume_llm_cache_invalidate ON resume;
+        DROP TRIGGER IF EXISTS saved_jobs_llm_cache_invalidate ON saved_jobs;
+        DROP FUNCTION IF EXISTS llm_cache_invalidate_user();
+        DROP FUNCTION IF EXISTS llm_cache_invalidate_job();
+
+        CREATE OR REPLACE FUNCTION llm_cache_invalidate_users() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM llm_cache WHERE user_id IN (SELECT user_id FROM old_rows);
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                DELETE FROM llm_cache WHERE user_id IN (SELECT user_id FROM new_rows);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION llm_cache_invalidate_jobs() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM llm_cache WHERE job_id IN (SELECT id FROM old_rows);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER resume_llm_cache_invalidate_insert
+            AFTER INSERT ON resume REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION llm_cache_invalidate_users();
+        CREATE TRIGGER resume_llm_cache_invalidate_update
+            AFTER UPDATE ON resume REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION llm_cache_invalidate_users();
+        CREATE TRIGGER resume_llm_cache_invalidate_delete
+            AFTER DELETE ON resume REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION llm_cache_invalidate_users();
+
+        CREATE TRIGGER saved_jobs_llm_cache_invalidate_update
+            AFTER UPDATE ON saved_jobs REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION llm_cache_invalidate_jobs();
+        CREATE TRIGGER saved_jobs_llm_cache_invalidate_delete
+            AFTER DELETE ON saved_jobs REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION llm_cache_invalidate_jobs();
+        """
+    )
+
+# (version, name, function, transactional). Append only; never edit or reorder
+# a migration that has shipped. CONCURRENTLY cannot run inside a transaction,
+# so those migrations must be safe to re-run from the start.
+MIGRATIONS = [
+    (1, "baseline", _baseline, True),
+    (2, "hot path indexes", _hot_path_indexes, False),
+    (3, "messages timestamp", _messages_timestamp, True),
+    (4, "messages keyset index", _messages_keyset_index, False),
+    (5, "serp cache", _serp_cache, True),
+    (6, "jobs score", _jobs_score, True),
+    (7, "jobs score index", _jobs_score_index, False),
+    (8, "llm cache", _llm_cache, True),
+    (9, "resume chunks", _resume_chunks, True),
+    (10, "ingestion jobs user index", _ingestion_jobs_user_index, False),
+    (11, "vector outbox", _vector_outbox, True),
+    (12, "llm cache statement triggers", _llm_cache_statement_triggers, True),
+]
+
+
+def _applied_versions(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT current_timestamp
+        )
+        """
+    )
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+def _record(cur, version, name):
+    cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+
+def migrate():
+    """Apply pending migrations in order and return the versions applied."""
+    applied = []
+    with connection() as conn:
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_lock(%s, 0)", (MIGRATION_LOCK_NAMESPACE,))
+        try:
+            done = _applied_versions(cur)
+            for version, name, apply, transactional in MIGRATIONS:
+                if version in done:
+                    continue
+                logger.info("Applying migration", extra={"version": version, "migration": name})
+                if transactional:
+                    cur.execute("BEGIN")
+                    try:
+                        apply(cur)
+                        _record(cur, version, name)
+                    except Exception:
+                        cur.execute("ROLLBACK")
+                        raise
+                    cur.execute("COMMIT")
+                else:
+                    apply(cur)
+                    _record(cur, version, name)
+                applied.append(version)
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s, 0)", (MIGRATION_LOCK_NAMESPACE,))
+            cur.close()
+            conn.autocommit = False
+    return applied
+
+def schema_version():
+    with connection() as conn:
+        cur = conn.cursor()
+        version = max(_applied_versions(cur), default=None)
+        conn.commit()
+        cur.close()
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending database migrations")
+    parser.add_argument("--status", action="store_true", help="print the current schema version and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        print(f"Schema version {schema_version()} of {MIGRATIONS[-1][0]}")
+    else:
+        applied = migrate()
+        print(f"Applied {len(applied)} migration(s); schema version {MIGRATIONS[-1][0]}")
@@ -0,0 +1,71 @@
+import base64
+import json
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 500))
+MESSAGES_PAGE_SIZE = int(os.environ.get("MESSAGES_PAGE_SIZE", 100))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Listings are ordered descending on (sort value, id); the sort value is a
+# timestamp, or a score for ranked listings. A cursor is the (value, id) of the
+# last row of a page, so the next page is an index seek past that row whatever
+# its depth, unlike OFFSET which scans every skipped row.
+
+def encode_cursor(kind, value, row_id):
+    payload = {"k": kind, "i": row_id}
+    if isinstance(value, datetime):
+        payload["t"] = value.isoformat()
+    else:
+        payload["v"] = value
+    token = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    return token.decode("ascii").rstrip("=")
+
+def decode_cursor(kind, token):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        value = datetime.fromisoformat(payload["t"]) if "t" in payload else payload["v"]
+        row_id = int(payload["i"])
+        if value is not None and not isinstance(value, (datetime, int, float)):
+            raise TypeError(value)
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if payload.get("k") != kind:
+        raise InvalidCursor("Cursor belongs to a different listing")
+    return value, row_id
+
+def page_size(value, default=10):
+    try:
+        size = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+def seek(column, cursor):
+    """WHERE fragment and params selecting the rows after `cursor` in descending order."""
+    if cursor is None:
+        return "TRUE", ()
+    value, row_id = cursor
+    # DESC puts NULLs first, so after a NULL cursor come the remaining NULL
+    # rows and then every row with a value
+    if value is None:
+        return f"({column} IS NOT NULL OR id < %s)", (row_id,)
+    return f"({column}, id) < (%s, %s)", (value, row_id)
+
+def order_by(column):
+    return f"ORDER BY {column} DESC, id DESC"
+
+def split_page(rows, limit, kind, key):
+    """Trim a LIMIT limit + 1 result to one page and build the cursor to the next one."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(kind, *key(rows[-1]))
@@ -1,15 +1,13 @@
-import pinecone
 import os
 from langchain.embeddings.openai import OpenAIEmbeddings
 from dotenv import load_dotenv
+from vector_store import get_index
 
 load_dotenv()
 
-pinecone_api_key = os.environ.get("PINECONE_API_KEY")
 openai_api_key = os.environ.get("OPENAI_API_KEY")
 
-pinecone.init(api_key=pinecone_api_key, environment="us-west4-gcp")
-index = pinecone.Index("resume-bot")
+index = get_index()
 
 embeddings = OpenAIEmbeddings(
     openai_api_key=openai_api_key,
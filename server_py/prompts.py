@@ -0,0 +1,129 @@
+import os
+import re
+
+from dotenv import load_dotenv
+
+import context_budget
+
+load_dotenv()
+
+openai_api_key = os.environ.get("OPENAI_API_KEY")
+
+# Prompt assembly shared by the Flask routes and their async counterparts in
+# asgi.py; callers load the inputs and run the returned (chain, text) pair.
+
+# question type -> (wording in the prompt, precomputed query vector for the resume lookup)
+INTERVIEW_QUESTION_TYPES = {
+    "WorkExperience": ("that are specifically relevant to their work experience", "work_experience"),
+    "RoleBased": ("that are specifically relevant to the job", "work_experience"),
+    "Technical": ("that are specifically relevant to their technical capabilities", "technical_skills"),
+}
+
+
+def chat_model(**kwargs):
+    from langchain.chat_models import ChatOpenAI
+
+    return ChatOpenAI(
+        model_name="gpt-3.5-turbo",
+        openai_api_key=openai_api_key,
+        temperature=0,
+        **kwargs,
+    )
+
+def llm_chain(template, verbose=True):
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+
+    return LLMChain(
+        llm=chat_model(),
+        verbose=verbose,
+        prompt=PromptTemplate.from_template(template)
+    )
+
+def split_lines(text):
+    # Numbered list items lose their "1. " prefix
+    return [re.sub(r'^\d+\.\s*', '', i) for i in text.split('\n')]
+
+def interview_questions(question_type, resume, asked, job_description=None):
+    """resume is the resume matches for a saved job, else the FULL RESUME text;
+    asked holds the questions already generated, newest first."""
+    type_string, _ = INTERVIEW_QUESTION_TYPES[question_type]
+    asked = [f'"{question}"' for question in asked]
+
+    template_questions_base = f"""Below is a user's resume and the description for a job they are applying to. Based on the job responsibilities and user's qualifications, please generate 3 interview questions {type_string}. The questions should be related to key skills and experiences required for this job. Please return the questions separated by newlines."""
+
+    if job_description is not None:
+
+        docs = context_budget.build("generate-interview-questions", [
+            context_budget.Part("instructions", template_questions_base, None),
+            context_budget.Part("job_description", job_description or "", 2),
+            context_budget.Part("resume", resume, 2),
+            context_budget.Part("asked", asked, 1, ", "),
+        ])
+
+        template_questions_base = template_questions_base + f"""
+
+        Job Description user is applying to:\n {docs["job_description"]}\n
+        """
+
+    else:
+        docs = context_budget.build("generate-interview-questions", [
+            context_budget.Part("instructions", template_questions_base, None),
+            context_budget.Part("resume", resume or "", 3),
+            context_budget.Part("asked", asked, 1, ", "),
+        ])
+
+    if docs["asked"]:
+        exclude_similar = f"""These questions have already been asked: [{docs["asked"]}]"""
+    else:
+        exclude_similar = ""
+
+    template_final = template_questions_base + """Information from the user's Resume:\n {context} \n""" + exclude_similar
+
+    return llm_chain(template_final), docs["resume"]
+
+def recommendations(job_matches, resume, recommended):
+    """recommended holds the recommendations already generated, newest first."""
+    instructions = """Based on the following details about my resume and the job I am applying to, please provide me 5 recommendations on how I can update my resume to increase my chances of landing an interview. The recommendations should cover different areas such as skills, work experience, projects, and format. Each recommendation should be justified in terms of how it matches with the job description or enhances my profile. Please return the recommendations separated by newlines."""
+
+    docs = context_budget.build("generate-recommendations", [
+        context_budget.Part("instructions", instructions, None),
+        context_budget.Part("jobs", job_matches, 2),
+        context_budget.Part("resume", resume or "", 3),
+        context_budget.Part("recommended", [f'"{item}"' for item in recommended], 1, ", "),
+    ])
+
+    template_questions_base = instructions + f"""
+
+    Job Description Information: {docs["jobs"]}"""
+
+    if docs["recommended"]:
+        exclude_similar = f"""These recommendations have already been provided: [{docs["recommended"]}]"""
+    else:
+        exclude_similar = ""
+
+    template_final = template_questions_base + """\nResume: {context}\n """ + exclude_similar
+
+    return llm_chain(template_final), docs["resume"]
+
+def cover_letter(job_description, resume):
+    instructions = """Below is a user's resume and the description of a job they are applying to. Please write a cover letter for their job application. Do not make anything up.\n"""
+
+    docs = context_budget.build("generate-cover-letter", [
+        context_budget.Part("instructions", instructions, None),
+        context_budget.Part("job_description", job_description or ""),
+        context_budget.Part("resume", resume or "", 2),
+    ])
+
+    template_questions_base = instructions + f"""
+
+    Job Description Information: {docs["job_description"]} \n"""
+
+    template_final = template_questions_base + """Resume: {context}\n """
+
+    return llm_chain(template_final), docs["resume"]
+
+def job_title(resume_text):
+    template_final = """\nBelow is information from a person's resume. From this information, determine the user's current job title. Return only the job title and nothing else.\n  Here is the information from their resume: {context}"""
+
+    return llm_chain(template_final, verbose=False), resume_text
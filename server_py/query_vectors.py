@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from embedding_cache import EMBEDDING_MODEL, get_embeddings
+
+# Fixed retrieval prompts used by the endpoints. Bump QUERY_VECTORS_VERSION when
+# changing the text of an entry so stale artifacts are rebuilt.
+QUERY_VECTORS_VERSION = 1
+
+RETRIEVAL_QUERIES = {
+    "job_requirements": "What are the important responsibilities, qualifications, skills, and requirements for this job?",
+    "resume_requirements": "What are the important responsibilities, qualifications, skills, and requirements outlined in this resume?",
+    "work_experience": "Work Experience",
+    "technical_skills": "Technical Skills",
+    "current_title_location": "Current job title and current location/address",
+}
+
+artifact_directory = Path(__file__).resolve().parent / "vectordb" / "query_vectors"
+
+_vectors = {}
+_lock = threading.Lock()
+
+
+def artifact_path(model=EMBEDDING_MODEL):
+    return artifact_directory / f"{model}.json"
+
+def _read_artifact(path):
+    try:
+        with open(path) as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if artifact.get("version") != QUERY_VECTORS_VERSION:
+        return {}
+
+    return {
+        name: entry["embedding"]
+        for name, entry in artifact.get("vectors", {}).items()
+        if RETRIEVAL_QUERIES.get(name) == entry.get("text")
+    }
+
+def _write_artifact(path, model, vectors):
+    artifact = {
+        "version": QUERY_VECTORS_VERSION,
+        "model": model,
+        "vectors": {
+            name: {"text": RETRIEVAL_QUERIES[name], "embedding": vectors[name]}
+            for name in RETRIEVAL_QUERIES
+        },
+    }
+    os.makedirs(path.parent, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(artifact, f)
+    os.replace(tmp_path, path)
+
+def load_query_vectors(model=EMBEDDING_MODEL):
+    path = artifact_path(model)
+    with _lock:
+        vectors = _read_artifact(path)
+        missing = [name for name in RETRIEVAL_QUERIES if name not in vectors]
+
+        if missing:
+            embedded = get_embeddings().embed_documents([RETRIEVAL_QUERIES[name] for name in missing])
+            vectors.update(zip(missing, embedded))
+            _write_artifact(path, model, vectors)
+
+        _vectors.clear()
+        _vectors.update(vectors)
+
+    return vectors
+
+def get_query_vector(name):
+    if name not in _vectors:
+        load_query_vectors()
+    return _vectors[name]
+
+
+if __name__ == "__main__":
+    vectors = load_query_vectors()
+    print(f"Wrote {len(vectors)} query vectors to {artifact_path()}")
@@ -0,0 +1,168 @@
+import os
+import threading
+from typing import List, Tuple
+
+from dotenv import load_dotenv
+
+from aho_corasick import Automaton
+
+load_dotenv()
+
+# "spacy" tokenizes with en_core_web_sm; "automaton" scans lines with an
+# Aho-Corasick automaton and needs no language model
+SECTION_ENGINE = os.environ.get("SECTION_ENGINE", "spacy")
+
+SPACY_MODEL = 'en_core_web_sm'
+# Section splitting only needs tokens, so none of the statistical components are loaded
+SPACY_EXCLUDE = ["tok2vec", "tagger", "parser", "senter", "attribute_ruler", "lemmatizer", "ner"]
+
+_nlp = None
+_matcher = None
+_automaton = None
+_load_lock = threading.Lock()
+
+SECTION_KEYWORDS = [
+    "overview",
+    "summary",
+    "profile",
+    "objective",
+    "education",
+    "academic background",
+    "work experience",
+    "professional experience",
+    "experience",
+    "employment history",
+    "job history",
+    "career history",
+    "skills",
+    "technical skills",
+    "core competencies",
+    "capabilities",
+    "areas of expertise",
+    "expertise",
+    "projects",
+    "portfolio",
+    "awards",
+    "achievements",
+    "accolades",
+    "honors",
+    "publications",
+    "research",
+    "certifications",
+    "credentials",
+    "licenses",
+    "training",
+    "languages",
+    "fluency",
+    "multilingual",
+    "references",
+    "referees",
+    "testimonials",
+    "professional affiliations",
+    "memberships",
+    "associations",
+    "activities",
+    "extracurricular activities",
+    "volunteer work",
+    "community involvement",
+    "leadership",
+    "hobbies",
+    "interests",
+    "personal interests",
+]
+
+SECTION_KEYWORD_SET = frozenset(keyword.lower() for keyword in SECTION_KEYWORDS)
+
+
+def get_nlp():
+    global _nlp, _matcher
+    if _nlp is None:
+        with _load_lock:
+            if _nlp is None:
+                import spacy
+                from spacy.matcher import PhraseMatcher
+
+                nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+                matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+                matcher.add("SECTION", [nlp.make_doc(keyword) for keyword in SECTION_KEYWORD_SET])
+                _matcher = matcher
+                _nlp = nlp
+    return _nlp
+
+def _ends_line(doc, end):
+    return end == len(doc) or (doc[end].is_space and "\n" in doc[end].text)
+
+def split_with_spacy(resume_text: str) -> List[Tuple[str, str]]:
+    doc = get_nlp().make_doc(resume_text)
+
+    # A heading is a keyword phrase followed by a line break. When phrases
+    # overlap ("work experience" / "experience") the longest one wins.
+    heading_starts = {}
+    for _, start, end in _matcher(doc):
+        if _ends_line(doc, end) and start < heading_starts.get(end, end):
+            heading_starts[end] = start
+    headings = sorted((start, end) for end, start in heading_starts.items())
+
+    sections = []
+    for idx, (start, end) in enumerate(headings):
+        content_end = headings[idx + 1][0] if idx < len(headings) - 1 else len(doc)
+        sections.append((doc[start:end].text, doc[end:content_end].text))
+
+    return sections
+
+def _get_automaton():
+    global _automaton
+    if _automaton is None:
+        _automaton = Automaton(SECTION_KEYWORD_SET)
+    return _automaton
+
+def _normalize_line(line):
+    # Lower-case and collapse whitespace, remembering where each character
+    # came from so matches can be mapped back onto the original text
+    chars = []
+    positions = []
+    for i, char in enumerate(line):
+        if char.isspace():
+            if chars and chars[-1] != " ":
+                chars.append(" ")
+                positions.append(i)
+            continue
+        lower = char.lower()
+        chars.append(lower if len(lower) == 1 else char)
+        positions.append(i)
+    return "".join(chars), positions
+
+def _find_heading(line):
+    # A heading line holds a keyword and nothing else but numbering, bullets
+    # or trailing punctuation ("2. Work Experience:")
+    normalized, positions = _normalize_line(line)
+    content = normalized.rstrip(" :-|.\u2013\u2014")
+    if not content:
+        return None
+
+    for match_start, match_end, _ in _get_automaton().search(content):
+        if match_end == len(content) and not any(char.isalpha() for char in content[:match_start]):
+            return positions[match_start], positions[len(content) - 1] + 1
+    return None
+
+def split_with_automaton(resume_text: str) -> List[Tuple[str, str]]:
+    headings = []
+    offset = 0
+    for line in resume_text.splitlines(keepends=True):
+        heading = _find_heading(line)
+        if heading is not None:
+            line_end = offset + len(line.rstrip("\r\n"))
+            headings.append((offset, offset + heading[0], offset + heading[1], line_end))
+        offset += len(line)
+
+    sections = []
+    for idx, (_, start, end, line_end) in enumerate(headings):
+        content_end = headings[idx + 1][0] if idx < len(headings) - 1 else len(resume_text)
+        sections.append((resume_text[start:end], resume_text[line_end:content_end]))
+
+    return sections
+
+def split_resume_into_sections(resume_text: str) -> List[Tuple[str, str]]:
+    if SECTION_ENGINE == "automaton":
+        return split_with_automaton(resume_text)
+    return split_with_spacy(resume_text)
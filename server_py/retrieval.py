@@ -0,0 +1,109 @@
+import functools
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+import telemetry
+from embedding_cache import get_embeddings
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_TIMEOUT = float(os.environ.get("RETRIEVAL_TIMEOUT", 10))
+RETRIEVAL_WORKERS = int(os.environ.get("RETRIEVAL_WORKERS", 16))
+
+_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+
+# query is either the text to embed or an already computed vector
+Source = namedtuple("Source", ["name", "query", "filter", "top_k", "namespace"], defaults=[""])
+
+
+def join_matches(matches):
+    return "\n\n".join(match["metadata"]["text"] for match in matches)
+
+def _query(index, name, **kwargs):
+    with telemetry.span("vector_query", name):
+        return index.query(**kwargs)
+
+def _settle(target, future):
+    # Give target the outcome of future
+    if future.cancelled():
+        target.cancel()
+    elif future.exception() is not None:
+        target.set_exception(future.exception())
+    else:
+        target.set_result(future.result())
+
+def retrieve(index, sources, timeout=RETRIEVAL_TIMEOUT, embeddings=None):
+    """Run the embedding and vector lookups for several sources concurrently.
+
+    Returns {source name: matches}. Each lookup starts as soon as its own
+    embedding is ready; sources whose embedding or query failed or did not
+    finish before the deadline are left out, so callers can build whatever
+    partial context is available.
+    """
+    deadline = time.monotonic() + timeout
+    embeddings = embeddings or get_embeddings()
+
+    outcomes = {source.name: Future() for source in sources}
+    # Bound here, in the caller's context; a callback may submit them from a pool thread
+    queries = {source.name: telemetry.propagate(_query) for source in sources}
+    submitted = []
+
+    def submit_query(source, vector):
+        future = _executor.submit(
+            queries[source.name],
+            index,
+            source.name,
+            vector=vector,
+            filter=source.filter,
+            top_k=source.top_k,
+            include_metadata=True,
+            namespace=source.namespace,
+        )
+        submitted.append(future)
+        future.add_done_callback(functools.partial(_settle, outcomes[source.name]))
+
+    def embedded(text, text_sources, future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("Retrieval embedding failed", extra={"text": text[:50], "error": str(future.exception())})
+        if future.cancelled() or future.exception() is not None:
+            for source in text_sources:
+                _settle(outcomes[source.name], future)
+            return
+        for source in text_sources:
+            submit_query(source, future.result())
+
+    by_text = {}
+    for source in sources:
+        if isinstance(source.query, str):
+            by_text.setdefault(source.query, []).append(source)
+        else:
+            submit_query(source, source.query)
+    for text, text_sources in by_text.items():
+        future = _executor.submit(telemetry.propagate(embeddings.embed_query), text)
+        submitted.append(future)
+        future.add_done_callback(functools.partial(embedded, text, text_sources))
+
+    wait(outcomes.values(), timeout=max(0, deadline - time.monotonic()))
+    # Drop work still queued behind the deadline
+    for future in list(submitted):
+        future.cancel()
+
+    results = {}
+    for name, future in outcomes.items():
+        if not future.done() or future.cancelled():
+            logger.warning("Retrieval timed out", extra={"source": name})
+        elif future.exception() is not None:
+            logger.warning("Retrieval failed", extra={"source": name, "error": str(future.exception())})
+        else:
+            results[name] = future.result()["matches"]
+    return results
+
+def retrieve_context(index, sources, timeout=RETRIEVAL_TIMEOUT, embeddings=None):
+    return {name: join_matches(matches) for name, matches in retrieve(index, sources, timeout, embeddings).items()}
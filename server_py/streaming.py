@@ -0,0 +1,74 @@
+import json
+import logging
+import queue
+import threading
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+import telemetry
+
+logger = logging.getLogger(__name__)
+
+STREAM_IDLE_TIMEOUT = 60
+
+
+class QueueCallbackHandler(BaseCallbackHandler):
+    """Collects tokens from a streaming LLM so a response generator can forward them."""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.disconnected = threading.Event()
+
+    def on_llm_new_token(self, token, **kwargs):
+        if not self.disconnected.is_set():
+            self.queue.put(("token", token))
+
+    def finish(self, payload):
+        self.queue.put(("done", payload))
+
+    def fail(self, error):
+        self.queue.put(("error", error))
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_events(handler, run, start_payload):
+    """Run `run` on a worker thread and yield Server-Sent Events as it streams.
+
+    `run` must report its result through handler.finish / handler.fail. It keeps
+    running if the client goes away so whatever it persists stays consistent;
+    we just stop forwarding tokens.
+    """
+
+    def target():
+        try:
+            run()
+        except Exception as e:
+            handler.fail(e)
+
+    worker = threading.Thread(target=telemetry.propagate(target), daemon=True)
+    worker.start()
+
+    try:
+        yield sse("start", start_payload)
+        while True:
+            try:
+                kind, value = handler.queue.get(timeout=STREAM_IDLE_TIMEOUT)
+            except queue.Empty:
+                yield sse("error", {"message": "Timed out waiting for GPT-3.5 API"})
+                return
+
+            if kind == "token":
+                yield sse("token", {"token": value})
+            elif kind == "done":
+                yield sse("done", value)
+                return
+            else:
+                logger.error("Streamed completion failed", extra={"error": str(value)})
+                yield sse("error", {"message": "Error fetching GPT-3.5 API"})
+                return
+    except GeneratorExit:
+        handler.disconnected.set()
+        logger.info("Client disconnected from stream")
+        raise
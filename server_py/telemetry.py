@@ -0,0 +1,336 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Fraction of requests whose DEBUG/INFO logs and span breakdown are written;
+# warnings and errors are always written
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 1.0))
+# Requests slower than this are logged with their breakdown even when not sampled
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", 5))
+# Spans kept per trace for the breakdown; the per-stage totals count all of them
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", 200))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRIC_PREFIX = "resume_bot"
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+
+# Metrics are kept per process; with several gunicorn/uvicorn workers each one
+# exposes its own counts on /metrics.
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = f"{METRIC_PREFIX}_{name}"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = f"{METRIC_PREFIX}_{name}"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labelvalues -> [per-bucket counts..., +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                series = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            values = {key: list(series) for key, series in self._values.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, series in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "stage_duration_seconds",
+    "Time spent in an upstream call or processing step.",
+    ("stage", "operation"),
+)
+stage_errors = Counter(
+    "stage_errors_total",
+    "Upstream calls or processing steps that raised.",
+    ("stage", "operation"),
+)
+request_seconds = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route and status.",
+    ("method", "route", "status"),
+)
+
+_metrics = [stage_seconds, stage_errors, request_seconds]
+_collectors = []
+
+
+def register_collector(name, collect):
+    """Export the numeric values of collect()'s dict as gauges named <name>_<key>."""
+    _collectors.append((name, collect))
+
+def _flatten(prefix, value):
+    if isinstance(value, bool):
+        yield prefix, int(value)
+    elif isinstance(value, (int, float)):
+        yield prefix, value
+    elif isinstance(value, dict):
+        for key, inner in value.items():
+            yield from _flatten(f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', str(key))}", inner)
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for name, collect in _collectors:
+        try:
+            values = collect()
+        except Exception as e:
+            logging.getLogger(__name__).warning("Metrics collector failed", extra={"collector": name, "error": str(e)})
+            continue
+        for metric_name, value in _flatten(f"{METRIC_PREFIX}_{name}", values):
+            lines.append(f"# TYPE {metric_name} gauge")
+            lines.append(f"{metric_name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class Trace:
+    def __init__(self, name, trace_id=None):
+        self.name = name
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.start = time.perf_counter()
+        self.sampled = random.random() < LOG_SAMPLE_RATE
+        self.spans = []
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, operation, offset, seconds, error):
+        with self._lock:
+            count, total = self.totals.get(stage, (0, 0.0))
+            self.totals[stage] = (count + 1, total + seconds)
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append({
+                    "stage": stage,
+                    "operation": operation,
+                    "offset_ms": round(offset * 1000, 1),
+                    "ms": round(seconds * 1000, 1),
+                    **({"error": error} if error else {}),
+                })
+
+    def breakdown(self):
+        with self._lock:
+            return {
+                "stages": {stage: {"count": count, "ms": round(total * 1000, 1)} for stage, (count, total) in self.totals.items()},
+                "spans": list(self.spans),
+            }
+
+
+def current_trace():
+    return _current_trace.get()
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+def start_trace(name, trace_id=None):
+    """Start a trace for this request or job; returns (trace, token for finish_trace)."""
+    trace = Trace(name, trace_id)
+    return trace, _current_trace.set(trace)
+
+def finish_trace(trace, token, status=None, **fields):
+    """status is an HTTP status code, or "ok"/"error" for background work."""
+    seconds = time.perf_counter() - trace.start
+    _current_trace.reset(token)
+    error = status == "error" or (isinstance(status, int) and status >= 500)
+    if trace.sampled or error or seconds >= SLOW_REQUEST_SECONDS:
+        logger = logging.getLogger("telemetry")
+        level = logging.WARNING if error or seconds >= SLOW_REQUEST_SECONDS else logging.INFO
+        logger.log(
+            level,
+            "Trace finished",
+            extra={
+                "trace": trace.name,
+                "trace_id": trace.trace_id,
+                "status": status,
+                "ms": round(seconds * 1000, 1),
+                "force": True,
+                **fields,
+                **trace.breakdown(),
+            },
+        )
+    return seconds
+
+@contextmanager
+def trace(name):
+    trace, token = start_trace(name)
+    status = "ok"
+    try:
+        yield trace
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        finish_trace(trace, token, status=status)
+
+@contextmanager
+def span(stage, operation=""):
+    """Time a block as one stage of the current trace and in the stage histogram."""
+    trace = _current_trace.get()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        stage_errors.inc(stage, operation)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        stage_seconds.observe(seconds, stage, operation)
+        if trace is not None:
+            trace.add(stage, operation, start - trace.start, seconds, error)
+
+def traced(stage, operation=""):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage, operation or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def propagate(fn):
+    """Bind fn to the caller's context so spans from pool threads join its trace.
+
+    Call once per submission: a context can only be entered by one thread at a time.
+    """
+    context = contextvars.copy_context()
+    return functools.partial(context.run, fn)
+
+_SQL_TARGET = re.compile(
+    r"^\s*(\w+)(?:\s+\"?(\w+)\"?\s+SET\b|.*?\b(?:FROM|INTO|TABLE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?\"?(\w+))?",
+    re.IGNORECASE | re.DOTALL,
+)
+
+def sql_operation(query):
+    """Bounded label for a statement: its verb and first table, e.g. "SELECT jobs"."""
+    if isinstance(query, bytes):
+        query = query[:300].decode("utf-8", "replace")
+    elif not isinstance(query, str):
+        # psycopg2.sql.Composed and friends
+        return "composed"
+    match = _SQL_TARGET.match(query[:300])
+    if not match:
+        return "other"
+    verb, table = match.group(1).upper(), match.group(2) or match.group(3)
+    return f"{verb} {table}" if table else verb
+
+
+# Logging: one JSON object per line, with the trace id of the request that
+# logged it. DEBUG and INFO records follow the trace's sampling decision.
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class SamplingFilter(logging.Filter):
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or getattr(record, "force", False):
+            return True
+        trace = _current_trace.get()
+        if trace is not None:
+            return trace.sampled
+        return random.random() < LOG_SAMPLE_RATE
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        trace_id = current_trace_id()
+        if trace_id:
+            entry["trace_id"] = trace_id
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key != "force":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+def configure_logging():
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        handler.addFilter(SamplingFilter())
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(LOG_LEVEL)
+        _configured = True
@@ -0,0 +1,35 @@
+import context_budget
+from context_budget import Part
+
+
+class ScoredVector:
+    """Subscriptable like pinecone-client's match objects, but not a dict."""
+
+    def __init__(self, id, score, text):
+        self._data = {"id": id, "score": score, "metadata": {"text": text}}
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+
+def test_matches_ranked_by_score():
+    matches = [
+        {"id": "a", "score": 0.2, "metadata": {"text": "low"}},
+        {"id": "b", "score": 0.9, "metadata": {"text": "high"}},
+    ]
+    context = context_budget.build("test", [Part("resume", matches)], budget=1000)
+    assert context["resume"] == "high\n\nlow"
+
+def test_non_dict_matches():
+    matches = [ScoredVector("a", 0.2, "low"), ScoredVector("b", 0.9, "high"), ScoredVector("c", 0.5, "middle")]
+    context = context_budget.build("test", [Part("resume", matches)], budget=1000)
+    assert context["resume"] == "high\n\nmiddle\n\nlow"
+
+def test_lowest_scored_matches_dropped_first():
+    matches = [ScoredVector("a", 0.1, "x" * 400), ScoredVector("b", 0.9, "y" * 40)]
+    context = context_budget.build("test", [Part("resume", matches)], budget=context_budget.count_tokens("y" * 40))
+    assert context["resume"] == "y" * 40
+
+def test_strings_keep_their_order():
+    context = context_budget.build("test", [Part("asked", ["first", "second"], 1, ", ")], budget=1000)
+    assert context["asked"] == "first, second"
@@ -0,0 +1,124 @@
+from io import BytesIO
+
+import docx
+import pytest
+from docx.enum.section import WD_SECTION
+from docx.enum.style import WD_STYLE_TYPE
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from docx_stream import extract_docx_text_streaming
+from extraction import extract_docx_text_python_docx
+
+
+def save(document):
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def add_hyperlink(paragraph, url, *texts, style=None):
+    # A Word hyperlink: the runs sit inside w:hyperlink, not directly in the paragraph
+    rid = paragraph.part.relate_to(url, RT.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), rid)
+    for text in texts:
+        run = OxmlElement("w:r")
+        if style is not None:
+            rpr = OxmlElement("w:rPr")
+            rstyle = OxmlElement("w:rStyle")
+            rstyle.set(qn("w:val"), style)
+            rpr.append(rstyle)
+            run.append(rpr)
+        t = OxmlElement("w:t")
+        t.text = text
+        run.append(t)
+        hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+def paragraphs():
+    document = docx.Document()
+    document.add_heading("Jordan Example", 0)
+    document.add_paragraph("")
+    paragraph = document.add_paragraph("Seattle, WA")
+    paragraph.add_run(" | ").bold = True
+    paragraph.add_run("jordan@example.com\tPortfolio")
+    paragraph.add_run().add_break()
+    document.add_paragraph()
+    document.add_paragraph("Built & operated <services>", style="List Bullet")
+    return document
+
+def tables():
+    document = docx.Document()
+    document.add_paragraph("Skills")
+    table = document.add_table(rows=3, cols=3)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f"cell {r},{c}"
+    table.cell(0, 0).merge(table.cell(0, 1))
+    table.cell(1, 2).merge(table.cell(2, 2))
+    table.cell(2, 0).add_paragraph("")
+    table.cell(2, 1).add_paragraph("second line")
+    document.add_table(rows=1, cols=2).cell(0, 1).text = "after an empty cell"
+    document.add_paragraph("Education")
+    return document
+
+def headers_and_footers():
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "Resume header"
+    document.sections[0].footer.add_paragraph("Page footer")
+    document.add_paragraph("First section")
+    second = document.add_section(WD_SECTION.NEW_PAGE)
+    second.header.is_linked_to_previous = False
+    second.header.paragraphs[0].text = "Second header"
+    document.add_paragraph("Second section")
+    document.add_section(WD_SECTION.NEW_PAGE)
+    document.add_paragraph("Third section inherits both")
+    return document
+
+def hyperlinks():
+    document = docx.Document()
+    paragraph = document.add_paragraph("Portfolio: ")
+    add_hyperlink(paragraph, "https://example.com/jordan", "example.com/jordan")
+    paragraph.add_run(" (updated)")
+    add_hyperlink(document.add_paragraph(), "mailto:jordan@example.com", "jordan@example.com")
+    return document
+
+def empty():
+    return docx.Document()
+
+
+@pytest.mark.parametrize("build", [paragraphs, tables, headers_and_footers, hyperlinks, empty])
+def test_matches_python_docx(build):
+    data = save(build())
+    assert extract_docx_text_streaming(data) == extract_docx_text_python_docx(data)
+
+def test_hyperlink_styled_runs():
+    # Hyperlink-styled runs stand for their own link's target, once per link
+    document = docx.Document()
+    document.styles.add_style("Hyperlink", WD_STYLE_TYPE.CHARACTER)
+    document.part.relate_to("https://example.com/unused", RT.HYPERLINK, is_external=True)
+    paragraph = document.add_paragraph("Portfolio: ")
+    add_hyperlink(paragraph, "https://example.com/jordan", "example.com/", "jordan", style="Hyperlink")
+    paragraph = document.add_paragraph("Email: ")
+    add_hyperlink(paragraph, "mailto:jordan@example.com", "jordan@example.com", style="Hyperlink")
+    add_hyperlink(document.add_paragraph(), "https://example.com/jordan", "again", style="Hyperlink")
+    data = save(document)
+
+    assert extract_docx_text_streaming(data).split("\n")[:4] == [
+        "Portfolio: ", "https://example.com/jordan", "Email: ", "mailto:jordan@example.com",
+    ]
+
+def test_direct_hyperlink_styled_run():
+    # python-docx cannot read these (run._r has no rels); without a link of
+    # its own the run keeps its text
+    document = docx.Document()
+    document.styles.add_style("Hyperlink", WD_STYLE_TYPE.CHARACTER)
+    document.part.relate_to("https://example.com/jordan", RT.HYPERLINK, is_external=True)
+    paragraph = document.add_paragraph("Contact: ")
+    paragraph.add_run("links").style = "Hyperlink"
+    data = save(document)
+
+    with pytest.raises(AttributeError):
+        extract_docx_text_python_docx(data)
+    assert extract_docx_text_streaming(data).split("\n")[:2] == ["Contact: ", "links"]
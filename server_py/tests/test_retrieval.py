@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+import retrieval
+from retrieval import Source
+
+release = threading.Event()
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        if text == "hangs":
+            release.wait(5)
+        if text == "fails":
+            raise RuntimeError("embedding failed")
+        return [float(len(text))]
+
+
+class FakeIndex:
+    def query(self, vector, filter, top_k, include_metadata, namespace):
+        if filter["type"] == "hangs":
+            release.wait(5)
+        if filter["type"] == "fails":
+            raise RuntimeError("query failed")
+        return {"matches": [{"id": filter["type"], "score": 1.0, "metadata": {"text": f"{filter['type']} text"}}]}
+
+
+@pytest.fixture(autouse=True)
+def unblock():
+    release.clear()
+    yield
+    release.set()
+
+
+def source(name, query="text", type=None):
+    return Source(name, query, {"type": type or name}, 3)
+
+def test_all_sources_returned():
+    results = retrieval.retrieve(FakeIndex(), [source("resume"), source("jobs")], timeout=5, embeddings=FakeEmbeddings())
+    assert retrieval.join_matches(results["resume"]) == "resume text"
+    assert retrieval.join_matches(results["jobs"]) == "jobs text"
+
+def test_query_timeout_and_error_leave_other_sources():
+    results = retrieval.retrieve(
+        FakeIndex(),
+        [source("resume"), source("jobs", type="hangs"), source("questions", type="fails")],
+        timeout=0.5,
+        embeddings=FakeEmbeddings(),
+    )
+    assert set(results) == {"resume"}
+    assert retrieval.join_matches(results["resume"]) == "resume text"
+
+def test_embedding_timeout_and_error_leave_other_sources():
+    results = retrieval.retrieve(
+        FakeIndex(),
+        [source("resume"), source("jobs", query="hangs"), source("questions", query="fails")],
+        timeout=0.5,
+        embeddings=FakeEmbeddings(),
+    )
+    assert set(results) == {"resume"}
+
+def test_precomputed_vector_skips_embedding():
+    results = retrieval.retrieve(FakeIndex(), [source("resume", query=[0.5])], timeout=5, embeddings=FakeEmbeddings())
+    assert set(results) == {"resume"}
+
+def test_retrieve_context_joins_partial_results():
+    context = retrieval.retrieve_context(
+        FakeIndex(), [source("resume"), source("jobs", type="fails")], timeout=5, embeddings=FakeEmbeddings()
+    )
+    assert context == {"resume": "resume text"}
@@ -0,0 +1,110 @@
+import json
+
+import numpy as np
+import pytest
+
+from vector_store import LocalIndex, matches_filter
+
+
+@pytest.mark.parametrize("metadata, filter, expected", [
+    ({"type": "resume"}, {"type": "resume"}, True),
+    ({"type": "resume"}, {"type": {"$eq": "jobs"}}, False),
+    ({"type": "resume"}, {"type": {"$ne": "jobs"}}, True),
+    ({"type": "resume"}, {"type": {"$in": ["jobs", "resume"]}}, True),
+    ({"type": "resume"}, {"type": {"$nin": ["jobs", "resume"]}}, False),
+    # Comparisons are type sensitive
+    ({"user": "1"}, {"user": 1}, False),
+    ({"user": "1"}, {"user": {"$in": [1, 2]}}, False),
+    # A missing field fails positive operators and passes negative ones
+    ({}, {"chunk_hash": {"$eq": "a"}}, False),
+    ({}, {"chunk_hash": {"$in": ["a"]}}, False),
+    ({}, {"chunk_hash": {"$ne": "a"}}, True),
+    ({}, {"chunk_hash": {"$nin": ["a"]}}, True),
+    ({"type": "jobs", "user": "1"}, {"$and": [{"type": "jobs"}, {"user": "1"}]}, True),
+    ({"type": "jobs", "user": "1"}, {"$and": [{"type": "jobs"}, {"user": "2"}]}, False),
+    ({"type": "jobs"}, {"$or": [{"type": "resume"}, {"type": "jobs"}]}, True),
+    ({"type": "jobs"}, {"$or": [{"type": "resume"}, {"type": "questions"}]}, False),
+    ({"type": "jobs", "user": "1"}, {}, True),
+])
+def test_matches_filter(metadata, filter, expected):
+    assert matches_filter(metadata, filter) is expected
+
+def test_unsupported_operator():
+    with pytest.raises(ValueError):
+        matches_filter({"score": 1}, {"score": {"$gt": 0}})
+
+
+def vector(*values):
+    return list(values) + [0.0] * (3 - len(values))
+
+def test_query_ranks_and_filters():
+    index = LocalIndex(persist=False)
+    index.upsert(vectors=[
+        ("a", vector(1, 0), {"type": "resume", "user": "1", "text": "a"}),
+        ("b", vector(0.9, 0.1), {"type": "jobs", "user": "1", "text": "b"}),
+        ("c", vector(0, 1), {"type": "resume", "user": "1", "text": "c"}),
+        ("d", vector(1, 0), {"type": "resume", "user": "2", "text": "d"}),
+    ])
+    result = index.query(vector=vector(1, 0), filter={"type": {"$eq": "resume"}, "user": "1"}, top_k=2, include_metadata=True)
+    assert [match["id"] for match in result["matches"]] == ["a", "c"]
+    assert result["matches"][0]["metadata"]["text"] == "a"
+
+    result = index.query(vector=vector(1, 0), filter={"type": "resume"}, top_k=10)
+    assert {match["id"] for match in result["matches"]} == {"a", "c", "d"}
+
+def test_batch_upsert_replaces_and_moves_ids():
+    index = LocalIndex(persist=False)
+    index.upsert(vectors=[
+        ("a", vector(1), {"user": "1", "text": "first"}),
+        ("b", vector(0, 1), {"user": "1"}),
+        ("a", vector(0, 0, 1), {"user": "1", "text": "second"}),
+    ])
+    fetched = index.fetch(ids=["a"])["vectors"]["a"]
+    assert fetched["values"] == vector(0, 0, 1)
+    assert fetched["metadata"]["text"] == "second"
+    assert index.describe_index_stats()["total_vector_count"] == 2
+
+    index.upsert(vectors=[("a", vector(1), {"user": "2"})])
+    assert index.query(vector=vector(1), filter={"user": "1"}, top_k=10)["matches"][0]["id"] == "b"
+    assert index.fetch(ids=["a"])["vectors"]["a"]["metadata"] == {"user": "2"}
+    assert index.describe_index_stats()["total_vector_count"] == 2
+
+def test_delete_by_ids_and_filter():
+    index = LocalIndex(persist=False)
+    index.upsert(vectors=[
+        ("a", vector(1), {"user": "1", "chunk_hash": "x"}),
+        ("b", vector(1), {"user": "1", "chunk_hash": "y"}),
+        ("c", vector(1), {"user": "1"}),
+        ("d", vector(1), {"user": "2"}),
+    ])
+    index.delete(filter={"user": "1", "chunk_hash": {"$nin": ["x"]}})
+    assert set(index.fetch(ids=["a", "b", "c", "d"])["vectors"]) == {"a", "d"}
+    index.delete(ids=["d"])
+    assert set(index.fetch(ids=["a", "d"])["vectors"]) == {"a"}
+
+def test_writes_from_another_process_are_seen(tmp_path):
+    # Two instances over one directory stand in for two worker processes
+    first = LocalIndex(directory=tmp_path)
+    second = LocalIndex(directory=tmp_path)
+
+    first.upsert(vectors=[("a", vector(1), {"user": "1"})])
+    assert [match["id"] for match in second.query(vector=vector(1), filter={"user": "1"})["matches"]] == ["a"]
+
+    # second saves the same partition without losing first's vector
+    second.upsert(vectors=[("b", vector(0, 1), {"user": "1"})])
+    first.upsert(vectors=[("c", vector(0, 0, 1), {"user": "1"})])
+    assert set(second.fetch(ids=["a", "b", "c"])["vectors"]) == {"a", "b", "c"}
+
+    second.delete(ids=["a"])
+    assert "a" not in first.fetch(ids=["a"])["vectors"]
+    assert LocalIndex(directory=tmp_path).describe_index_stats()["total_vector_count"] == 2
+
+def test_partition_saved_as_one_file(tmp_path):
+    LocalIndex(directory=tmp_path).upsert(vectors=[("a", vector(1), {"user": "1"})])
+    assert sorted(path.name for path in (tmp_path / "default").iterdir() if not path.name.endswith(".lock")) == ["user_1.npz"]
+
+def test_loads_legacy_partition_pair(tmp_path):
+    (tmp_path / "default").mkdir()
+    np.savez(tmp_path / "default" / "user_1.npz", vectors=np.array([vector(1)], dtype=np.float32))
+    (tmp_path / "default" / "user_1.json").write_text(json.dumps({"ids": ["a"], "metadata": [{"user": "1"}]}))
+    assert LocalIndex(directory=tmp_path).fetch(ids=["a"])["vectors"]["a"]["metadata"] == {"user": "1"}
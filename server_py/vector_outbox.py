@@ -0,0 +1,454 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+import psycopg2
+from dotenv import load_dotenv
+
+import telemetry
+from db import bulk_insert, connection
+from embedding_cache import get_embeddings
+from vector_store import get_index
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Vector index writes made on behalf of a request are queued in vector_outbox
+# in the request's own transaction and applied by a background flusher, so
+# the request neither waits for embeddings and Pinecone nor leaves the index
+# out of step with Postgres when a call fails.
+
+# Mutations applied per flush; each run of upserts is one embedding call and one upsert
+VECTOR_OUTBOX_BATCH_SIZE = int(os.environ.get("VECTOR_OUTBOX_BATCH_SIZE", 100))
+# Enqueuing wakes this process's flusher; mutations queued by other workers
+# are picked up at this interval
+VECTOR_OUTBOX_POLL_INTERVAL = float(os.environ.get("VECTOR_OUTBOX_POLL_INTERVAL", 2))
+# Backoff after a failed flush doubles from this, up to a minute
+VECTOR_OUTBOX_RETRY_DELAY = float(os.environ.get("VECTOR_OUTBOX_RETRY_DELAY", 1))
+VECTOR_OUTBOX_MAX_RETRY_DELAY = 60
+# Mutations that keep failing are set aside as 'failed' so the rest can proceed
+VECTOR_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("VECTOR_OUTBOX_MAX_ATTEMPTS", 8))
+
+# Session advisory lock held while flushing, so one worker applies mutations in order
+OUTBOX_LOCK_NAMESPACE = 1003
+
+# Vectors listed per user and type when reconciling
+RECONCILE_TOP_K = 1000
+
+JOB_CHUNK_SIZE = 500
+ANSWER_CHUNK_SIZE = 5000
+CHUNK_OVERLAP = 20
+
+JOB_VECTOR_ID_NAMESPACE = uuid.UUID("0b7f4a52-3c1e-4f7e-9d0a-5e2b8c6d1f43")
+
+_wake = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+_stats = {"flushes": 0, "applied": 0, "errors": 0, "set_aside": 0}
+_stats_lock = threading.Lock()
+
+
+def _split(text, chunk_size):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+    )
+    return [doc.page_content for doc in text_splitter.create_documents([text])]
+
+def job_documents(user_id, job_id, job_title, company_name, job_description, status, post_url, date_created):
+    """(vector id, text, metadata) of each chunk indexed for a saved job."""
+    job_string = f"""
+    Job Title: {job_title}
+
+    Company Name: {company_name}
+
+    Job Description: {job_description}
+
+    Status: {status}
+
+    Post URL: {post_url}
+
+    Date Created: {date_created}
+    """
+    return [
+        (
+            str(uuid.uuid5(JOB_VECTOR_ID_NAMESPACE, f"{job_id}:{i}")),
+            text,
+            {"type": "jobs", "user": str(user_id), "text": text, "job_id": str(job_id), "company_name": company_name, "job_title": job_title},
+        )
+        for i, text in enumerate(_split(job_string, JOB_CHUNK_SIZE))
+    ]
+
+def answer_document(user_id, question_id, question, answer):
+    # Indexed under the question's id; only the first chunk of a long answer
+    text = _split(f"Question: {question}, Answer: {answer}", ANSWER_CHUNK_SIZE)[0]
+    return str(question_id), text, {"type": "questions", "user": str(user_id), "text": text}
+
+
+def enqueue_upserts(cur, user_id, documents):
+    """Queue (vector id, text, metadata) documents; they are embedded when flushed."""
+    bulk_insert(
+        cur,
+        "vector_outbox",
+        ("user_id", "op", "vector_id", "document", "metadata"),
+        [(user_id, "upsert", vector_id, text, json.dumps(metadata)) for vector_id, text, metadata in documents],
+    )
+
+def enqueue_delete(cur, user_id, ids=None, filter=None):
+    if ids is not None:
+        bulk_insert(cur, "vector_outbox", ("user_id", "op", "vector_id"), [(user_id, "delete", str(id)) for id in ids])
+    else:
+        cur.execute(
+            "INSERT INTO vector_outbox (user_id, op, filter) VALUES (%s, 'delete', %s)",
+            (user_id, json.dumps(filter)),
+        )
+
+def notify():
+    """Wake the flusher; call after committing the transaction that enqueued."""
+    _wake.set()
+
+
+def _runs(rows):
+    # Consecutive mutations of the same kind become one call; a filtered
+    # delete is always applied on its own
+    run = []
+    for row in rows:
+        kind = (row[1], row[2] is not None)
+        if run and (kind != (run[0][1], run[0][2] is not None) or row[5] is not None):
+            yield run
+            run = []
+        run.append(row)
+        if row[5] is not None:
+            yield run
+            run = []
+    if run:
+        yield run
+
+def _apply(index, run):
+    op, vector_id, filter = run[0][1], run[0][2], run[0][5]
+    if op == "upsert":
+        # The last write of an id wins
+        latest = list({row[2]: row for row in run}.values())
+        vectors = get_embeddings().embed_documents([row[3] for row in latest])
+        with telemetry.span("vector", "upsert"):
+            index.upsert(vectors=[(row[2], vector, row[4]) for row, vector in zip(latest, vectors)])
+    elif vector_id is not None:
+        with telemetry.span("vector", "delete"):
+            index.delete(ids=list(dict.fromkeys(row[2] for row in run)))
+    else:
+        with telemetry.span("vector", "delete"):
+            index.delete(filter=filter)
+
+def _count(**counts):
+    with _stats_lock:
+        for key, value in counts.items():
+            _stats[key] += value
+
+def flush(batch_size=VECTOR_OUTBOX_BATCH_SIZE):
+    """Apply the oldest pending mutations, in order.
+
+    Returns how many were applied, or None when another worker is flushing.
+    When a call fails, the mutations before it are still removed, the failing
+    ones are retried by later flushes (and set aside as 'failed' after
+    VECTOR_OUTBOX_MAX_ATTEMPTS), and the error is raised.
+
+    The batch is read and settled in two short transactions; none is open
+    during the embedding and index calls. A session advisory lock, held on
+    this connection for the whole flush, keeps one worker applying at a time.
+    """
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_try_advisory_lock(%s, 0)", (OUTBOX_LOCK_NAMESPACE,))
+        locked = cur.fetchone()[0]
+        conn.commit()
+        if not locked:
+            cur.close()
+            return None
+
+        try:
+            cur.execute(
+                """
+                SELECT id, op, vector_id, document, metadata, filter FROM vector_outbox
+                WHERE status = 'pending'
+                ORDER BY id
+                LIMIT %s
+                """,
+                (batch_size,),
+            )
+            rows = cur.fetchall()
+            conn.commit()
+            if not rows:
+                return 0
+
+            applied = []
+            failed = []
+            error = None
+            index = get_index()
+            with telemetry.trace("vector_outbox"):
+                for run in _runs(rows):
+                    try:
+                        _apply(index, run)
+                    except Exception as e:
+                        error = e
+                        failed = [row[0] for row in run]
+                        break
+                    applied.extend(row[0] for row in run)
+
+            if applied:
+                cur.execute("DELETE FROM vector_outbox WHERE id = ANY(%s)", (applied,))
+            if failed:
+                cur.execute(
+                    """
+                    UPDATE vector_outbox
+                    SET attempts = attempts + 1, error = %s,
+                        status = CASE WHEN attempts + 1 >= %s THEN 'failed' ELSE status END
+                    WHERE id = ANY(%s)
+                    RETURNING status
+                    """,
+                    (str(error), VECTOR_OUTBOX_MAX_ATTEMPTS, failed),
+                )
+                set_aside = sum(1 for (status,) in cur.fetchall() if status == "failed")
+                _count(errors=1, set_aside=set_aside)
+            conn.commit()
+        finally:
+            try:
+                conn.rollback()
+                cur.execute("SELECT pg_advisory_unlock(%s, 0)", (OUTBOX_LOCK_NAMESPACE,))
+                conn.commit()
+                cur.close()
+            except psycopg2.Error:
+                # Ending the session releases the lock
+                conn.close()
+
+    _count(flushes=1, applied=len(applied))
+    if error is not None:
+        raise error
+    return len(applied)
+
+def _run():
+    failures = 0
+    while True:
+        if failures:
+            time.sleep(min(VECTOR_OUTBOX_MAX_RETRY_DELAY, VECTOR_OUTBOX_RETRY_DELAY * 2 ** (failures - 1)))
+        else:
+            _wake.wait(VECTOR_OUTBOX_POLL_INTERVAL)
+        _wake.clear()
+        try:
+            while flush():
+                pass
+            failures = 0
+        except Exception as e:
+            failures += 1
+            logger.warning("Vector outbox flush failed", extra={"error": str(e), "consecutive_failures": failures})
+
+def start():
+    """Start this process's flusher thread, once."""
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="vector-outbox", daemon=True)
+            _thread.start()
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _indexed(index, probe, user_id, type):
+    result = index.query(
+        vector=probe,
+        filter={"type": {"$eq": type}, "user": str(user_id)},
+        top_k=RECONCILE_TOP_K,
+        include_metadata=True,
+    )
+    matches = result["matches"]
+    if len(matches) >= RECONCILE_TOP_K:
+        logger.warning("Reconcile saw only the first vectors", extra={"user_id": user_id, "type": type, "top_k": RECONCILE_TOP_K})
+    return {match["id"]: match["metadata"] for match in matches}
+
+def _user_drift(cur, index, probe, user_id):
+    drift = {}
+
+    cur.execute("SELECT chunk_hash, vector_id FROM resume_chunks WHERE user_id = %s", (user_id,))
+    manifest = dict(cur.fetchall())
+    indexed = _indexed(index, probe, user_id, "resume")
+    drift["resume"] = {
+        "missing": sorted(digest for digest, vector_id in manifest.items() if vector_id not in indexed),
+        "orphaned": sorted(set(indexed) - set(manifest.values())),
+    }
+
+    cur.execute(
+        "SELECT id, question, answer FROM interview_questions WHERE user_id = %s AND COALESCE(TRIM(answer), '') <> ''",
+        (user_id,),
+    )
+    expected = {str(id): (id, question, answer) for id, question, answer in cur.fetchall()}
+    indexed = _indexed(index, probe, user_id, "questions")
+    drift["questions"] = {
+        "missing": sorted(set(expected) - set(indexed)),
+        "orphaned": sorted(set(indexed) - set(expected)),
+        "stale": sorted(
+            id for id in set(expected) & set(indexed)
+            if indexed[id].get("text") != answer_document(user_id, *expected[id])[1]
+        ),
+        "documents": {id: answer_document(user_id, *row) for id, row in expected.items()},
+    }
+
+    cur.execute(
+        "SELECT id, job_title, company_name, job_description, status, post_url, date_created FROM saved_jobs WHERE user_id = %s",
+        (user_id,),
+    )
+    expected = {str(row[0]): job_documents(user_id, *row) for row in cur.fetchall()}
+    indexed_jobs = {}
+    orphaned = []
+    # Jobs are matched on their job_id metadata; vectors written before the
+    # outbox have random ids
+    for vector_id, metadata in _indexed(index, probe, user_id, "jobs").items():
+        job_id = str(metadata.get("job_id"))
+        if job_id in expected:
+            indexed_jobs.setdefault(job_id, set()).add(metadata.get("text"))
+        else:
+            orphaned.append(vector_id)
+    drift["jobs"] = {
+        "missing": sorted(set(expected) - set(indexed_jobs)),
+        "orphaned": sorted(orphaned),
+        "stale": sorted(
+            job_id for job_id, texts in indexed_jobs.items()
+            if texts != {text for _, text, _ in expected[job_id]}
+        ),
+        "documents": expected,
+    }
+    return drift
+
+def _enqueue_fixes(cur, user_id, drift):
+    resume, questions, jobs = drift["resume"], drift["questions"], drift["jobs"]
+
+    orphaned = resume["orphaned"] + questions["orphaned"] + jobs["orphaned"]
+    if orphaned:
+        enqueue_delete(cur, user_id, ids=orphaned)
+
+    if resume["missing"]:
+        from ingestion import chunk_hash, chunk_resume
+
+        cur.execute("SELECT content FROM resume WHERE user_id = %s AND section = %s", (user_id, "FULL RESUME"))
+        row = cur.fetchone()
+        texts = {chunk_hash(text): text for text in chunk_resume(row[0])} if row else {}
+        cur.execute("SELECT chunk_hash, vector_id FROM resume_chunks WHERE user_id = %s", (user_id,))
+        manifest = dict(cur.fetchall())
+        enqueue_upserts(cur, user_id, [
+            (manifest[digest], texts[digest], {"type": "resume", "user": str(user_id), "text": texts[digest], "chunk_hash": digest})
+            for digest in resume["missing"] if digest in texts
+        ])
+
+    enqueue_upserts(cur, user_id, [questions["documents"][id] for id in questions["missing"] + questions["stale"]])
+
+    for job_id in jobs["missing"] + jobs["stale"]:
+        enqueue_delete(cur, user_id, filter={"type": {"$eq": "jobs"}, "job_id": job_id, "user": str(user_id)})
+        enqueue_upserts(cur, user_id, jobs["documents"][job_id])
+
+def reconcile(user_ids=None, fix=False):
+    """Compare the index with Postgres and return {user_id: drift} for users with any.
+
+    Expected vectors are the resume_chunks manifest, answered interview
+    questions and the chunks of saved jobs. Drift is "missing", "orphaned"
+    (indexed but not expected) or "stale" (indexed text differs). With fix,
+    the writes that repair it are queued on the outbox.
+    """
+    from query_vectors import get_query_vector
+
+    index = get_index()
+    probe = get_query_vector("resume_requirements")
+    drifted = {}
+    with connection() as conn:
+        cur = conn.cursor()
+        if user_ids is None:
+            cur.execute("SELECT id FROM users ORDER BY id")
+            user_ids = [row[0] for row in cur.fetchall()]
+
+        for user_id in user_ids:
+            drift = _user_drift(cur, index, probe, user_id)
+            if not any(drift[kind][key] for kind in drift for key in ("missing", "orphaned", "stale") if key in drift[kind]):
+                continue
+            drifted[user_id] = drift
+            if fix:
+                _enqueue_fixes(cur, user_id, drift)
+                conn.commit()
+        cur.close()
+    return drifted
+
+def outbox_status():
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT status, count(*), min(created_at) FROM vector_outbox GROUP BY status ORDER BY status")
+        rows = cur.fetchall()
+        cur.close()
+    return {status: {"count": count, "oldest": oldest} for status, count, oldest in rows}
+
+def retry_failed():
+    # Failed mutations go back to the end of the queue rather than their old place
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO vector_outbox (user_id, op, vector_id, document, metadata, filter)
+            SELECT user_id, op, vector_id, document, metadata, filter FROM vector_outbox WHERE status = 'failed' ORDER BY id
+            """
+        )
+        cur.execute("DELETE FROM vector_outbox WHERE status = 'failed'")
+        count = cur.rowcount
+        conn.commit()
+        cur.close()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply queued vector index writes and check the index for drift")
+    parser.add_argument("--flush", action="store_true", help="apply every pending mutation and exit")
+    parser.add_argument("--retry-failed", action="store_true", help="requeue the mutations set aside as failed")
+    parser.add_argument("--reconcile", action="store_true", help="report vectors missing from, orphaned in or stale in the index")
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids", help="reconcile only this user (repeatable)")
+    parser.add_argument("--fix", action="store_true", help="with --reconcile, queue and apply the repairing writes")
+    args = parser.parse_args()
+
+    if args.retry_failed:
+        print(f"Requeued {retry_failed()} failed mutation(s)")
+
+    if args.reconcile:
+        pending = outbox_status().get("pending")
+        if pending:
+            print(f"{pending['count']} mutation(s) still pending since {pending['oldest']}; some drift may be in flight")
+        drifted = reconcile(args.user_ids, fix=args.fix)
+        for user_id, drift in drifted.items():
+            counts = ", ".join(
+                f"{kind} {key} {len(drift[kind][key])}"
+                for kind in drift for key in ("missing", "orphaned", "stale")
+                if drift[kind].get(key)
+            )
+            print(f"user {user_id}: {counts}")
+        print(f"{len(drifted)} user(s) with drift")
+
+    if args.flush or args.fix:
+        applied = 0
+        while True:
+            count = flush()
+            if count is None:
+                print("Another worker is flushing the outbox")
+                break
+            if not count:
+                break
+            applied += count
+        print(f"Applied {applied} mutation(s)")
+
+    for status, entry in outbox_status().items():
+        print(f"{status}: {entry['count']} (oldest {entry['oldest']})")
+
+    if args.reconcile and drifted and not args.fix:
+        sys.exit(1)
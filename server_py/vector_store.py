@@ -0,0 +1,475 @@
+import json
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "pinecone" talks to the hosted index, "local" keeps vectors in-process and on
+# disk under vectordb/local_index so the service can run fully offline.
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_METHOD = os.environ.get("LOCAL_INDEX_METHOD", "exact")
+LOCAL_INDEX_HNSW_MIN_SIZE = int(os.environ.get("LOCAL_INDEX_HNSW_MIN_SIZE", 2000))
+PINECONE_INDEX_NAME = "resume-bot"
+
+pinecone_api_key = os.environ.get("PINECONE_API_KEY")
+
+local_index_directory = Path(__file__).resolve().parent / "vectordb" / "local_index"
+
+
+def _match_condition(value, condition):
+    if not isinstance(condition, dict):
+        return value == condition
+
+    for op, expected in condition.items():
+        if op == "$eq":
+            ok = value == expected
+        elif op == "$ne":
+            ok = value != expected
+        elif op == "$in":
+            ok = value in expected
+        elif op == "$nin":
+            ok = value not in expected
+        else:
+            raise ValueError(f"Unsupported filter operator {op}")
+        if not ok:
+            return False
+    return True
+
+def matches_filter(metadata, filter):
+    # Same semantics as Pinecone metadata filters: every key must match, a bare
+    # value means $eq and comparisons are type sensitive ("1" != 1).
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, f) for f in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, f) for f in condition):
+                return False
+        elif key not in metadata:
+            # Like Pinecone, negative operators match vectors without the field
+            if not (isinstance(condition, dict) and set(condition) <= {"$ne", "$nin"}):
+                return False
+        elif not _match_condition(metadata[key], condition):
+            return False
+    return True
+
+def _partition_key(metadata):
+    return str(metadata.get("user", "_shared"))
+
+def _filter_partition_keys(filter):
+    # Narrow the search to a single user's partition when the filter pins one
+    condition = (filter or {}).get("user")
+    if isinstance(condition, dict):
+        condition = condition.get("$eq") if list(condition) == ["$eq"] else None
+    return None if condition is None else [str(condition)]
+
+
+class _Partition:
+    def __init__(self, dimension=None):
+        self.ids = []
+        self.rows = {}
+        self.metadata = []
+        self.vectors = np.zeros((0, dimension or 0), dtype=np.float32)
+        self._normalized = None
+        self._hnsw = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def upsert(self, vectors):
+        """Insert or replace (id, values, metadata) rows, stacking new rows once per batch."""
+        added = []
+        for id, values, metadata in vectors:
+            vector = np.asarray(values, dtype=np.float32)
+            if id in self.rows:
+                row = self.rows[id]
+                if row < len(self.vectors):
+                    self.vectors[row] = vector
+                else:
+                    added[row - len(self.vectors)] = vector
+                self.metadata[row] = metadata
+            else:
+                self.rows[id] = len(self.ids)
+                self.ids.append(id)
+                self.metadata.append(metadata)
+                added.append(vector)
+        if added:
+            if len(self.vectors) == 0:
+                self.vectors = np.zeros((0, added[0].shape[0]), dtype=np.float32)
+            self.vectors = np.vstack([self.vectors, np.stack(added)])
+        self._invalidate()
+
+    def update(self, id, values=None, set_metadata=None):
+        row = self.rows[id]
+        if values is not None:
+            self.vectors[row] = np.asarray(values, dtype=np.float32)
+        if set_metadata:
+            self.metadata[row] = {**self.metadata[row], **set_metadata}
+        self._invalidate()
+
+    def delete(self, ids):
+        keep = [row for row, id in enumerate(self.ids) if id not in ids]
+        if len(keep) == len(self.ids):
+            return
+        self.ids = [self.ids[row] for row in keep]
+        self.metadata = [self.metadata[row] for row in keep]
+        self.vectors = self.vectors[keep]
+        self.rows = {id: row for row, id in enumerate(self.ids)}
+        self._invalidate()
+
+    def _invalidate(self):
+        self._normalized = None
+        self._hnsw = None
+
+    def normalized(self):
+        if self._normalized is None:
+            norms = np.linalg.norm(self.vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._normalized = self.vectors / norms
+        return self._normalized
+
+    def hnsw(self):
+        if self._hnsw is None:
+            import hnswlib
+
+            index = hnswlib.Index(space="cosine", dim=self.vectors.shape[1])
+            index.init_index(max_elements=len(self.ids), ef_construction=200, M=16)
+            index.add_items(self.vectors, np.arange(len(self.ids)))
+            self._hnsw = index
+        return self._hnsw
+
+    def search(self, vector, filter, top_k, method):
+        if not self.ids:
+            return []
+
+        allowed = [row for row, metadata in enumerate(self.metadata) if matches_filter(metadata, filter)]
+        if not allowed:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query) or 1.0
+
+        if method == "hnsw" and len(self.ids) >= LOCAL_INDEX_HNSW_MIN_SIZE:
+            index = self.hnsw()
+            allowed_set = set(allowed)
+            k = min(top_k, len(allowed))
+            index.set_ef(max(50, k))
+            try:
+                labels, distances = index.knn_query(query, k=k, filter=lambda row: row in allowed_set)
+                return [(int(row), 1.0 - float(distance)) for row, distance in zip(labels[0], distances[0])]
+            except RuntimeError:
+                # Very selective filters can leave the graph search short of k hits
+                pass
+
+        rows = np.asarray(allowed)
+        scores = self.normalized()[rows] @ (query / query_norm)
+        k = min(top_k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+
+@contextmanager
+def _file_lock(path):
+    # Exclusive across processes; held while a partition is read, changed and written
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _file_version(path):
+    # os.replace gives every save a new inode, so this changes on each write
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class LocalIndex:
+    """In-process vector index exposing the subset of pinecone.Index we use.
+
+    Vectors are partitioned per user (metadata["user"]) and namespace, searched
+    exactly with NumPy or through an hnswlib graph for large partitions, and
+    persisted as one .npz file per partition, replaced atomically on save.
+
+    Several worker processes can share the directory: a partition is reloaded
+    whenever its file has changed since this process last read it, and writes
+    hold a per-partition file lock while they reload, apply and save.
+    """
+
+    def __init__(self, directory=local_index_directory, method=LOCAL_INDEX_METHOD, persist=True):
+        self.directory = Path(directory)
+        self.method = method
+        self.persist = persist
+        self._partitions = {}
+        # File version each partition was loaded from or saved as
+        self._versions = {}
+        # (namespace, id) -> partition key
+        self._locations = {}
+        self._lock = threading.RLock()
+        if persist:
+            self._scan()
+
+    def _partition_path(self, namespace, key):
+        return self.directory / (namespace or "default") / f"user_{key}"
+
+    def _scan(self, namespace=None):
+        # Pick up partitions created or changed by other processes
+        if not self.persist or not self.directory.exists():
+            return
+        if namespace is None:
+            namespace_dirs = [path for path in self.directory.iterdir() if path.is_dir()]
+        else:
+            namespace_dirs = [self.directory / (namespace or "default")]
+        for namespace_dir in namespace_dirs:
+            ns = "" if namespace_dir.name == "default" else namespace_dir.name
+            for path in namespace_dir.glob("user_*.npz"):
+                self._refresh(ns, path.stem[len("user_"):])
+
+    def _refresh(self, namespace, key):
+        if not self.persist:
+            return
+        path = self._partition_path(namespace, key).with_suffix(".npz")
+        version = _file_version(path)
+        if version is None or version == self._versions.get((namespace, key)):
+            return
+
+        with np.load(path, allow_pickle=False) as data:
+            vectors = data["vectors"]
+            if "index" in data.files:
+                contents = json.loads(str(data["index"]))
+            else:
+                # Written as a separate .json by earlier versions
+                with open(path.with_suffix(".json")) as f:
+                    contents = json.load(f)
+
+        partition = _Partition()
+        partition.ids = list(contents["ids"])
+        partition.metadata = contents["metadata"]
+        partition.vectors = vectors
+        partition.rows = {id: row for row, id in enumerate(partition.ids)}
+        self._set_partition(namespace, key, partition)
+        self._versions[(namespace, key)] = version
+
+    def _set_partition(self, namespace, key, partition):
+        old = self._partitions.get((namespace, key))
+        if old is not None:
+            for id in old.ids:
+                if self._locations.get((namespace, id)) == key:
+                    del self._locations[(namespace, id)]
+        for id in partition.ids:
+            self._locations[(namespace, id)] = key
+        self._partitions[(namespace, key)] = partition
+
+    def _save(self, namespace, key):
+        if not self.persist:
+            return
+        partition = self._partitions[(namespace, key)]
+        path = self._partition_path(namespace, key)
+        contents = json.dumps({"ids": partition.ids, "metadata": partition.metadata})
+        # Vectors, ids and metadata in one file, so readers never see a mismatched pair
+        temporary = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temporary, "wb") as f:
+            np.savez(f, vectors=partition.vectors, index=np.array(contents))
+        os.replace(temporary, path.with_suffix(".npz"))
+        self._versions[(namespace, key)] = _file_version(path.with_suffix(".npz"))
+        if path.with_suffix(".json").exists():
+            os.remove(path.with_suffix(".json"))
+
+    @contextmanager
+    def _writing(self, namespace, keys):
+        # Lock, reload and afterwards save each partition a write touches
+        if not self.persist:
+            yield
+            return
+        with ExitStack() as stack:
+            for key in sorted(set(keys)):
+                path = self._partition_path(namespace, key)
+                os.makedirs(path.parent, exist_ok=True)
+                stack.enter_context(_file_lock(path.with_suffix(".lock")))
+                self._refresh(namespace, key)
+            yield
+
+    def _partitions_for(self, namespace, filter):
+        keys = _filter_partition_keys(filter)
+        if keys is None:
+            self._scan(namespace)
+            return [(key, p) for (ns, key), p in self._partitions.items() if ns == namespace]
+        for key in keys:
+            self._refresh(namespace, key)
+        return [(key, self._partitions[(namespace, key)]) for key in keys if (namespace, key) in self._partitions]
+
+    def _find(self, namespace, id):
+        key = self._locations.get((namespace, id))
+        if key is None:
+            return None, None
+        return key, self._partitions[(namespace, key)]
+
+    def query(self, vector, filter=None, top_k=10, include_metadata=False, include_values=False, namespace="", **kwargs):
+        with self._lock:
+            results = []
+            for _, partition in self._partitions_for(namespace, filter):
+                for row, score in partition.search(vector, filter, top_k, self.method):
+                    match = {"id": partition.ids[row], "score": score}
+                    if include_metadata:
+                        match["metadata"] = dict(partition.metadata[row])
+                    if include_values:
+                        match["values"] = partition.vectors[row].tolist()
+                    results.append(match)
+
+        results.sort(key=lambda match: match["score"], reverse=True)
+        return {"matches": results[:top_k], "namespace": namespace}
+
+    def upsert(self, vectors, namespace="", **kwargs):
+        rows = []
+        for vector in vectors:
+            if isinstance(vector, dict):
+                id, values, metadata = vector["id"], vector["values"], vector.get("metadata") or {}
+            else:
+                id, values, metadata = (tuple(vector) + ({},))[:3]
+            rows.append((id, values, dict(metadata)))
+
+        with self._lock:
+            keys = {_partition_key(metadata) for _, _, metadata in rows}
+            moved_from = {self._locations.get((namespace, id)) for id, _, _ in rows} - {None}
+            with self._writing(namespace, keys | moved_from):
+                by_key = {}
+                touched = set()
+                for id, values, metadata in rows:
+                    # An id lives in exactly one partition; move it if its user changed
+                    key = _partition_key(metadata)
+                    old_key, old_partition = self._find(namespace, id)
+                    if old_partition is not None and old_key != key:
+                        old_partition.delete({id})
+                        del self._locations[(namespace, id)]
+                        touched.add(old_key)
+                    by_key.setdefault(key, []).append((id, values, metadata))
+
+                for key, batch in by_key.items():
+                    partition = self._partitions.setdefault((namespace, key), _Partition())
+                    partition.upsert(batch)
+                    for id, _, _ in batch:
+                        self._locations[(namespace, id)] = key
+                    touched.add(key)
+
+                for key in touched:
+                    self._save(namespace, key)
+        return {"upserted_count": len(rows)}
+
+    def delete(self, ids=None, filter=None, delete_all=False, namespace="", **kwargs):
+        with self._lock:
+            if ids:
+                self._scan(namespace)
+                keys = {self._locations.get((namespace, id)) for id in ids} - {None}
+            else:
+                keys = [key for key, _ in self._partitions_for(namespace, filter)]
+            with self._writing(namespace, keys):
+                for key in keys:
+                    partition = self._partitions.get((namespace, key))
+                    if partition is None:
+                        continue
+                    if delete_all:
+                        doomed = set(partition.ids)
+                    elif ids:
+                        doomed = set(ids) & set(partition.rows)
+                    else:
+                        doomed = {
+                            partition.ids[row]
+                            for row, metadata in enumerate(partition.metadata)
+                            if matches_filter(metadata, filter)
+                        }
+                    if doomed:
+                        partition.delete(doomed)
+                        for id in doomed:
+                            del self._locations[(namespace, id)]
+                        self._save(namespace, key)
+        return {}
+
+    def update(self, id, values=None, set_metadata=None, namespace="", **kwargs):
+        # Accept a single-row batch, which is what embed_documents returns
+        if values is not None and len(values) and isinstance(values[0], (list, tuple)):
+            values = values[0]
+        with self._lock:
+            self._scan(namespace)
+            key, _ = self._find(namespace, id)
+            if key is None:
+                return {}
+            with self._writing(namespace, [key]):
+                key, partition = self._find(namespace, id)
+                if partition is None:
+                    return {}
+                partition.update(id, values, set_metadata)
+                self._save(namespace, key)
+        return {}
+
+    def fetch(self, ids, namespace="", **kwargs):
+        vectors = {}
+        with self._lock:
+            self._scan(namespace)
+            for id in ids:
+                _, partition = self._find(namespace, id)
+                if partition is not None:
+                    row = partition.rows[id]
+                    vectors[id] = {
+                        "id": id,
+                        "values": partition.vectors[row].tolist(),
+                        "metadata": dict(partition.metadata[row]),
+                    }
+        return {"vectors": vectors, "namespace": namespace}
+
+    def describe_index_stats(self, **kwargs):
+        with self._lock:
+            self._scan()
+            namespaces = {}
+            for (namespace, _), partition in self._partitions.items():
+                entry = namespaces.setdefault(namespace, {"vector_count": 0})
+                entry["vector_count"] += len(partition)
+        return {
+            "namespaces": namespaces,
+            "total_vector_count": sum(n["vector_count"] for n in namespaces.values()),
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    # One shared client per process so every module sees the same local index
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = create_index(VECTOR_BACKEND)
+    return _index
+
+def create_index(backend):
+    if backend == "local":
+        return LocalIndex()
+    if backend == "pinecone":
+        import pinecone
+
+        pinecone.init(api_key=pinecone_api_key, environment="us-west4-gcp")
+        return pinecone.Index(PINECONE_INDEX_NAME)
+    raise ValueError(f"Unknown vector backend {backend}")
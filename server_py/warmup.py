@@ -0,0 +1,127 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "background" warms every component on a thread after import, "eager" does
+# it before the app finishes importing, "lazy" leaves everything to first use
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "background")
+
+_registered = OrderedDict()
+_lock = threading.Lock()
+_process = None
+# Mode of the warm-up started in this process or the one it was forked from
+_mode = None
+
+
+class Component:
+    def __init__(self, name, load, required):
+        self.name = name
+        self.load = load
+        self.required = required
+        self.status = "cold"
+        self.seconds = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    def state(self):
+        return {"status": self.status, "required": self.required, "seconds": self.seconds, "error": self.error}
+
+
+class _Process:
+    def __init__(self, pid):
+        self.pid = pid
+        self.components = OrderedDict(
+            (name, Component(name, load, required)) for name, (load, required) in _registered.items()
+        )
+        self.finished = threading.Event()
+        self.started = False
+
+
+def _current():
+    # Component state is per process, like db.get_pool: a gunicorn worker
+    # forked from a --preload master must load every component itself (the
+    # master's database "warm" says nothing about the worker's outbox thread),
+    # and must not inherit a lock held by the master's warm-up thread. A
+    # forked process starts its own warm-up on first use.
+    global _process
+    pid = os.getpid()
+    process = _process
+    if process is None or process.pid != pid:
+        with _lock:
+            if _process is None or _process.pid != pid:
+                _process = _Process(pid)
+            process = _process
+        if _mode is not None:
+            _begin(process, _mode)
+    return process
+
+def register(name, load, required=False):
+    process = _current()
+    with _lock:
+        _registered[name] = (load, required)
+        process.components[name] = Component(name, load, required)
+
+def ensure(name):
+    """Load a component once per process; a failed load is retried on the next call."""
+    component = _current().components[name]
+    if component.status == "warm":
+        return
+
+    with component.lock:
+        if component.status == "warm":
+            return
+        component.status = "warming"
+        start = time.perf_counter()
+        try:
+            component.load()
+        except Exception as e:
+            component.status = "failed"
+            component.error = str(e)
+            raise
+        finally:
+            component.seconds = round(time.perf_counter() - start, 3)
+        component.status = "warm"
+        component.error = None
+
+def warm_up():
+    process = _current()
+    for name in list(process.components):
+        try:
+            ensure(name)
+        except Exception as e:
+            logger.warning("Warm-up failed", extra={"component": name, "error": str(e)})
+    process.finished.set()
+
+def _begin(process, mode):
+    with _lock:
+        if process.started:
+            return
+        process.started = True
+
+    if mode == "eager":
+        warm_up()
+    elif mode == "background":
+        threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+    else:
+        process.finished.set()
+
+def start(mode=STARTUP_WARMUP):
+    global _mode
+    _mode = mode
+    _begin(_current(), mode)
+
+def readiness():
+    process = _current()
+    components = {name: component.state() for name, component in process.components.items()}
+    ready = process.finished.is_set() and all(
+        state["status"] == "warm" for state in components.values() if state["required"]
+    )
+    return {"ready": ready, "mode": STARTUP_WARMUP, "components": components}